@@ -0,0 +1,137 @@
+"""End-to-end throughput benchmark of enrich_data_nlp_en.py against the offline fake Gemini backend.
+
+For each size, the generated inputs (user_details_en, marketing_interactions_en, campaign_details_en)
+are resampled to that many users (interactions scaled in proportion, fresh IDs) in a scratch
+directory, and the enrichment script runs there as a subprocess with GEMINI_BACKEND=fake. Its run
+stats give rows/s, Gemini calls issued, retries, p95 call latency and wall time. Run generate_mock_data_en.py first.
+
+    python benchmark_enrichment.py --sizes 1000,5000,20000 --latency-seconds 0.3 --error-rate 0.05
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from table_io import read_table, write_table, resolve_table_path
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ENRICH_SCRIPT = os.path.join(REPO_DIR, 'enrich_data_nlp_en.py')
+TEXT_COLUMNS = {'users': ['supplier_capabilities_text', 'user_feedback_text'], 'interactions': ['interaction_details_text']}
+
+
+def make_distinct(texts, share, rng):
+    """Tags a `share` of the non-empty texts with a unique suffix, so dedup can't collapse them."""
+    texts = texts.copy()
+    present = np.flatnonzero(texts.notna().to_numpy())
+    picked = present[rng.random(len(present)) < share]
+    texts.iloc[picked] = [f"{text} (ref {i})" for i, text in zip(picked, texts.iloc[picked])]
+    return texts
+
+
+def scale_inputs(source_dir, out_dir, num_users, unique_share, seed):
+    """Writes inputs for `num_users` users (and proportionally many interactions) resampled from `source_dir`."""
+    rng = np.random.default_rng(seed)
+    users = read_table(resolve_table_path(os.path.join(source_dir, 'user_details_en')))
+    interactions = read_table(resolve_table_path(os.path.join(source_dir, 'marketing_interactions_en')))
+    num_interactions = max(1, round(num_users * len(interactions) / len(users)))
+
+    users = users.iloc[rng.integers(0, len(users), num_users)].reset_index(drop=True)
+    old_ids = users['user_id'].to_numpy()
+    users['user_id'] = [f"USER{i:08d}" for i in range(1, num_users + 1)]
+    interactions = interactions.iloc[rng.integers(0, len(interactions), num_interactions)].reset_index(drop=True)
+    interactions['interaction_id'] = [f"INT{i:010d}" for i in range(1, num_interactions + 1)]
+    # Interactions go to a random new user that was resampled from the same original user where possible
+    new_ids_by_old = pd.Series(users['user_id'].to_numpy(), index=old_ids).groupby(level=0).first()
+    interactions['user_id'] = interactions['user_id'].map(new_ids_by_old).fillna(
+        pd.Series(users['user_id'].to_numpy()[rng.integers(0, num_users, num_interactions)]))
+    if unique_share > 0:
+        for kind, df in (('users', users), ('interactions', interactions)):
+            for column in TEXT_COLUMNS[kind]:
+                df[column] = make_distinct(df[column], unique_share, rng)
+
+    write_table(users, os.path.join(out_dir, 'user_details_en.csv'))
+    write_table(interactions, os.path.join(out_dir, 'marketing_interactions_en.csv'))
+    shutil.copy(resolve_table_path(os.path.join(source_dir, 'campaign_details_en')), out_dir)
+    return len(users), len(interactions)
+
+
+def run_enrichment(work_dir, args):
+    """Runs the enrichment script in `work_dir` on the fake backend; returns its run stats (None if it failed)."""
+    stats_path = os.path.join(work_dir, 'run_stats.json')
+    env = dict(os.environ, GEMINI_BACKEND='fake', ENRICHMENT_RUN_STATS=stats_path,
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])),
+               GEMINI_REQUESTS_PER_MINUTE=str(args.rpm), GEMINI_TOKENS_PER_MINUTE=str(args.tpm),
+               GEMINI_MAX_CONCURRENCY=str(args.concurrency), GEMINI_BATCH_SIZE=str(args.batch_size),
+               FAKE_GEMINI_LATENCY=args.latency, FAKE_GEMINI_LATENCY_SECONDS=str(args.latency_seconds),
+               FAKE_GEMINI_429_RATE=str(args.error_rate), FAKE_GEMINI_MALFORMED_RATE=str(args.malformed_rate),
+               FAKE_GEMINI_SEED=str(args.seed))
+    if args.fake_rpm:
+        env['FAKE_GEMINI_RPM'] = str(args.fake_rpm)
+    with open(os.path.join(work_dir, 'enrichment.log'), 'w', encoding='utf-8') as log:
+        process = subprocess.run([sys.executable, ENRICH_SCRIPT], cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if process.returncode != 0 or not os.path.exists(stats_path):
+        print(f"Enrichment failed (exit code {process.returncode}); see {os.path.join(work_dir, 'enrichment.log')}")
+        return None
+    with open(stats_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='1000,5000,20000', help="Comma-separated numbers of users (default: 1000,5000,20000)")
+    parser.add_argument('--source-dir', default='.', help="Directory with the generated *_en input tables")
+    parser.add_argument('--unique-share', type=float, default=0.2, help="Share of texts made distinct after resampling (default: 0.2)")
+    parser.add_argument('--batch-size', type=int, default=20, help="GEMINI_BATCH_SIZE for the runs (1 = one prompt per item)")
+    parser.add_argument('--concurrency', type=int, default=16, help="GEMINI_MAX_CONCURRENCY (ceiling of the adaptive controller) for the runs")
+    parser.add_argument('--rpm', type=float, default=6000, help="Client-side requests/min limit (default: 6000)")
+    parser.add_argument('--tpm', type=int, default=0, help="Client-side tokens/min limit (default: 0 = none)")
+    parser.add_argument('--latency', choices=['lognormal', 'uniform', 'fixed'], default='lognormal', help="Fake latency distribution")
+    parser.add_argument('--latency-seconds', type=float, default=0.2, help="Median fake latency per call (default: 0.2)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of fake calls failing with 429")
+    parser.add_argument('--fake-rpm', type=float, default=None, help="Server-side requests/min above which the fake answers 429")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Share of fake answers that are truncated or prose")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch directories (inputs, outputs, logs)")
+    args = parser.parse_args()
+
+    results = []
+    for num_users in [int(size) for size in args.sizes.split(',')]:
+        work_dir = tempfile.mkdtemp(prefix=f'enrich_bench_{num_users}_')
+        try:
+            started = time.perf_counter()
+            user_rows, interaction_rows = scale_inputs(args.source_dir, work_dir, num_users, args.unique_share, args.seed)
+            print(f"\n{num_users} users / {interaction_rows} interactions prepared in {time.perf_counter() - started:.1f}s ({work_dir}).")
+            stats = run_enrichment(work_dir, args)
+            if stats is None:
+                continue
+            rows = stats['user_rows'] + stats['interaction_rows']
+            calls = next((row for row in stats.get('llm_telemetry') or [] if row['task_type'] == 'All'), {})
+            results.append({'users': user_rows, 'interactions': interaction_rows, 'rows/s': round(rows / stats['wall_seconds'], 1),
+                            'gemini analyses': stats['gemini_analyses'], 'api calls': stats['api_calls'],
+                            'retries': stats['retries'], 'failures': stats['failures'],
+                            'final concurrency': (stats.get('client') or {}).get('concurrency_limit'),
+                            'concurrency cuts': (stats.get('client') or {}).get('concurrency_decreases'),
+                            'call p95 s': calls.get('p95_s'), 'wall s': stats['wall_seconds']})
+            print(f"Done: {results[-1]}")
+        finally:
+            if args.keep:
+                print(f"Kept {work_dir}")
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    if results:
+        print(f"\n--- Enrichment benchmark (fake backend: {args.latency} latency, median {args.latency_seconds}s, "
+              f"429 rate {args.error_rate}, malformed rate {args.malformed_rate}; batch size {args.batch_size}, "
+              f"concurrency {args.concurrency}) ---")
+        print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Micro-benchmark of gemini_json's response parser against the regex cleaner it replaced.
+
+Times `extract_json` and `parse_response` per response on typical model answers (plain, fenced,
+wrapped in prose, with trailing notes, with trailing commas, truncated, refusals), next to the
+previous regex-based cleaner of enrich_data_nlp_en.py, kept here only for the comparison.
+
+    python benchmark_gemini_json.py --rounds 5000
+"""
+import argparse
+import json
+import re
+import time
+
+from gemini_json import extract_json, parse_response
+
+RFQ = '{"service_product_type": "CNC Machining", "implied_urgency": "High", "key_specifications": ["6061 aluminum", "+/- 0.01 mm", "500 units"]}'
+INSIGHTS = ('[{"insight_id": "INS001", "insight_title": "RFQ demand for CNC", "insight_explanation": "CNC leads RFQs {42%}."}, '
+            '{"insight_id": "INS002", "insight_title": "Negative feedback on speed", "insight_explanation": "Users cite slow quotes."}]')
+RESPONSES = [
+    ('plain', 'RFQ Analysis', RFQ),
+    ('fenced', 'RFQ Analysis', f'```json\n{RFQ}\n```'),
+    ('prose around', 'RFQ Analysis', f'Here is the analysis:\n{RFQ}\nLet me know if you need more.'),
+    ('fenced list + notes', 'Strategic Insights', f'```json\n{INSIGHTS}\n```\nThese insights suggest focusing on CNC demand.'),
+    ('trailing comma', 'RFQ Analysis', RFQ[:-1] + ',}'),
+    ('truncated list', 'Strategic Insights', INSIGHTS[:-40]),
+    ('refusal', 'RFQ Analysis', "I'm sorry, but I can't determine the product type from this RFQ."),
+]
+
+
+def legacy_clean(text_response):
+    """The previous regex-based cleaner (first non-greedy {...} or [...] match, else "{}")."""
+    if not text_response: return "{}"
+    match_markdown = re.search(r"```(?:json)?\s*(\{.*?\}|\[.*?\])\s*```", text_response, re.DOTALL)
+    json_str = match_markdown.group(1) if match_markdown else \
+               (re.search(r'(\{.*?\})|(\[.*?\])', text_response, re.DOTALL).group(0) if re.search(r'(\{.*?\})|(\[.*?\])', text_response, re.DOTALL) else None)
+    if not json_str:
+        return "{}"
+    try:
+        json.loads(json_str)
+        return json_str
+    except json.JSONDecodeError:
+        return "{}"
+
+
+def time_per_call(function, args, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function(*args)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5000, help="Calls per response and parser")
+    args = parser.parse_args()
+    print(f"{'response':<22}{'extract_json us':>17}{'parse_response us':>19}{'regex cleaner us':>18}")
+    totals = [0.0, 0.0, 0.0]
+    for label, task_name, text in RESPONSES:
+        row = [time_per_call(extract_json, (text,), args.rounds), time_per_call(parse_response, (text, task_name), args.rounds),
+               time_per_call(legacy_clean, (text,), args.rounds)]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{label:<22}{row[0]:>17.1f}{row[1]:>19.1f}{row[2]:>18.1f}")
+    print(f"{'mean':<22}" + ''.join(f"{total / len(RESPONSES):>{width}.1f}" for total, width in zip(totals, (17, 19, 18))))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import os
+from table_io import write_table, table_path
 
 # --- Configuration ---
 COMMODITIES_TO_TRACK = {
@@ -14,7 +15,8 @@ COMMODITIES_TO_TRACK = {
 }
 END_DATE = datetime.now()
 START_DATE = END_DATE - timedelta(days=5*365) # Ajuste para o período desejado, ex: 1 ano para testes mais rápidos
-OUTPUT_FILENAME = "commodity_prices_en.csv"
+OUTPUT_FORMAT = 'csv' # 'csv' (utf-8-sig) or 'parquet' (Date stored as a real date type)
+OUTPUT_FILENAME = table_path("commodity_prices_en", OUTPUT_FORMAT)
 
 def download_commodity_data(tickers_dict, start_date, end_date):
     all_commodity_data_list = [] # Renomeado para evitar confusão com o DataFrame final
@@ -92,7 +94,7 @@ if __name__ == "__main__":
         try:
             df_melted = df_commodities.melt(id_vars=['Date'], var_name='Commodity', value_name='Price')
             df_melted.dropna(subset=['Price'], inplace=True) # Remove any rows that might still be all NaN for Price
-            df_melted.to_csv(output_file_path, index=False, encoding='utf-8-sig')
+            write_table(df_melted, output_file_path)
             print(f"\nCommodity data saved to '{output_file_path}' in long format.")
             print(f"Total rows in melted data: {len(df_melted)}")
         except KeyError as e_melt:
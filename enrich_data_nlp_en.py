@@ -1,192 +1,472 @@
-import pandas as pd
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import nltk
+import atexit
+from collections import Counter
 import os
-from dotenv import load_dotenv
 import time
 import json
-import re
-
-# --- NLTK Resource Download ---
-try:
-    print("Checking/downloading NLTK resources (vader_lexicon, punkt)...")
-    nltk.download('vader_lexicon', quiet=True)
-    nltk.download('punkt', quiet=True)
-    print("NLTK resources checked/downloaded.")
-except Exception as e:
-    print(f"An error occurred during NLTK resource download: {e}. Please ensure NLTK resources are available.")
+from startup_profile import StartupProfiler, parse_startup_args, ensure_nltk_resources
+
+# --- Startup: only what this run needs is imported / initialized; --profile-startup times each step ---
+args = parse_startup_args("Enrich users and interactions with VADER sentiment and Gemini analyses.")
+startup = StartupProfiler(enabled=args.profile_startup)
+with startup.step("import pandas"):
+    import pandas as pd
+with startup.step("import python-dotenv"):
+    from dotenv import load_dotenv
+with startup.step("import pipeline modules"):
+    from table_io import read_table, write_table, table_path, resolve_table_path, iter_table_chunks, table_columns, ChunkedTableWriter
+    from table_schema import text_columns
+    from gemini_client import AsyncGeminiClient
+    from llm_cache import LLMCache, LLM_CACHE_PATH
+    from llm_telemetry import LLMTelemetry, LLM_TELEMETRY_STEM
+    from enrichment_planner import (TaskPlan, ResultMemo, print_dedup_summary, add_plan_counts, load_previous_results,
+                                    carry_over_results)
+    from gemini_batching import BatchTask, run_batched_tasks
+    from gemini_json import parse_response, to_json
+    from rfq_rules import extract_rfq, rfq_record
+    from enrichment_columns import flatten_results, child_tables, load_typed_results
+    from enrichment_journal import EnrichmentJournal, ENRICHMENT_JOURNAL_PATH, input_fingerprint
+with startup.step("import vaderSentiment"):
+    from vader_bulk import VaderBulkScorer
+
+# --- NLTK data: VADER scoring uses the lexicon bundled with vaderSentiment, so nothing is downloaded unless asked ---
+if args.download_nltk:
+    with startup.step("NLTK resources (download)"):
+        ensure_nltk_resources(['vader_lexicon', 'punkt'], download=True)
 
 # --- Configuration ---
 USE_GEMINI_FOR_ADVANCED_ANALYSIS = True # <<< SET TO TRUE AS REQUESTED
-DELAY_BETWEEN_GEMINI_CALLS_SECONDS = 2.1
-BATCH_SIZE_PER_CATEGORY = 5 # <<< REDUCED BATCH SIZE FOR FOCUSED TESTING of insights part
+GEMINI_BACKEND = os.getenv('GEMINI_BACKEND', 'google') # 'google' = Gemini API; 'fake' = offline stand-in from fake_gemini.py (no key or quota; FAKE_GEMINI_* env vars)
+# The four settings below can be overridden by environment variables of the same name (used by benchmark_enrichment.py)
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 16)) # Ceiling for requests in flight; the adaptive controller starts at half
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', 30)) # Quota of the model below; enforced by a token bucket instead of fixed sleeps
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', 15000)) or None # None (or 0 in the environment) = no token budget
+GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE', 20)) # Max RFQs / capability texts packed into one prompt (shrunk to fit max_output_tokens); 1 = one prompt per item
+GEMINI_ADAPTIVE_CONCURRENCY = True # AIMD: grow concurrency while calls succeed, halve it on 429s / timeouts / latency spikes; False = fixed at the ceiling
+GEMINI_MAX_RETRIES = 4 # Attempts per prompt (jittered exponential back-off, or the server's retry hint)
+GEMINI_REQUEST_TIMEOUT_SECONDS = 120 # A call taking longer counts as a timeout (retried, and cuts concurrency)
+GEMINI_CIRCUIT_BREAKER_FAILURES = 10 # Consecutive failed calls after which the remaining prompts fail fast instead of burning quota
+USE_RFQ_RULES = True # Analyse RFQs with the local rule-based extractor (rfq_rules.py) first; only texts it is unsure about go to Gemini
+RFQ_RULES_MIN_CONFIDENCE = 0.7 # Extractions below this confidence are escalated to Gemini (kept as they are when Gemini is off)
+GEMINI_BATCH_MAX_ROUNDS = 3 # Items missing or malformed in a batch answer are retried in smaller batches, up to this many rounds
+OUTPUT_FORMAT = 'csv' # 'csv' (utf-8-sig) or 'parquet'; inputs are read in whichever format the generator wrote
+ENRICHMENT_MODE = 'memory' # 'memory' = load whole tables; 'stream' = read, enrich and write ENRICHMENT_CHUNK_SIZE rows at a time (flat memory)
+ENRICHMENT_CHUNK_SIZE = 200_000 # Rows per chunk in stream mode (also used to read previous outputs)
+ENRICHMENT_COLUMNS = 'typed' # 'typed' = flattened typed columns + exploded child tables for list fields; 'json' = JSON string columns; 'both'
+GEMINI_MEMO_SIZE = 100_000 # Distinct analysed texts remembered across chunks, so later chunks don't resend them
+USE_LLM_CACHE = True # Reuse Gemini responses for prompts already answered (same model + generation config)
+LLM_CACHE_ONLY = False # True = answer only from the cache, never call the API (no API key needed)
+LLM_CACHE_TTL_DAYS = 30 # None = entries never expire
+LLM_CACHE_MAX_SIZE_MB = 200 # Least recently used entries are evicted beyond this; None = unbounded
+LLM_TELEMETRY = True # Log every Gemini attempt / cache or dedup answer (sizes, tokens, latency, error class) to llm_call_log in OUTPUT_FORMAT
+GEMINI_PRICE_PER_MILLION_TOKENS = (0.10, 0.40) # USD per 1M (input, output) tokens for the telemetry's cost estimate; example rates, set your model's
+VADER_PROCESSES = None # Worker processes for bulk VADER scoring (None = all CPUs; 1 = in-process)
+VADER_MEMO_SIZE = 100_000 # Distinct feedback texts kept in the VADER LRU memo
+INCREMENTAL_ENRICHMENT = True # Carry results over from the previous enriched outputs for rows whose ID and text are unchanged
+USE_ENRICHMENT_JOURNAL = True # Checkpoint Gemini results as they arrive; a rerun after a crash resumes from the journal
+ENRICHMENT_JOURNAL_FLUSH_EVERY = 200 # Journal records buffered before they are written (also flushed every few seconds)
+RUN_STATS_PATH = os.getenv('ENRICHMENT_RUN_STATS') # If set, rows, calls, retries and wall time of the run are written there as JSON
+
+run_started = time.perf_counter()
 
 # --- Load environment variables ---
-load_dotenv()
+with startup.step("load .env"):
+    load_dotenv()
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
-# --- VADER Sentiment Analyzer ---
-vader_analyzer = SentimentIntensityAnalyzer()
+# --- VADER Sentiment Analyzer (bulk: dedup + LRU memo + process pool, see vader_bulk.py) ---
+vader_scorer = VaderBulkScorer(processes=VADER_PROCESSES, memo_size=VADER_MEMO_SIZE)
 
 # --- Gemini Model Configuration (conditionally initialized) ---
-gemini_model = None
-if USE_GEMINI_FOR_ADVANCED_ANALYSIS:
-    if not GOOGLE_API_KEY:
-        print("CRITICAL WARNING: Google API Key not found, but USE_GEMINI_FOR_ADVANCED_ANALYSIS is True.")
-        print("Gemini calls WILL FAIL. Set USE_GEMINI_FOR_ADVANCED_ANALYSIS to False or provide a valid API Key.")
-        USE_GEMINI_FOR_ADVANCED_ANALYSIS = False # Force disable if no key
-    else:
+# Try Gemma first as per previous discussion, if it fails due to quota, you might need to switch
+MODEL_NAME_GEMINI = "models/gemma-3-4b-it" # Or "models/gemini-1.5-flash-latest" if Gemma is problematic
+# MODEL_NAME_GEMINI = "models/gemini-1.5-flash-latest" # Fallback if Gemma is too restrictive
+generation_config_gemini = {"temperature": 0.4, "top_p": 1, "top_k": 1, "max_output_tokens": 2048} # Increased tokens for insights
+safety_settings_gemini = [
+    {"category": c, "threshold": "BLOCK_MEDIUM_AND_ABOVE"} for c in
+    ["HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]
+]
+
+# Responses are cached on disk by hash of (model, generation config, prompt); see llm_cache.py
+# Fake-backend answers are cached under their own model name, so they never stand in for real ones
+with startup.step("LLM cache"):
+    llm_cache = LLMCache(LLM_CACHE_PATH, model_name=MODEL_NAME_GEMINI if GEMINI_BACKEND == 'google' else f"{GEMINI_BACKEND}:{MODEL_NAME_GEMINI}",
+                         generation_config=generation_config_gemini,
+                         ttl_seconds=LLM_CACHE_TTL_DAYS * 86400 if LLM_CACHE_TTL_DAYS else None,
+                         max_size_mb=LLM_CACHE_MAX_SIZE_MB) if USE_LLM_CACHE or LLM_CACHE_ONLY else None
+
+def build_gemini_model():
+    """
+    Imports the SDK and builds the model. Called by the client for the first prompt that isn't
+    answered from the cache, so runs with no Gemini work pending never import google.generativeai.
+    """
+    with startup.step(f"Gemini model ({GEMINI_BACKEND})"):
+        if GEMINI_BACKEND == 'fake':
+            from fake_gemini import FakeGenerativeModel
+            model = FakeGenerativeModel.from_env(model_name=MODEL_NAME_GEMINI, generation_config=generation_config_gemini,
+                                                 safety_settings=safety_settings_gemini)
+            print(f"Using the offline fake Gemini backend (median latency {model.latency_seconds}s, "
+                  f"429 rate {model.rate_limit_rate}, malformed rate {model.malformed_rate}).")
+            return model
         try:
             import google.generativeai as genai
             genai.configure(api_key=GOOGLE_API_KEY)
-            generation_config_gemini = {"temperature": 0.4, "top_p": 1, "top_k": 1, "max_output_tokens": 2048} # Increased tokens for insights
-            safety_settings_gemini = [
-                {"category": c, "threshold": "BLOCK_MEDIUM_AND_ABOVE"} for c in
-                ["HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]
-            ]
-            # Try Gemma first as per previous discussion, if it fails due to quota, you might need to switch
-            MODEL_NAME_GEMINI = "models/gemma-3-4b-it" # Or "models/gemini-1.5-flash-latest" if Gemma is problematic
-            # MODEL_NAME_GEMINI = "models/gemini-1.5-flash-latest" # Fallback if Gemma is too restrictive
-
-            gemini_model = genai.GenerativeModel(
+            model = genai.GenerativeModel(
                 model_name=MODEL_NAME_GEMINI,
                 generation_config=generation_config_gemini,
                 safety_settings=safety_settings_gemini
             )
             print(f"Successfully initialized Gemini model: {MODEL_NAME_GEMINI}")
+            return model
         except Exception as e:
             print(f"Error initializing Gemini model {MODEL_NAME_GEMINI}: {e}")
-            print("Disabling Gemini for advanced analysis for this run.")
-            USE_GEMINI_FOR_ADVANCED_ANALYSIS = False
-
-def clean_gemini_json_response(text_response):
-    if not text_response: return "{}"
-    match_markdown = re.search(r"```(?:json)?\s*(\{.*?\}|\[.*?\])\s*```", text_response, re.DOTALL) # Regex to match object or array
-    json_str = match_markdown.group(1) if match_markdown else \
-               (re.search(r'(\{.*?\})|(\[.*?\])', text_response, re.DOTALL).group(0) if re.search(r'(\{.*?\})|(\[.*?\])', text_response, re.DOTALL) else None) # Try to find object or array
-    if not json_str:
-        # print(f"DEBUG (clean_fn): No JSON structure found in response: {text_response[:100]}")
-        return "{}"
-    try:
-        json.loads(json_str) # Validate
-        return json_str
-    except json.JSONDecodeError:
-        # print(f"DEBUG (clean_fn): Extracted content is not valid JSON after cleaning: {json_str[:100]}")
-        return "{}"
+            print("Gemini prompts of this run fail (the client's circuit breaker opens at once).")
+            raise
+
+gemini_client = llm_telemetry = None
+if USE_GEMINI_FOR_ADVANCED_ANALYSIS:
+    if LLM_CACHE_ONLY:
+        print(f"LLM cache-only mode: Gemini answers come from {LLM_CACHE_PATH}; the API is never called.")
+    elif GEMINI_BACKEND != 'fake' and not GOOGLE_API_KEY:
+        print("CRITICAL WARNING: Google API Key not found, but USE_GEMINI_FOR_ADVANCED_ANALYSIS is True.")
+        print("Gemini calls WILL FAIL. Set USE_GEMINI_FOR_ADVANCED_ANALYSIS to False or provide a valid API Key.")
+        USE_GEMINI_FOR_ADVANCED_ANALYSIS = False # Force disable if no key
+    if USE_GEMINI_FOR_ADVANCED_ANALYSIS: # The client is cheap; the model behind it is built on first use
+        if LLM_TELEMETRY:
+            llm_telemetry = LLMTelemetry(table_path(LLM_TELEMETRY_STEM, OUTPUT_FORMAT), price_per_million_tokens=GEMINI_PRICE_PER_MILLION_TOKENS)
+        gemini_client = AsyncGeminiClient(None, model_factory=None if LLM_CACHE_ONLY else build_gemini_model, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                                          requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+                                          tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+                                          expected_output_tokens=generation_config_gemini["max_output_tokens"] // 4,
+                                          max_retries=GEMINI_MAX_RETRIES, timeout_seconds=GEMINI_REQUEST_TIMEOUT_SECONDS,
+                                          adaptive_concurrency=GEMINI_ADAPTIVE_CONCURRENCY, breaker_failures=GEMINI_CIRCUIT_BREAKER_FAILURES,
+                                          cache=llm_cache, cache_only=LLM_CACHE_ONLY, telemetry=llm_telemetry)
+
+def clean_gemini_json_response(text_response, task_name=None):
+    """Validated JSON string of a response, checked against the task's schema (see gemini_json.py); "{}" if nothing usable."""
+    return to_json(parse_response(text_response, task_name))
+
+def call_gemini_api_many(prompts, task_names="API Call", on_result=None):
+    """
+    Runs prompts concurrently through the rate-limited async client; returns cleaned JSON strings in order.
+    `on_result(i, raw_text)` is called as each prompt completes.
+    """
+    if not USE_GEMINI_FOR_ADVANCED_ANALYSIS or not gemini_client:
+        print(f"DEBUG ({task_names if isinstance(task_names, str) else 'batch'}): Gemini call skipped (not configured or disabled).")
+        return ["{}"] * len(prompts)
+    print(f"\nAttempting {len(prompts)} Gemini call(s), {gemini_client.controller.status()}...")
+    names = [task_names] * len(prompts) if isinstance(task_names, str) else task_names
+    return [clean_gemini_json_response(text, name) for text, name in zip(gemini_client.run(prompts, task_names, on_result=on_result), names)]
 
 def call_gemini_api(prompt_text, task_name="API Call"):
-    if not USE_GEMINI_FOR_ADVANCED_ANALYSIS or not gemini_model:
-        print(f"DEBUG ({task_name}): Gemini call skipped (not configured or disabled).")
-        return "{}"
-    max_retries = 2; initial_retry_delay = 3; current_retry_delay = initial_retry_delay
-    print(f"\nAttempting Gemini {task_name}...")
-    for attempt in range(max_retries):
-        try:
-            response = gemini_model.generate_content(prompt_text)
-            time.sleep(DELAY_BETWEEN_GEMINI_CALLS_SECONDS)
-            if response.candidates and response.candidates[0].content.parts:
-                # print(f"DEBUG ({task_name}): Raw Gemini Response part: {response.text[:300]}") # Print start of raw response
-                cleaned = clean_gemini_json_response(response.text)
-                # print(f"DEBUG ({task_name}): Cleaned Gemini Response: {cleaned[:300]}")
-                return cleaned
-            # print(f"DEBUG ({task_name}): Gemini response was empty or malformed (no parts).")
-            return "{}"
-        except Exception as e:
-            print(f"Error calling Gemini API for {task_name} (attempt {attempt + 1}/{max_retries}): {e}")
-            time.sleep(DELAY_BETWEEN_GEMINI_CALLS_SECONDS)
-            if "429" in str(e) or "rate limit" in str(e).lower(): current_retry_delay += (attempt + 1) * 2
-            if attempt < max_retries - 1: time.sleep(current_retry_delay)
-            else:
-                print(f"Max retries reached for {task_name}.")
-                return "{}"
+    return call_gemini_api_many([prompt_text], task_name)[0]
 
-def get_vader_sentiment_analysis_results(text):
-    if not text or pd.isna(text):
+def vader_sentiment_record(scores):
+    """JSON record stored per user for a text's VaderScores (None = no feedback text)."""
+    if scores is None:
         return {"sentiment_label": "Not specified", "keywords": [], "compound_score": 0.0, "positive_score":0.0, "negative_score":0.0, "neutral_score":0.0}
-    vs = vader_analyzer.polarity_scores(text)
-    label = "Neutral"
-    if vs['compound'] >= 0.05: label = "Positive"
-    elif vs['compound'] <= -0.05: label = "Negative"
-    return {"sentiment_label": label, "keywords": [], "compound_score": round(vs['compound'], 4),
-            "positive_score":round(vs['pos'],4), "negative_score":round(vs['neg'],4), "neutral_score":round(vs['neu'],4)}
-
-# --- Load DataFrames ---
+    return {"sentiment_label": scores.label, "keywords": [], "compound_score": scores.compound,
+            "positive_score": scores.pos, "negative_score": scores.neg, "neutral_score": scores.neu}
+
+# --- Inputs ---
 try:
-    df_users = pd.read_csv('user_details_en.csv')
-    df_interactions = pd.read_csv('marketing_interactions_en.csv')
-    df_campaigns = pd.read_csv('campaign_details_en.csv')
+    users_input = resolve_table_path('user_details_en') # Auto-detects user_details_en.parquet / .csv
+    interactions_input = resolve_table_path('marketing_interactions_en')
+    df_campaigns = read_table('campaign_details_en')
+    print(f"Inputs: {users_input}, {interactions_input}, {resolve_table_path('campaign_details_en')} (mode: {ENRICHMENT_MODE}).")
 except FileNotFoundError as e:
-    print(f"Error: CSV file not found: {e}. Please run generate_mock_data_en.py first.")
+    print(f"Error: input table not found: {e}. Please run generate_mock_data_en.py first.")
     exit()
 
-df_users['vader_sentiment_analysis_json'] = "{}"
-df_users['gemini_supplier_capability_json'] = "{}"
-df_interactions['gemini_rfq_analysis_json'] = "{}"
-
-# --- Prepare for Round-Robin Processing ---
-user_feedback_indices = df_users[df_users['user_feedback_text'].notna()].index.tolist()
-supplier_capability_indices = df_users[df_users['supplier_capabilities_text'].notna() & (df_users['user_type'] == 'Supplier')].index.tolist() if USE_GEMINI_FOR_ADVANCED_ANALYSIS else []
-rfq_interaction_indices = df_interactions[(df_interactions['event_name'] == 'RFQ Submitted') & (df_interactions['interaction_details_text'].notna())].index.tolist() if USE_GEMINI_FOR_ADVANCED_ANALYSIS else []
-
-ptr_feedback, ptr_capability, ptr_rfq = 0, 0, 0
-total_vader_processed, total_gemini_calls = 0, 0
-
-print(f"Starting NLP enrichment. VADER for sentiment. Gemini for advanced analysis (if enabled: {USE_GEMINI_FOR_ADVANCED_ANALYSIS}).")
-print(f"Batch size for Gemini tasks: {BATCH_SIZE_PER_CATEGORY}")
-
-# --- Round-Robin Processing Loop for User Feedback (VADER) and optional Gemini tasks ---
-# For focused testing of insights, we can temporarily skip these loops or run very small batches
+output_path_users = table_path('user_details_enriched_en', OUTPUT_FORMAT)
+output_path_interactions = table_path('marketing_interactions_enriched_en', OUTPUT_FORMAT)
+output_path_insights = table_path('strategic_insights_en', OUTPUT_FORMAT)
+output_path_tasks = table_path('actionable_tasks_en', OUTPUT_FORMAT)
+
+# --- Checkpoint journal: Gemini results already paid for (by an interrupted run on the same inputs) are reused ---
+with startup.step("enrichment journal"):
+    journal = EnrichmentJournal(ENRICHMENT_JOURNAL_PATH, fingerprint=input_fingerprint([users_input, interactions_input], model=MODEL_NAME_GEMINI, backend=GEMINI_BACKEND),
+                                flush_every=ENRICHMENT_JOURNAL_FLUSH_EVERY) if USE_ENRICHMENT_JOURNAL else None
+if journal is not None:
+    atexit.register(journal.close) # Flush buffered records on Ctrl-C / crash too
+
+# --- Incremental mode: results of the previous enriched outputs, reused for rows whose ID and text hash are unchanged ---
+def load_previous_output(stem, id_column, text_column, result_column):
+    if not INCREMENTAL_ENRICHMENT:
+        return None
+    try:
+        frames = None
+        if result_column not in table_columns(stem): # Written with typed columns only: rebuild the JSON results from them
+            frames = [load_typed_results(stem, id_column, text_column, result_column, chunksize=ENRICHMENT_CHUNK_SIZE)]
+        previous = load_previous_results(stem, id_column, text_column, result_column, chunksize=ENRICHMENT_CHUNK_SIZE, frames=frames)
+        print(f"Incremental enrichment: {len(previous)} previous {result_column} results in {resolve_table_path(stem)}.")
+        return previous
+    except (FileNotFoundError, ValueError, KeyError) as e: # No previous run, or an output without these columns
+        print(f"Incremental enrichment: no usable previous {result_column} in {stem} ({e}); enriching all rows.")
+        return None
+
+with startup.step("previous outputs (incremental)"):
+    previous_feedback = load_previous_output('user_details_enriched_en', 'user_id', 'user_feedback_text', 'vader_sentiment_analysis_json')
+    previous_capabilities = load_previous_output('user_details_enriched_en', 'user_id', 'supplier_capabilities_text', 'gemini_supplier_capability_json')
+    previous_rfqs = load_previous_output('marketing_interactions_enriched_en', 'interaction_id', 'interaction_details_text', 'gemini_rfq_analysis_json')
+
+total_vader_processed, total_vader_distinct_texts, total_gemini_calls = 0, 0, 0 # VADER: rows scored / distinct texts actually scored
+rows_enriched = Counter() # 'users' / 'interactions' -> rows that went through enrich_rows
+carried_counts = {'feedback': 0, 'capabilities': 0, 'rfqs': 0}
+rfq_rule_counts = Counter() # 'local' / 'escalated' -> distinct RFQ texts answered by rfq_rules.py / sent on to Gemini
+dedup_counts = {} # Task name -> PlanCounts, summed over chunks
+gemini_memo = ResultMemo(GEMINI_MEMO_SIZE) # (task, normalized text) -> result, shared by all chunks
+
+capability_example = {"capability_summary": "concise summary (1-2 sentences)", "main_categories": ["cat1", "cat2", "cat3"]}
+rfq_example = {"service_product_type": "type", "implied_urgency": "High/Medium/Low/Not specified", "key_specifications": ["spec1", "spec2"]}
+rfq_hints = "Urgency hints: High (ASAP, urgent), Medium (soon), Low (budgetary)."
+
+# For focused testing of insights, we can temporarily skip the enrichment passes
 run_initial_enrichment_loops = True # Set to False to quickly get to insights generation
 
-if run_initial_enrichment_loops:
-    while True:
-        processed_in_current_round = 0
-        vader_batch_size = BATCH_SIZE_PER_CATEGORY * 2
-        batch_end_feedback = min(ptr_feedback + vader_batch_size, len(user_feedback_indices))
-        for i in range(ptr_feedback, batch_end_feedback):
-            idx = user_feedback_indices[i]; vader_result = get_vader_sentiment_analysis_results(df_users.loc[idx, 'user_feedback_text'])
-            df_users.at[idx, 'vader_sentiment_analysis_json'] = json.dumps(vader_result)
-            processed_in_current_round += 1; total_vader_processed += 1
-        ptr_feedback = batch_end_feedback
-        if ptr_feedback > 0 and (ptr_feedback % (vader_batch_size * 2) == 0 or ptr_feedback == len(user_feedback_indices)):
-            print(f"... VADER sentiment processed for {ptr_feedback} users.")
-
+def run_gemini_tasks(gemini_tasks):
+    """
+    Runs the Gemini passes for (task name, keys, texts, item IDs) tuples (distinct texts of a plan, or the
+    part of them that still needs Gemini) and returns one result list per task, aligned with its texts.
+    Items already in the journal or the run memo are not sent; the rest share one request queue
+    (batched prompts, or one prompt per item).
+    """
+    global total_gemini_calls
+    known, pending = {}, {}
+    for task_name, keys, texts, item_ids in gemini_tasks:
+        done = journal.results(task_name) if journal is not None else {}
+        for item_id, key, text in zip(item_ids, keys, texts):
+            result, source = done.get(item_id), 'journal'
+            if not result:
+                result, source = gemini_memo.get((task_name, key)), 'memo'
+            if result is not None:
+                known[(task_name, item_id)] = result
+                if llm_telemetry is not None:
+                    llm_telemetry.record(task_name, source)
+            else:
+                pending.setdefault(task_name, {})[item_id] = text
+
+    def record(task_name, item_id, result):
+        known[(task_name, item_id)] = result
+        if journal is not None and result != "{}": # Failures aren't journaled, so a rerun retries them
+            journal.record(task_name, item_id, result)
+
+    if GEMINI_BATCH_SIZE > 1:
+        batch_tasks = []
+        if pending.get("Supplier Capabilities"):
+            batch_tasks.append(BatchTask("Supplier Capabilities", "Analyze supplier capabilities.", capability_example, pending["Supplier Capabilities"]))
+        if pending.get("RFQ Analysis"):
+            batch_tasks.append(BatchTask("RFQ Analysis", f"Analyze RFQs (requests for quote). {rfq_hints}", rfq_example, pending["RFQ Analysis"]))
+        if batch_tasks and gemini_client is not None:
+            total_gemini_calls += run_batched_tasks(gemini_client, batch_tasks, generation_config_gemini["max_output_tokens"],
+                                                    max_batch_size=GEMINI_BATCH_SIZE, max_rounds=GEMINI_BATCH_MAX_ROUNDS,
+                                                    on_result=lambda task, item_id, result: record(task.name, item_id, result))
+    else:
+        # Both passes share one request queue, so the async client keeps the quota busy with either kind of item
+        jobs = [("Supplier Capabilities", item_id, f"""Analyze supplier capabilities: "{text}".
+            Return JSON ONLY: {json.dumps(capability_example)}. Respond in English.""")
+            for item_id, text in pending.get("Supplier Capabilities", {}).items()]
+        jobs += [("RFQ Analysis", item_id, f"""Analyze RFQ: "{text}".
+            Return JSON ONLY: {json.dumps(rfq_example)}.
+            {rfq_hints} Respond in English.""")
+            for item_id, text in pending.get("RFQ Analysis", {}).items()]
+        if jobs:
+            call_gemini_api_many([job[2] for job in jobs], [job[0] for job in jobs],
+                                 on_result=lambda i, text: record(jobs[i][0], jobs[i][1], clean_gemini_json_response(text, jobs[i][0])))
+            total_gemini_calls += len(jobs)
+
+    all_results = []
+    for task_name, keys, texts, item_ids in gemini_tasks:
+        results = [known.get((task_name, item_id), "{}") for item_id in item_ids]
+        for key, result in zip(keys, results):
+            if result != "{}":
+                gemini_memo.put((task_name, key), result)
+        all_results.append(results)
+    return all_results
+
+def enrich_rows(df_users=None, df_interactions=None):
+    """
+    Adds the enrichment JSON columns to a users and/or interactions frame, in place: a whole table in
+    memory mode, or one chunk in streaming mode. Rows carried over from the previous outputs are skipped;
+    the others are deduplicated per task before VADER / Gemini see them.
+    """
+    global total_vader_processed, total_vader_distinct_texts
+    plans, gemini_tasks, assignments = [], [], []
+    if df_users is not None:
+        rows_enriched['users'] += len(df_users)
+        df_users['vader_sentiment_analysis_json'] = "{}"
+        df_users['gemini_supplier_capability_json'] = "{}"
+    if df_interactions is not None:
+        rows_enriched['interactions'] += len(df_interactions)
+        df_interactions['gemini_rfq_analysis_json'] = "{}"
+    if not run_initial_enrichment_loops:
+        return
+
+    if df_users is not None:
+        feedback_carried = carry_over_results(df_users, previous_feedback, 'user_id', 'user_feedback_text', 'vader_sentiment_analysis_json')
+        capability_carried = carry_over_results(df_users, previous_capabilities, 'user_id', 'supplier_capabilities_text', 'gemini_supplier_capability_json')
+        carried_counts['feedback'] += int(feedback_carried.sum())
+        carried_counts['capabilities'] += int(capability_carried.sum())
+        # Dedup plan: each task analyses every distinct (normalized) text once, then fans the result out to its rows
+        feedback_plan = TaskPlan('VADER feedback sentiment',
+                                 df_users.loc[df_users['user_feedback_text'].notna() & ~feedback_carried, 'user_feedback_text'], normalize=False)
+        vader_results = vader_scorer.json_column(pd.Series(feedback_plan.unique_texts, dtype=object), vader_sentiment_record)
+        feedback_plan.assign(df_users, 'vader_sentiment_analysis_json', vader_results.to_numpy())
+        total_vader_processed += len(feedback_plan.codes)
+        total_vader_distinct_texts += len(vader_results)
+        plans.append(feedback_plan)
         if USE_GEMINI_FOR_ADVANCED_ANALYSIS:
-            batch_end_capability = min(ptr_capability + BATCH_SIZE_PER_CATEGORY, len(supplier_capability_indices))
-            for i in range(ptr_capability, batch_end_capability):
-                idx = supplier_capability_indices[i]; row = df_users.loc[idx]
-                print(f"GEMINI (Caps): User {row['user_id']} ({ptr_capability+1}/{len(supplier_capability_indices)})")
-                prompt_capabilities = f"""Analyze supplier capabilities: "{row['supplier_capabilities_text']}".
-                Return JSON ONLY: {{"capability_summary": "concise summary (1-2 sentences)", "main_categories": ["cat1", "cat2", "cat3"]}}. Respond in English."""
-                df_users.at[idx, 'gemini_supplier_capability_json'] = call_gemini_api(prompt_capabilities, "Supplier Capabilities")
-                processed_in_current_round += 1; total_gemini_calls += 1
-            ptr_capability = batch_end_capability
-
-            batch_end_rfq = min(ptr_rfq + BATCH_SIZE_PER_CATEGORY, len(rfq_interaction_indices))
-            for i in range(ptr_rfq, batch_end_rfq):
-                idx = rfq_interaction_indices[i]; row = df_interactions.loc[idx]
-                print(f"GEMINI (RFQ): Interaction {row['interaction_id']} ({ptr_rfq+1}/{len(rfq_interaction_indices)})")
-                prompt_rfq = f"""Analyze RFQ: "{row['interaction_details_text']}".
-                Return JSON ONLY: {{"service_product_type": "type", "implied_urgency": "High/Medium/Low/Not specified", "key_specifications": ["spec1", "spec2"]}}.
-                Urgency hints: High (ASAP, urgent), Medium (soon), Low (budgetary). Respond in English."""
-                df_interactions.at[idx, 'gemini_rfq_analysis_json'] = call_gemini_api(prompt_rfq, "RFQ Analysis")
-                processed_in_current_round += 1; total_gemini_calls += 1
-            ptr_rfq = batch_end_rfq
-
-        all_feedback_done = ptr_feedback >= len(user_feedback_indices)
-        all_capabilities_done = not USE_GEMINI_FOR_ADVANCED_ANALYSIS or ptr_capability >= len(supplier_capability_indices)
-        all_rfqs_done = not USE_GEMINI_FOR_ADVANCED_ANALYSIS or ptr_rfq >= len(rfq_interaction_indices)
-
-        if all_feedback_done and all_capabilities_done and all_rfqs_done:
-            print("Initial enrichment loops completed.")
-            break
-        if processed_in_current_round == 0 and not (all_feedback_done and all_capabilities_done and all_rfqs_done):
-            # This condition means one or more lists still have items, but the current batch size didn't pick any up.
-            # This can happen if one list is much shorter. The main 'break' above will handle full completion.
-            # print(f"--- End of Round (partial completion) ---")
-            pass # Continue to next round
+            capability_plan = TaskPlan('Gemini supplier capabilities', df_users.loc[
+                df_users['supplier_capabilities_text'].notna() & (df_users['user_type'] == 'Supplier') & ~capability_carried, 'supplier_capabilities_text'])
+            # Items are keyed by the user_id / interaction_id of the row their text came from (batch tags and journal records)
+            gemini_tasks.append(("Supplier Capabilities", capability_plan.keys, capability_plan.unique_texts,
+                                  df_users.loc[capability_plan.first_index, 'user_id'].astype(str).tolist()))
+            assignments.append((capability_plan, df_users, 'gemini_supplier_capability_json', ["{}"] * capability_plan.num_unique,
+                                range(capability_plan.num_unique)))
+            plans.append(capability_plan)
+
+    if df_interactions is not None and (USE_GEMINI_FOR_ADVANCED_ANALYSIS or USE_RFQ_RULES):
+        rfq_carried = carry_over_results(df_interactions, previous_rfqs, 'interaction_id', 'interaction_details_text', 'gemini_rfq_analysis_json')
+        carried_counts['rfqs'] += int(rfq_carried.sum())
+        rfq_plan = TaskPlan('RFQ analysis', df_interactions.loc[
+            (df_interactions['event_name'] == 'RFQ Submitted') & df_interactions['interaction_details_text'].notna() & ~rfq_carried, 'interaction_details_text'])
+        rfq_ids = df_interactions.loc[rfq_plan.first_index, 'interaction_id'].astype(str).tolist()
+        rfq_results = ["{}"] * rfq_plan.num_unique
+        escalated = range(rfq_plan.num_unique) if gemini_client is not None else []
+        if USE_RFQ_RULES:
+            # Confident local extractions are final; only the ambiguous texts are escalated to Gemini
+            escalated = []
+            for position, text in enumerate(rfq_plan.unique_texts):
+                extraction = extract_rfq(text)
+                if extraction.confidence >= RFQ_RULES_MIN_CONFIDENCE or gemini_client is None:
+                    rfq_results[position] = to_json(rfq_record(extraction))
+                else:
+                    escalated.append(position)
+            rfq_rule_counts['local'] += rfq_plan.num_unique - len(escalated)
+            rfq_rule_counts['escalated'] += len(escalated)
+        gemini_tasks.append(("RFQ Analysis", [rfq_plan.keys[p] for p in escalated], [rfq_plan.unique_texts[p] for p in escalated],
+                             [rfq_ids[p] for p in escalated]))
+        assignments.append((rfq_plan, df_interactions, 'gemini_rfq_analysis_json', rfq_results, escalated))
+        plans.append(rfq_plan)
+
+    # Gemini results fill the positions each task escalated; the rest of its results are already final
+    for (plan, df, column, results, positions), gemini_results in zip(assignments, run_gemini_tasks(gemini_tasks)):
+        for position, result in zip(positions, gemini_results):
+            results[position] = result
+        plan.assign(df, column, results)
+    add_plan_counts(dedup_counts, plans)
+
+# --- Running aggregates for the strategic-insights summary (updated per table or chunk, so nothing else is kept) ---
+insight_counts = {'rfqs_submitted': 0, 'rfqs_parsed': 0, 'rfq_types': Counter(), 'supplier_categories': Counter(), 'sentiments': Counter()}
+
+def update_insight_counters(df_users=None, df_interactions=None):
+    """Adds a table's (or chunk's) parsed enrichment results to insight_counts; each distinct JSON is parsed once."""
+    def parsed(column):
+        for json_str, count in column.dropna().value_counts(sort=False).items():
+            try:
+                yield json.loads(json_str), count
+            except (TypeError, ValueError):
+                pass
+
+    if df_interactions is not None:
+        rfq_rows = df_interactions['event_name'] == 'RFQ Submitted'
+        insight_counts['rfqs_submitted'] += int(rfq_rows.sum())
+        for data, count in parsed(df_interactions.loc[rfq_rows, 'gemini_rfq_analysis_json']): # Other rows hold the "{}" placeholder
+            if isinstance(data, dict) and data:
+                insight_counts['rfqs_parsed'] += count
+                if data.get('service_product_type'):
+                    insight_counts['rfq_types'][data['service_product_type']] += count
+    if df_users is not None:
+        for data, count in parsed(df_users['gemini_supplier_capability_json']):
+            if isinstance(data, dict) and isinstance(data.get('main_categories', []), list):
+                for category in data.get('main_categories', []):
+                    if category:
+                        insight_counts['supplier_categories'][category] += count
+        for data, count in parsed(df_users['vader_sentiment_analysis_json']):
+            if isinstance(data, dict) and data.get('sentiment_label'):
+                insight_counts['sentiments'][data['sentiment_label']] += count
+
+# --- Output layout: typed columns (and child tables for list fields) and/or the JSON result columns ---
+OUTPUT_JSON_COLUMNS = {'users': ['vader_sentiment_analysis_json', 'gemini_supplier_capability_json'],
+                       'interactions': ['gemini_rfq_analysis_json']}
+child_table_paths = {stem: table_path(stem, OUTPUT_FORMAT) for kind in OUTPUT_JSON_COLUMNS if ENRICHMENT_COLUMNS != 'json'
+                     for json_column in OUTPUT_JSON_COLUMNS[kind] for stem in child_tables(json_column)}
+
+def output_layout(df, kind):
+    """Converts an enriched table or chunk to the configured output layout in place; returns its child-table rows."""
+    children = {}
+    if ENRICHMENT_COLUMNS != 'json':
+        for json_column in OUTPUT_JSON_COLUMNS[kind]:
+            children.update(flatten_results(df, json_column, keep_json=ENRICHMENT_COLUMNS == 'both'))
+    return children
+
+startup.report()
+print(f"Starting NLP enrichment. VADER for sentiment. Gemini for advanced analysis (if enabled: {USE_GEMINI_FOR_ADVANCED_ANALYSIS}).")
+print(f"Gemini client: up to {GEMINI_MAX_CONCURRENCY} requests in flight ({'adaptive' if GEMINI_ADAPTIVE_CONCURRENCY else 'fixed'}), "
+      f"{GEMINI_REQUESTS_PER_MINUTE} requests/min, {GEMINI_TOKENS_PER_MINUTE} tokens/min.")
+
+if ENRICHMENT_MODE == 'stream':
+    # Read, enrich and write one chunk at a time; outputs go to a temporary file first, because the
+    # previous outputs (read above for incremental mode) live at the same paths
+    input_dtypes = {'users': {c: str for c in text_columns('user_details')},
+                    'interactions': {c: str for c in text_columns('marketing_interactions')}}
+    def open_writer(path):
+        tmp_path = f'{path}.tmp'
+        return ChunkedTableWriter(tmp_path if OUTPUT_FORMAT == 'csv' else None, parquet_path=tmp_path if OUTPUT_FORMAT == 'parquet' else None)
+
+    for kind, input_path, output_path in (('users', users_input, output_path_users),
+                                          ('interactions', interactions_input, output_path_interactions)):
+        paths = [output_path] + [child_table_paths[stem] for json_column in OUTPUT_JSON_COLUMNS[kind]
+                                 for stem in child_tables(json_column) if stem in child_table_paths]
+        writers = {path: open_writer(path) for path in paths}
+        try:
+            for chunk_number, chunk in enumerate(iter_table_chunks(input_path, chunksize=ENRICHMENT_CHUNK_SIZE, dtype=input_dtypes[kind]), start=1):
+                if kind == 'users':
+                    enrich_rows(df_users=chunk)
+                    update_insight_counters(df_users=chunk)
+                else:
+                    enrich_rows(df_interactions=chunk)
+                    update_insight_counters(df_interactions=chunk)
+                for stem, child in output_layout(chunk, kind).items():
+                    writers[child_table_paths[stem]].write(child)
+                writers[output_path].write(chunk)
+                print(f"... {kind} chunk {chunk_number}: {writers[output_path].rows_written} rows enriched and written.")
+        finally:
+            for writer in writers.values():
+                writer.close()
+        for path, writer in writers.items():
+            if writer.rows_written:
+                os.replace(f'{path}.tmp', path)
+                print(f"Saved: {path} ({writer.rows_written} rows)")
+            elif os.path.exists(f'{path}.tmp'):
+                os.remove(f'{path}.tmp')
 else:
-    print("Skipping initial enrichment loops to focus on insights/tasks generation.")
+    df_users = read_table(users_input)
+    df_interactions = read_table(interactions_input)
+    enrich_rows(df_users, df_interactions)
+    update_insight_counters(df_users, df_interactions)
+    for kind, df in (('users', df_users), ('interactions', df_interactions)):
+        for stem, child in output_layout(df, kind).items():
+            write_table(child, child_table_paths[stem])
+            print(f"Saved: {child_table_paths[stem]} ({len(child)} rows)")
+    write_table(df_users, output_path_users)
+    print(f"\nSaved: {output_path_users} (VADER analyses: {total_vader_processed} rows, {total_vader_distinct_texts} distinct texts)")
+    write_table(df_interactions, output_path_interactions)
+    print(f"Saved: {output_path_interactions}")
+    del df_users, df_interactions
+
+if INCREMENTAL_ENRICHMENT:
+    print(f"Carried over unchanged results: {carried_counts['feedback']} feedback sentiments, {carried_counts['capabilities']} supplier capabilities, "
+          f"{carried_counts['rfqs']} RFQ analyses.")
+if run_initial_enrichment_loops:
+    print_dedup_summary(list(dedup_counts.values()))
+    if gemini_memo.hits:
+        print(f"  {gemini_memo.hits} distinct texts reused from earlier chunks.")
+    if USE_RFQ_RULES:
+        print(f"RFQ rules: {rfq_rule_counts['local']} distinct RFQ texts analysed locally, {rfq_rule_counts['escalated']} escalated to Gemini "
+              f"(confidence below {RFQ_RULES_MIN_CONFIDENCE}).")
+    print("Initial enrichment loops completed.")
+else:
+    print("Skipped initial enrichment loops to focus on insights/tasks generation.")
 
 
 # --- Generate Strategic Insights & Actionable Tasks (using Gemini if enabled) ---
@@ -195,29 +475,16 @@ df_actionable_tasks = pd.DataFrame(columns=['task_id', 'task_description', 'task
 
 if USE_GEMINI_FOR_ADVANCED_ANALYSIS:
     print("\nGenerating Strategic Insights (Gemini)...")
-    # 1. Aggregate data for insights
-    num_total_rfqs = len(df_interactions[df_interactions['event_name'] == 'RFQ Submitted'])
-    rfq_types_list = []
-    for json_str in df_interactions['gemini_rfq_analysis_json'].dropna(): # Ensure we only process valid strings
-        try: data = json.loads(json_str); rfq_types_list.append(data.get('service_product_type'))
-        except: pass
-    top_rfq_types = pd.Series([t for t in rfq_types_list if t]).value_counts().nlargest(3).to_dict() if rfq_types_list else {}
-
-    supplier_cats_list = []
-    for json_str in df_users['gemini_supplier_capability_json'].dropna():
-        try: data = json.loads(json_str); supplier_cats_list.extend(data.get('main_categories', []))
-        except: pass
-    top_supplier_cats = pd.Series([c for c in supplier_cats_list if c]).value_counts().nlargest(3).to_dict() if supplier_cats_list else {}
-
-    sentiments_list = []
-    for json_str in df_users['vader_sentiment_analysis_json'].dropna():
-        try: data = json.loads(json_str); sentiments_list.append(data.get('sentiment_label'))
-        except: pass
-    sentiment_distribution = pd.Series([s for s in sentiments_list if s]).value_counts(normalize=True).multiply(100).round(1).to_dict() if sentiments_list else {}
+    # 1. Aggregate data for insights (running counters filled while the tables were enriched)
+    num_total_rfqs = insight_counts['rfqs_submitted']
+    top_rfq_types = dict(insight_counts['rfq_types'].most_common(3))
+    top_supplier_cats = dict(insight_counts['supplier_categories'].most_common(3))
+    num_sentiments = sum(insight_counts['sentiments'].values())
+    sentiment_distribution = {label: round(count / num_sentiments * 100, 1) for label, count in insight_counts['sentiments'].most_common()}
 
     summary_for_insights = f"""
     Business Data Summary:
-    - Total RFQs Processed for Type: {len(rfq_types_list)} (out of {num_total_rfqs} total RFQs submitted)
+    - Total RFQs Processed for Type: {insight_counts['rfqs_parsed']} (out of {num_total_rfqs} total RFQs submitted)
     - Top 3 RFQ Service/Product Types: {top_rfq_types if top_rfq_types else 'N/A or No RFQs Analyzed'}
     - Top 3 Supplier Main Categories from Processed Suppliers: {top_supplier_cats if top_supplier_cats else 'N/A or No Suppliers Analyzed'}
     - User Feedback Sentiment Distribution (% of analyzed feedback): {sentiment_distribution if sentiment_distribution else 'N/A or No Feedback Analyzed'}
@@ -302,32 +569,46 @@ if USE_GEMINI_FOR_ADVANCED_ANALYSIS:
         except json.JSONDecodeError:
             print(f"CRITICAL: Failed to parse actionable tasks JSON. Response was: {tasks_response_json_str}")
 
-# --- Save Final DataFrames ---
-# ... (resto do código de salvamento como antes) ...
-output_path_users = 'user_details_enriched_en.csv'
-output_path_interactions = 'marketing_interactions_enriched_en.csv'
-output_path_insights = 'strategic_insights_en.csv'
-output_path_tasks = 'actionable_tasks_en.csv'
-
-df_users.to_csv(output_path_users, index=False, encoding='utf-8-sig')
-print(f"\nSaved: {output_path_users} (VADER analyses: {total_vader_processed})")
-df_interactions.to_csv(output_path_interactions, index=False, encoding='utf-8-sig')
-print(f"Saved: {output_path_interactions}")
-
+# --- Save Insights & Tasks (the enriched tables were written above) ---
 if not df_strategic_insights.empty:
-    df_strategic_insights.to_csv(output_path_insights, index=False, encoding='utf-8-sig')
+    write_table(df_strategic_insights, output_path_insights)
     print(f"Saved: {output_path_insights}")
 else:
     print(f"{output_path_insights} is empty (no strategic insights generated).")
 
 if not df_actionable_tasks.empty:
-    df_actionable_tasks.to_csv(output_path_tasks, index=False, encoding='utf-8-sig')
+    write_table(df_actionable_tasks, output_path_tasks)
     print(f"Saved: {output_path_tasks}")
 else:
     print(f"{output_path_tasks} is empty (no actionable tasks generated).")
 
+if journal is not None:
+    journal.complete() # The outputs now hold every journaled result; the next run starts fresh
+    print(f"Enrichment journal {ENRICHMENT_JOURNAL_PATH} removed ({journal.resumed} results were resumed from it).")
+
 
-print(f"\nTotal VADER sentiment analyses performed: {total_vader_processed}")
+print(f"\nTotal VADER sentiment analyses performed: {total_vader_processed} rows ({total_vader_distinct_texts} distinct texts scored)")
+vader_scorer.report()
 if USE_GEMINI_FOR_ADVANCED_ANALYSIS:
-    print(f"Total Gemini API calls made (approx): {total_gemini_calls}")
+    print(f"Total Gemini analyses requested: {total_gemini_calls} (API calls made: {gemini_client.calls if gemini_client else 0})")
+    if gemini_client is not None:
+        print(f"Gemini client: {gemini_client.status()}")
+if llm_cache is not None:
+    llm_cache.report()
+    llm_cache.close()
+if llm_telemetry is not None:
+    llm_telemetry.close()
+    llm_telemetry.report()
+if RUN_STATS_PATH:
+    run_stats = {'backend': GEMINI_BACKEND, 'mode': ENRICHMENT_MODE, 'batch_size': GEMINI_BATCH_SIZE,
+                 'user_rows': rows_enriched['users'], 'interaction_rows': rows_enriched['interactions'],
+                 'vader_analyses': total_vader_processed, 'vader_distinct_texts': total_vader_distinct_texts, 'vader_memo_hits': vader_scorer.memo_hits, 'gemini_analyses': total_gemini_calls, 'rfq_rules': dict(rfq_rule_counts),
+                 'api_calls': gemini_client.calls if gemini_client else 0, 'retries': gemini_client.retries if gemini_client else 0,
+                 'failures': gemini_client.failures if gemini_client else 0, 'client': gemini_client.stats() if gemini_client else None,
+                 'fake_backend': gemini_client.model.stats() if GEMINI_BACKEND == 'fake' and gemini_client and gemini_client.model else None,
+                 'llm_telemetry': llm_telemetry.summary().to_dict('records') if llm_telemetry is not None else None,
+                 'wall_seconds': round(time.perf_counter() - run_started, 3)}
+    with open(RUN_STATS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(run_stats, f, indent=2)
+    print(f"Run stats written to {RUN_STATS_PATH}.")
 print("NLP enrichment process completed!")
\ No newline at end of file
@@ -1,37 +1,44 @@
-import pandas as pd
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import nltk
 import os
-from dotenv import load_dotenv
 import time
 import json
-import re
-
-# --- NLTK Resource Download ---
-# Tenta baixar os recursos necessários. Se já existirem, não fará nada.
-# É mais robusto do que tentar find() e depois capturar um DownloadError específico
-# que pode ter mudado de nome entre versões do NLTK.
-try:
-    print("Checking/downloading NLTK resources (vader_lexicon, punkt)...")
-    nltk.download('vader_lexicon', quiet=True) # quiet=True suprime a saída se já estiver baixado
-    nltk.download('punkt', quiet=True)
-    print("NLTK resources checked/downloaded.")
-except Exception as e:
-    print(f"An error occurred during NLTK resource download: {e}")
-    print("Please ensure you can connect to the internet to download NLTK resources,")
-    print("or download them manually using: import nltk; nltk.download('vader_lexicon'); nltk.download('punkt')")
-    # Você pode decidir sair aqui se os recursos forem críticos e não puderem ser baixados
-    # exit()
+from startup_profile import StartupProfiler, parse_startup_args, ensure_nltk_resources
+
+# --- Startup: only what this run needs is imported / initialized; --profile-startup times each step ---
+args = parse_startup_args("Enrich users and interactions with VADER sentiment and Gemini RFQ / capability analyses.")
+startup = StartupProfiler(enabled=args.profile_startup)
+with startup.step("import pandas"):
+    import pandas as pd
+with startup.step("import python-dotenv"):
+    from dotenv import load_dotenv
+with startup.step("import pipeline modules"):
+    from gemini_client import AsyncGeminiClient
+    from gemini_json import parse_response, to_json
+    from llm_telemetry import LLMTelemetry
+with startup.step("import vaderSentiment"):
+    from vader_bulk import VaderBulkScorer
+
+# --- NLTK data: VADER scoring uses the lexicon bundled with vaderSentiment, so nothing is downloaded unless asked ---
+if args.download_nltk:
+    with startup.step("NLTK resources (download)"):
+        ensure_nltk_resources(['vader_lexicon', 'punkt'], download=True)
 
 # --- Load environment variables (still useful if you keep Gemini for other tasks) ---
-load_dotenv()
+with startup.step("load .env"):
+    load_dotenv()
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
-# --- VADER Sentiment Analyzer ---
-vader_analyzer = SentimentIntensityAnalyzer()
+# --- VADER Sentiment Analyzer (bulk: dedup + LRU memo + process pool, see vader_bulk.py) ---
+VADER_PROCESSES = None # Worker processes for bulk VADER scoring (None = all CPUs; 1 = in-process)
+vader_scorer = VaderBulkScorer(processes=VADER_PROCESSES)
 
 # --- Gemini Model Configuration (if still used for other tasks) ---
 USE_GEMINI_FOR_RFQ_AND_CAPABILITIES = True # Set to False to disable Gemini calls
+GEMINI_MAX_CONCURRENCY = 8 # Ceiling for requests in flight; the client's AIMD controller adapts below it
+GEMINI_REQUESTS_PER_MINUTE = 30 # Enforced by a token bucket instead of sleeping 2.1 s after every call
+GEMINI_TOKENS_PER_MINUTE = 1000000 # None = no token budget
+LLM_TELEMETRY = True # Log every Gemini attempt to llm_call_log.csv and print latency / token / retry totals at the end
+GEMINI_PRICE_PER_MILLION_TOKENS = (0.10, 0.40) # (input, output) USD per 1M tokens for the cost estimate; example rates, set your model's
+gemini_client = llm_telemetry = None
 
 if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
     if not GOOGLE_API_KEY:
@@ -40,8 +47,6 @@ if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
         # We can let it proceed and Gemini calls will fail gracefully, or exit:
         # exit()
     else:
-        import google.generativeai as genai
-        genai.configure(api_key=GOOGLE_API_KEY)
         generation_config_gemini = {
             "temperature": 0.5,
             "top_p": 1,
@@ -55,85 +60,61 @@ if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
             {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
         ]
         MODEL_NAME_GEMINI = "models/gemini-2.0-flash-lite"
-        try:
-            gemini_model = genai.GenerativeModel(
-                model_name=MODEL_NAME_GEMINI,
-                generation_config=generation_config_gemini,
-                safety_settings=safety_settings_gemini
-            )
-            print(f"Successfully initialized Gemini model: {MODEL_NAME_GEMINI}")
-        except Exception as e:
-            print(f"Error initializing Gemini model {MODEL_NAME_GEMINI}: {e}")
-            print("Gemini calls for RFQ and Capabilities will likely fail.")
-            USE_GEMINI_FOR_RFQ_AND_CAPABILITIES = False # Disable if model init fails
-
-
-def clean_gemini_json_response(text_response): # Still needed if Gemini is used
-    if not text_response: return "{}"
-    match_markdown = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", text_response, re.DOTALL)
-    if match_markdown: json_str = match_markdown.group(1)
-    else:
-        match_direct = re.search(r'(\{.*?\})', text_response, re.DOTALL)
-        if match_direct: json_str = match_direct.group(1)
-        else: return "{}"
-    try:
-        json.loads(json_str); return json_str
-    except json.JSONDecodeError: return "{}"
-
-def get_gemini_response_with_delay(prompt_text): # Still needed if Gemini is used
-    if not USE_GEMINI_FOR_RFQ_AND_CAPABILITIES or not GOOGLE_API_KEY or 'gemini_model' not in globals():
+
+        def build_gemini_model():
+            """Imports the SDK and builds the model on the client's first call, so runs without Gemini work never import it."""
+            with startup.step("Gemini model"):
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                    model = genai.GenerativeModel(
+                        model_name=MODEL_NAME_GEMINI,
+                        generation_config=generation_config_gemini,
+                        safety_settings=safety_settings_gemini
+                    )
+                    print(f"Successfully initialized Gemini model: {MODEL_NAME_GEMINI}")
+                    return model
+                except Exception as e:
+                    print(f"Error initializing Gemini model {MODEL_NAME_GEMINI}: {e}")
+                    print("Gemini calls for RFQ and Capabilities will fail (the client's circuit breaker opens at once).")
+                    raise
+
+        if LLM_TELEMETRY:
+            llm_telemetry = LLMTelemetry(price_per_million_tokens=GEMINI_PRICE_PER_MILLION_TOKENS)
+        gemini_client = AsyncGeminiClient(None, model_factory=build_gemini_model, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                                          requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+                                          tokens_per_minute=GEMINI_TOKENS_PER_MINUTE, max_retries=3,
+                                          retry_delay_seconds=5, telemetry=llm_telemetry)
+
+def clean_gemini_json_response(text_response, task_name=None): # Still needed if Gemini is used
+    return to_json(parse_response(text_response, task_name)) # Validated against the task's schema; "{}" if nothing usable
+
+def get_gemini_responses(prompts, task_names="API Call"): # Still needed if Gemini is used
+    """Runs the prompts concurrently under the RPM/TPM budget; returns cleaned JSON strings in order."""
+    if not USE_GEMINI_FOR_RFQ_AND_CAPABILITIES or gemini_client is None:
         print("DEBUG: Gemini call skipped (not configured or disabled).")
-        return "{}"
-
-    max_retries = 3
-    initial_retry_delay_seconds = 5
-    DELAY_BETWEEN_CALLS_SECONDS = 2.1 # For 30 RPM
-    current_retry_delay = initial_retry_delay_seconds
-
-    for attempt in range(max_retries):
-        try:
-            response = gemini_model.generate_content(prompt_text)
-            time.sleep(DELAY_BETWEEN_CALLS_SECONDS)
-            if response.candidates and response.candidates[0].content.parts:
-                return clean_gemini_json_response(response.text)
-            return "{}"
-        except Exception as e:
-            print(f"Error calling Gemini API (attempt {attempt + 1}/{max_retries}): {e}")
-            time.sleep(DELAY_BETWEEN_CALLS_SECONDS)
-            if "429" in str(e) or "rate limit" in str(e).lower():
-                current_retry_delay += (attempt + 1) * 2
-            if attempt < max_retries - 1:
-                print(f"Waiting {current_retry_delay:.2f} seconds before retrying...")
-                time.sleep(current_retry_delay)
-            else:
-                return "{}"
-
-def get_vader_sentiment_analysis(text):
-    if not text or pd.isna(text):
+        return ["{}"] * len(prompts)
+    names = [task_names] * len(prompts) if isinstance(task_names, str) else task_names
+    return [clean_gemini_json_response(text, name) for text, name in zip(gemini_client.run(prompts, task_names), names)]
+
+def vader_sentiment_record(scores):
+    if scores is None:
         # Return a structure consistent with what Gemini was producing for sentiment
         return {"sentiment": "Not specified", "keywords": [], "vader_compound": 0.0}
 
-    vs = vader_analyzer.polarity_scores(text)
-    compound_score = vs['compound']
-
-    if compound_score >= 0.05:
-        sentiment_label = "Positive"
-    elif compound_score <= -0.05:
-        sentiment_label = "Negative"
-    else:
-        sentiment_label = "Neutral"
-
     # VADER doesn't do keyword extraction. We'll return an empty list.
     # For keywords, you might consider TextBlob noun_phrases or a dedicated keyword extractor.
     return {
-        "sentiment": sentiment_label,
+        "sentiment": scores.label, # Positive >= 0.05, Negative <= -0.05, else Neutral
         "keywords": [], # VADER doesn't provide keywords directly
-        "vader_compound": round(compound_score, 4),
-        "vader_positive": round(vs['pos'], 4),
-        "vader_negative": round(vs['neg'], 4),
-        "vader_neutral": round(vs['neu'], 4)
+        "vader_compound": scores.compound,
+        "vader_positive": scores.pos,
+        "vader_negative": scores.neg,
+        "vader_neutral": scores.neu
     }
 
+startup.report()
+
 # --- Load DataFrames ---
 try:
     df_users = pd.read_csv('user_details.csv')
@@ -153,7 +134,7 @@ else: # Create empty columns if Gemini is disabled, to prevent errors if Power B
 
 
 # --- Define Slices/Batches for Processing ---
-BATCH_SIZE = 50 # Process N eligible items from each category per round. Increased because VADER is fast.
+BATCH_SIZE = 50 # Process N eligible Gemini items from each category per round.
 
 user_feedback_indices = df_users[df_users['user_feedback_text'].notna()].index.tolist()
 supplier_capability_indices = df_users[
@@ -163,12 +144,17 @@ rfq_interaction_indices = df_interactions[
     (df_interactions['event_name'] == 'RFQ Submitted') & (df_interactions['interaction_details_text'].notna())
 ].index.tolist()
 
-ptr_feedback, ptr_capability, ptr_rfq = 0, 0, 0
+ptr_capability, ptr_rfq = 0, 0
 processed_total_api_calls = 0 # For Gemini calls if any
-processed_total_vader_analyses = 0
 
-print(f"Starting round-robin processing with BATCH_SIZE = {BATCH_SIZE}")
+# --- User Feedback with VADER: the whole column in one bulk pass ---
 print(f"Eligible for User Feedback (VADER): {len(user_feedback_indices)}")
+df_users.loc[user_feedback_indices, 'vader_sentiment_analysis_json'] = vader_scorer.json_column(
+    df_users.loc[user_feedback_indices, 'user_feedback_text'], vader_sentiment_record)
+processed_total_vader_analyses = len(user_feedback_indices)
+vader_scorer.report()
+
+print(f"Starting round-robin processing with BATCH_SIZE = {BATCH_SIZE}")
 if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
     print(f"Eligible for Supplier Capability (Gemini): {len(supplier_capability_indices)}")
     print(f"Eligible for RFQ Interaction (Gemini): {len(rfq_interaction_indices)}")
@@ -177,28 +163,14 @@ if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
 while True:
     items_processed_this_round = 0
 
-    # 1. Process User Feedback with VADER
-    batch_end_feedback = min(ptr_feedback + BATCH_SIZE, len(user_feedback_indices))
-    for i in range(ptr_feedback, batch_end_feedback):
-        idx = user_feedback_indices[i]
-        row = df_users.loc[idx]
-        # print(f"Analyzing User Feedback (VADER): user_id {row['user_id']} (Item {ptr_feedback + 1}/{len(user_feedback_indices)})")
-        vader_result = get_vader_sentiment_analysis(row['user_feedback_text'])
-        df_users.at[idx, 'vader_sentiment_analysis_json'] = json.dumps(vader_result)
-        items_processed_this_round += 1
-        processed_total_vader_analyses +=1
-    ptr_feedback = batch_end_feedback
-    if ptr_feedback % (BATCH_SIZE * 5) == 0 and ptr_feedback > 0 : # Print progress every N batches
-        print(f"VADER: Processed {ptr_feedback}/{len(user_feedback_indices)} user feedbacks.")
-
-
     if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
-        # 2. Process Supplier Capabilities with Gemini
+        round_jobs = [] # (DataFrame, index, column, task name, prompt): both passes are sent to Gemini together below
+        # 1. Process Supplier Capabilities with Gemini
         batch_end_capability = min(ptr_capability + BATCH_SIZE, len(supplier_capability_indices))
         for i in range(ptr_capability, batch_end_capability):
             idx = supplier_capability_indices[i]
             row = df_users.loc[idx]
-            print(f"\nAnalyzing Supplier Capabilities (Gemini): user_id {row['user_id']} (Item {ptr_capability + 1}/{len(supplier_capability_indices)})")
+            print(f"\nQueueing Supplier Capabilities (Gemini): user_id {row['user_id']} (Item {ptr_capability + 1}/{len(supplier_capability_indices)})")
             prompt_capabilities = f"""
             Based on the following list of supplier capabilities, generate a concise summary (1-2 sentences)
             and identify up to 3 main service categories offered.
@@ -207,18 +179,17 @@ while True:
             Supplier capabilities: "{row['supplier_capabilities_text']}"
             Respond strictly in English.
             """
-            response_text = get_gemini_response_with_delay(prompt_capabilities)
-            df_users.at[idx, 'gemini_supplier_capability_summary_json'] = response_text
+            round_jobs.append((df_users, idx, 'gemini_supplier_capability_summary_json', f"Supplier Capabilities ({row['user_id']})", prompt_capabilities))
             items_processed_this_round += 1
             processed_total_api_calls +=1
         ptr_capability = batch_end_capability
 
-        # 3. Process RFQ Interactions with Gemini
+        # 2. Process RFQ Interactions with Gemini
         batch_end_rfq = min(ptr_rfq + BATCH_SIZE, len(rfq_interaction_indices))
         for i in range(ptr_rfq, batch_end_rfq):
             idx = rfq_interaction_indices[i]
             row = df_interactions.loc[idx]
-            print(f"\nAnalyzing RFQ Interaction (Gemini): interaction_id {row['interaction_id']} (Item {ptr_rfq + 1}/{len(rfq_interaction_indices)})")
+            print(f"\nQueueing RFQ Interaction (Gemini): interaction_id {row['interaction_id']} (Item {ptr_rfq + 1}/{len(rfq_interaction_indices)})")
             prompt_rfq = f"""
             Analyze the RFQ text.
             1. Identify main service/product.
@@ -231,21 +202,24 @@ while True:
             RFQ text: "{row['interaction_details_text']}"
             Respond strictly in English.
             """
-            response_text = get_gemini_response_with_delay(prompt_rfq)
-            df_interactions.at[idx, 'gemini_rfq_analysis_json'] = response_text
+            round_jobs.append((df_interactions, idx, 'gemini_rfq_analysis_json', f"RFQ Analysis ({row['interaction_id']})", prompt_rfq))
             items_processed_this_round += 1
             processed_total_api_calls +=1
         ptr_rfq = batch_end_rfq
 
+        # 3. Run this round's capability and RFQ prompts concurrently through the rate-limited client
+        round_results = get_gemini_responses([job[4] for job in round_jobs], [job[3] for job in round_jobs])
+        for (df_target, idx, column, _, _), response_text in zip(round_jobs, round_results):
+            df_target.at[idx, column] = response_text
+
     # Check if all processing is done
-    all_feedback_done = ptr_feedback >= len(user_feedback_indices)
     all_capabilities_done = not USE_GEMINI_FOR_RFQ_AND_CAPABILITIES or ptr_capability >= len(supplier_capability_indices)
     all_rfqs_done = not USE_GEMINI_FOR_RFQ_AND_CAPABILITIES or ptr_rfq >= len(rfq_interaction_indices)
 
-    if all_feedback_done and all_capabilities_done and all_rfqs_done:
+    if all_capabilities_done and all_rfqs_done:
         print("\nAll eligible items processed.")
         break
-    elif items_processed_this_round == 0 and (not all_feedback_done or not all_capabilities_done or not all_rfqs_done):
+    elif items_processed_this_round == 0 and (not all_capabilities_done or not all_rfqs_done):
         # This case handles if one list finishes much earlier than others in a round
         # and no items were processed from the remaining lists in that specific partial batch.
         # We continue to ensure other lists get a chance.
@@ -271,5 +245,10 @@ else:
 
 print(f"\nTotal VADER analyses performed: {processed_total_vader_analyses}")
 if USE_GEMINI_FOR_RFQ_AND_CAPABILITIES:
-    print(f"Total Gemini API calls made (approx): {processed_total_api_calls}")
+    print(f"Total Gemini prompts: {processed_total_api_calls}")
+    if gemini_client is not None:
+        print(f"Gemini API attempts: {gemini_client.calls} (retries: {gemini_client.retries}, failures: {gemini_client.failures})")
+if llm_telemetry is not None:
+    llm_telemetry.close()
+    llm_telemetry.report()
 print("Enrichment process completed!")
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Typed, flattened enrichment columns.
+
+The enrichment passes produce one JSON string per analysed text. For the outputs, `flatten_results`
+turns a JSON result column into typed columns (sentiment_label, compound_score, ..., capability_summary,
+service_product_type, implied_urgency) and list fields (main_categories, key_specifications) into
+exploded child tables with one row per (ID, position, value), so Power Query doesn't have to parse
+JSON on every refresh. Each distinct JSON string is parsed once.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from table_io import iter_table_chunks, table_exists
+
+# JSON result column -> its typed scalar fields ({field: dtype}) and list fields ({field: (child table stem, value column)})
+RESULT_COLUMNS = {
+    'vader_sentiment_analysis_json': {
+        'id_column': 'user_id',
+        'fields': {'sentiment_label': 'string', 'compound_score': 'float64', 'positive_score': 'float64',
+                   'negative_score': 'float64', 'neutral_score': 'float64'},
+        'lists': {},
+    },
+    'gemini_supplier_capability_json': {
+        'id_column': 'user_id',
+        'fields': {'capability_summary': 'string'},
+        'lists': {'main_categories': ('supplier_capability_categories_en', 'main_category')},
+    },
+    'gemini_rfq_analysis_json': {
+        'id_column': 'interaction_id',
+        'fields': {'service_product_type': 'string', 'implied_urgency': 'string'},
+        'lists': {'key_specifications': ('rfq_key_specifications_en', 'key_specification')},
+    },
+}
+
+
+def child_tables(json_column):
+    """{child table stem: value column} for the list fields of a JSON result column."""
+    return dict(RESULT_COLUMNS[json_column]['lists'].values())
+
+
+def _parse(json_str):
+    try:
+        data = json.loads(json_str)
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return [v for v in value if v is not None and not isinstance(v, (dict, list))]
+    return [value] if isinstance(value, str) and value else []
+
+
+def flatten_results(df, json_column, keep_json=False):
+    """
+    Adds the typed columns of `json_column` to `df` in place (right after it, or instead of it unless
+    `keep_json`). Returns the exploded list fields as {child table stem: DataFrame(id, position, value)}.
+    """
+    spec = RESULT_COLUMNS[json_column]
+    codes, uniques = pd.factorize(df[json_column], sort=False)
+    parsed = [_parse(json_str) for json_str in uniques]
+    position = df.columns.get_loc(json_column) + 1
+    for offset, (field, dtype) in enumerate(spec['fields'].items()):
+        values = np.array([data.get(field) for data in parsed] + [None], dtype=object) # Last entry: missing (code -1)
+        column = pd.Series(values[codes], index=df.index, dtype=object) # Not inferred: pandas 3 would make None a NaN str
+        if dtype == 'float64':
+            column = pd.to_numeric(column, errors='coerce')
+        else:
+            # Missing stays missing (pd.NA in a nullable string column): astype('str') would write the text "nan"
+            column = column.map(lambda v: v if isinstance(v, str) else pd.NA if v is None or v != v else json.dumps(v) if isinstance(v, (dict, list)) else str(v))
+        df.insert(position + offset, field, column.astype(dtype))
+    children = {}
+    for field, (stem, value_column) in spec['lists'].items():
+        lists = [_as_list(data.get(field)) for data in parsed] + [[]]
+        lengths = np.array([len(values) for values in lists])
+        flat = np.array([v for values in lists for v in values], dtype=object)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        row_lengths = lengths[codes]
+        total = int(row_lengths.sum())
+        # Child row k comes from source row rows[k] and holds element within[k] of that row's list
+        rows = np.repeat(np.arange(len(df)), row_lengths)
+        within = np.arange(total) - np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+        children[stem] = pd.DataFrame({
+            spec['id_column']: df[spec['id_column']].to_numpy()[rows],
+            'position': (within + 1).astype('int16'),
+            value_column: flat[np.repeat(starts[codes], row_lengths) + within] if total else np.array([], dtype=object),
+        })
+    if not keep_json:
+        df.drop(columns=json_column, inplace=True)
+    return children
+
+
+def load_typed_results(path, id_column, text_column, json_column, chunksize=500_000):
+    """
+    Rebuilds JSON results from the typed columns (and child tables) of a previous output written without
+    its JSON column, as one DataFrame with `id_column`, `text_column` and `json_column` for incremental
+    carry-over. Rows without any typed value (failed analyses) are left out.
+    """
+    spec = RESULT_COLUMNS[json_column]
+    fields = list(spec['fields'])
+    lists = {}
+    for field, (stem, value_column) in spec['lists'].items():
+        if table_exists(stem):
+            grouped = {}
+            for chunk in iter_table_chunks(stem, columns=[id_column, 'position', value_column], chunksize=chunksize):
+                chunk = chunk.sort_values([id_column, 'position'], kind='stable')
+                for item_id, values in chunk.groupby(id_column, sort=False)[value_column]:
+                    grouped.setdefault(str(item_id), []).extend(values.tolist())
+            lists[field] = grouped
+    kept = []
+    text_fields = [field for field, dtype in spec['fields'].items() if dtype == 'string']
+    for chunk in iter_table_chunks(path, columns=[id_column, text_column] + fields, chunksize=chunksize):
+        chunk[text_fields] = chunk[text_fields].replace('nan', None) # Outputs written before missing values stayed NA
+        ids = chunk[id_column].astype(str)
+        has_value = chunk[fields].notna().any(axis=1) | ids.map(lambda i: any(i in grouped for grouped in lists.values()))
+        chunk, ids = chunk[has_value], ids[has_value]
+        records = chunk[fields].astype(object).where(chunk[fields].notna(), None).to_dict('records')
+        for record, item_id in zip(records, ids):
+            for field, grouped in lists.items():
+                record[field] = grouped.get(item_id, [])
+        kept.append(pd.DataFrame({id_column: ids.to_numpy(), text_column: chunk[text_column].to_numpy(),
+                                  json_column: [json.dumps(record, ensure_ascii=False) for record in records]}))
+    return pd.concat(kept) if kept else pd.DataFrame(columns=[id_column, text_column, json_column])
@@ -0,0 +1,111 @@
+"""Append-only journal of completed enrichment results, for crash-safe resume.
+
+Every paid-for result is appended to a JSON-lines file as a (task, row id, result) record as soon
+as it arrives, buffered and flushed every `flush_every` records or `flush_seconds`. If the run dies
+(crash, Ctrl-C, quota wall), the next run loads the journal, skips the rows it already holds and
+builds its outputs from it. The first line stores a fingerprint of the inputs: a journal written
+for different input tables is discarded instead of resumed.
+"""
+import json
+import os
+import time
+
+ENRICHMENT_JOURNAL_PATH = '.enrichment_journal.jsonl'
+
+
+def input_fingerprint(paths, **settings):
+    """Identifies the inputs of a run: size and mtime of each file, plus any settings that change results."""
+    files = {}
+    for path in paths:
+        stat = os.stat(path)
+        files[path] = [stat.st_size, stat.st_mtime_ns]
+    return {'files': files, **settings}
+
+
+class EnrichmentJournal:
+    """
+    Completed results per task, backed by an append-only JSON-lines file.
+
+    `results(task)` is the {row id: result} dict already completed (from earlier runs and this one);
+    `record(task, row_id, result)` adds one. Call `close()` (or use as a context manager) to flush
+    on exit, and `complete()` once the outputs are safely written to delete the journal.
+    """
+
+    def __init__(self, path=ENRICHMENT_JOURNAL_PATH, fingerprint=None, flush_every=200, flush_seconds=5.0):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.resumed = 0
+        self._results = {}
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        if self._load():
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'fingerprint': fingerprint}) + '\n')
+            self._file.flush()
+
+    def _load(self):
+        """Loads an existing journal for the same inputs; returns False if there is none to resume."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1] # A torn last line (killed mid-write) is dropped
+        lines = complete.decode('utf-8').splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            header = {}
+        if header.get('fingerprint') != self.fingerprint:
+            print(f"Enrichment journal {self.path} was written for different inputs; starting a new one.")
+            return False
+        if len(complete) != len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(complete))
+        for line in lines[1:]:
+            record = json.loads(line)
+            self._results.setdefault(record['task'], {})[record['id']] = record['result']
+        self.resumed = sum(len(task) for task in self._results.values())
+        if self.resumed:
+            print(f"Resuming from {self.path}: {self.resumed} completed results "
+                  f"({', '.join(f'{task}: {len(done)}' for task, done in self._results.items())}).")
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def results(self, task):
+        return self._results.setdefault(task, {})
+
+    def record(self, task, row_id, result):
+        row_id = str(row_id)
+        self.results(task)[row_id] = result
+        self._buffer.append(json.dumps({'task': task, 'id': row_id, 'result': result}, ensure_ascii=False) + '\n')
+        if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._buffer and self._file is not None:
+            self._file.write(''.join(self._buffer))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def complete(self):
+        """Closes and deletes the journal (call after the outputs built from it were written)."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,146 @@
+"""Deduplication planning for the enrichment passes.
+
+Enrichment inputs are highly repetitive (the generators draw from a few dozen sample texts, and
+real RFQs/capability blurbs repeat too). A TaskPlan groups a task's texts by a normalized key
+so each distinct text is analysed once; `TaskPlan.fan_out` maps the per-text results back onto
+every matching row with one vectorized take. `carry_over_results` handles incremental runs: rows
+whose ID and text are unchanged since the previous enriched output keep their result.
+"""
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from table_io import iter_table_chunks
+
+# Row / distinct-text counts of one or more TaskPlans of the same task (e.g. summed over chunks)
+PlanCounts = namedtuple('PlanCounts', ['name', 'num_rows', 'num_unique'])
+
+
+def normalize_texts(texts):
+    """Grouping key for texts: case-folded, trimmed, inner whitespace collapsed."""
+    return texts.astype(str).str.strip().str.replace(r'\s+', ' ', regex=True).str.casefold()
+
+
+class TaskPlan:
+    """
+    One enrichment task over the non-null texts of a column.
+
+    `index` holds the row labels to fill, `unique_texts` one representative text per distinct
+    normalized key (the first row's original text, so prompts see real input), and
+    `codes[i]` the position in `unique_texts` for row `index[i]`. `first_index` holds the row label
+    each distinct text was taken from (e.g. to tag batched prompt items with that row's ID), and
+    `keys` its grouping key.
+    """
+
+    def __init__(self, name, texts, normalize=True):
+        texts = texts.dropna()
+        self.name = name
+        self.index = texts.index
+        # normalize=False groups exact texts only (VADER scores depend on case and punctuation)
+        self.codes, keys = pd.factorize(normalize_texts(texts) if normalize else texts.astype(str), sort=False)
+        first_rows = pd.Series(np.arange(len(texts))).groupby(self.codes).first().to_numpy()
+        self.unique_texts = texts.to_numpy(dtype=object)[first_rows].tolist()
+        self.first_index = self.index[first_rows]
+        self.keys = list(keys)
+
+    @property
+    def num_rows(self):
+        return len(self.index)
+
+    @property
+    def num_unique(self):
+        return len(self.unique_texts)
+
+    def fan_out(self, results):
+        """Per-row results (aligned with `index`) from per-distinct-text `results`."""
+        return pd.Series(np.asarray(results, dtype=object)[self.codes], index=self.index, dtype=object)
+
+    def assign(self, df, column, results):
+        """Writes the fanned-out results into `df[column]` for the planned rows."""
+        if self.num_rows:
+            df.loc[self.index, column] = self.fan_out(results)
+
+
+def add_plan_counts(totals, plans):
+    """Adds the row / distinct-text counts of `plans` to `totals` (task name -> PlanCounts); returns `totals`."""
+    for plan in plans:
+        previous = totals.get(plan.name, PlanCounts(plan.name, 0, 0))
+        totals[plan.name] = PlanCounts(plan.name, previous.num_rows + plan.num_rows, previous.num_unique + plan.num_unique)
+    return totals
+
+
+class ResultMemo:
+    """
+    Bounded LRU of grouping key -> result, so a text analysed in one chunk of a streamed table is
+    not sent again for a later chunk.
+    """
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self.hits = 0
+
+    def get(self, key):
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+
+def print_dedup_summary(plans):
+    """Prints rows vs distinct texts per task and overall (calls avoided by deduplication)."""
+    total_rows = sum(plan.num_rows for plan in plans)
+    total_unique = sum(plan.num_unique for plan in plans)
+    print("\n--- Enrichment dedup summary ---")
+    for plan in plans:
+        ratio = plan.num_rows / plan.num_unique if plan.num_unique else 0
+        print(f"  {plan.name}: {plan.num_rows} rows -> {plan.num_unique} distinct texts (dedup ratio {ratio:.1f}x)")
+    if total_unique:
+        print(f"  Total: {total_rows} rows -> {total_unique} analyses, {total_rows - total_unique} calls avoided "
+              f"(dedup ratio {total_rows / total_unique:.1f}x)")
+
+
+def text_hashes(texts):
+    """64-bit hash per text (missing texts hash like the empty string)."""
+    return pd.util.hash_pandas_object(texts.fillna('').astype(str), index=False).to_numpy()
+
+
+def load_previous_results(path, id_column, text_column, result_column, chunksize=500_000, empty_result="{}", frames=None):
+    """
+    One task's results from a previous enriched output, as a frame indexed by ID with 'text_hash' and
+    'result' columns. The table is read in chunks and only rows with a non-empty result are kept.
+    `frames` (DataFrames with the same three columns) replaces reading `path`.
+    """
+    kept = []
+    if frames is None:
+        frames = iter_table_chunks(path, columns=[id_column, text_column, result_column], chunksize=chunksize)
+    for chunk in frames:
+        chunk = chunk[chunk[result_column].notna() & (chunk[result_column] != empty_result)]
+        kept.append(pd.DataFrame({'text_hash': text_hashes(chunk[text_column]), 'result': chunk[result_column].to_numpy(dtype=object)},
+                                 index=pd.Index(chunk[id_column].astype(str), name=id_column)))
+    previous = pd.concat(kept) if kept else pd.DataFrame(columns=['text_hash', 'result'])
+    return previous[~previous.index.duplicated(keep='last')]
+
+
+def carry_over_results(df, previous, id_column, text_column, result_column):
+    """
+    Copies results from `previous` (see load_previous_results) into `df[result_column]` for rows
+    whose ID is there with the same text (compared by hash). Returns a boolean mask over `df` of the
+    rows carried over, which need no enrichment this run.
+    """
+    if previous is None or previous.empty:
+        return pd.Series(False, index=df.index)
+    positions = previous.index.get_indexer(df[id_column].astype(str))
+    found = positions >= 0
+    carried = (found & df[text_column].notna().to_numpy()
+               & (previous['text_hash'].to_numpy()[positions] == text_hashes(df[text_column])))
+    df.loc[carried, result_column] = previous['result'].to_numpy(dtype=object)[positions[carried]]
+    return pd.Series(carried, index=df.index)
@@ -0,0 +1,203 @@
+"""Offline stand-in for `genai.GenerativeModel`, for benchmarks and regression runs without a key or quota.
+
+FakeGenerativeModel answers the enrichment prompts (supplier capabilities, RFQ analysis, their batched
+multi-item form, strategic insights and actionable tasks) with schema-valid JSON derived from the
+prompt text, after a simulated latency. It can also inject 429 / quota errors (at a fixed rate, or
+whenever a requests-per-minute limit is exceeded) and malformed responses (truncated JSON, prose).
+`FakeGenerativeModel.from_env()` reads its settings from FAKE_GEMINI_* environment variables.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+PRODUCT_TYPES = {
+    'cnc': 'CNC Machining', 'machin': 'CNC Machining', 'mold': 'Injection Molding', 'mould': 'Injection Molding',
+    'sheet': 'Sheet Metal Fabrication', 'weld': 'Welding', 'cast': 'Casting', 'print': '3D Printing',
+    'pcb': 'PCB Assembly', 'electronic': 'Electronics Manufacturing', 'forg': 'Forging', 'stamp': 'Metal Stamping',
+    'packag': 'Packaging', 'coat': 'Surface Finishing', 'plastic': 'Plastic Parts',
+}
+URGENCY_HINTS = [('High', ('asap', 'urgent', 'immediately', 'tight deadline', 'rush')),
+                 ('Medium', ('soon', 'standard lead time', 'next month', 'weeks')),
+                 ('Low', ('budgetary', 'exploring', 'quote only', 'no rush'))]
+SPEC_PATTERN = re.compile(r"\b\d[\d,.]*\s*(?:mm|cm|m|in|inch|pcs|units|parts|kg|lbs?|%)?\b|\b(?:aluminum|aluminium|steel|stainless|"
+                          r"copper|brass|titanium|abs|nylon|iso\s*\d+|tolerance[^,.;]*)\b", re.IGNORECASE)
+
+
+def _stable_hash(text):
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def product_type(text):
+    lowered = text.lower()
+    for keyword, label in PRODUCT_TYPES.items():
+        if keyword in lowered:
+            return label
+    return sorted(set(PRODUCT_TYPES.values()))[_stable_hash(text) % len(set(PRODUCT_TYPES.values()))]
+
+
+def urgency(text):
+    lowered = text.lower()
+    for label, hints in URGENCY_HINTS:
+        if any(hint in lowered for hint in hints):
+            return label
+    return 'Not specified'
+
+
+def specifications(text, limit=5):
+    return [match.group(0).strip() for match in SPEC_PATTERN.finditer(text)][:limit]
+
+
+def categories(text, limit=3):
+    lowered = text.lower()
+    found = []
+    for keyword, label in PRODUCT_TYPES.items():
+        if keyword in lowered and label not in found:
+            found.append(label)
+    return (found or [product_type(text)])[:limit]
+
+
+def rfq_analysis(text):
+    return {"service_product_type": product_type(text), "implied_urgency": urgency(text), "key_specifications": specifications(text)}
+
+
+def capability_analysis(text):
+    main = categories(text)
+    return {"capability_summary": f"Supplier offering {', '.join(main)} services.", "main_categories": main}
+
+
+def _quoted_text(prompt, marker):
+    """The quoted text following `marker` in a single-item prompt ('Analyze RFQ: "..."')."""
+    match = re.search(re.escape(marker) + r'\s*"(.*?)"\s*(?:\.|\n|$)', prompt, re.DOTALL)
+    return match.group(1) if match else prompt
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in for `genai.GenerativeModel(...)` exposing `generate_content` and `generate_content_async`.
+
+    Latency is drawn per call: 'lognormal' (median `latency_seconds`, shape `latency_sigma`), 'uniform'
+    (0 to 2 x median) or 'fixed'. `rate_limit_rate` is the share of calls that fail with a 429 error;
+    with `requests_per_minute` set, calls beyond that rate (sliding 60 s window) fail with 429 too.
+    `malformed_rate` is the share of answers that come back truncated or as prose.
+    """
+
+    def __init__(self, model_name='fake-gemini', generation_config=None, safety_settings=None, latency='lognormal',
+                 latency_seconds=0.5, latency_sigma=0.5, rate_limit_rate=0.0, requests_per_minute=None, malformed_rate=0.0, seed=None):
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self.latency = latency
+        self.latency_seconds = latency_seconds
+        self.latency_sigma = latency_sigma
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent_calls = deque()
+        self.calls = self.rate_limited = self.malformed = 0
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Settings from FAKE_GEMINI_LATENCY (distribution), _LATENCY_SECONDS, _LATENCY_SIGMA, _429_RATE, _RPM, _MALFORMED_RATE, _SEED."""
+        env = os.environ
+        rpm = env.get('FAKE_GEMINI_RPM')
+        seed = env.get('FAKE_GEMINI_SEED')
+        return cls(latency=env.get('FAKE_GEMINI_LATENCY', 'lognormal'),
+                   latency_seconds=float(env.get('FAKE_GEMINI_LATENCY_SECONDS', 0.5)),
+                   latency_sigma=float(env.get('FAKE_GEMINI_LATENCY_SIGMA', 0.5)),
+                   rate_limit_rate=float(env.get('FAKE_GEMINI_429_RATE', 0.0)),
+                   requests_per_minute=float(rpm) if rpm else None,
+                   malformed_rate=float(env.get('FAKE_GEMINI_MALFORMED_RATE', 0.0)),
+                   seed=int(seed) if seed else None, **kwargs)
+
+    def stats(self):
+        return {'calls': self.calls, 'rate_limited': self.rate_limited, 'malformed': self.malformed}
+
+    def _draw(self):
+        """(latency, fail with 429?, malformed?) for one call; also enforces requests_per_minute."""
+        with self._lock:
+            self.calls += 1
+            if self.latency == 'fixed':
+                delay = self.latency_seconds
+            elif self.latency == 'uniform':
+                delay = self._random.uniform(0, 2 * self.latency_seconds)
+            else:
+                delay = self._random.lognormvariate(0, self.latency_sigma) * self.latency_seconds
+            throttled = self._random.random() < self.rate_limit_rate
+            if self.requests_per_minute:
+                now = time.monotonic()
+                while self._recent_calls and now - self._recent_calls[0] > 60:
+                    self._recent_calls.popleft()
+                if len(self._recent_calls) >= self.requests_per_minute:
+                    throttled = True
+                else:
+                    self._recent_calls.append(now)
+            malformed = not throttled and self._random.random() < self.malformed_rate
+            self.rate_limited += throttled
+            self.malformed += malformed
+            return delay, throttled, malformed
+
+    def _respond(self, prompt, malformed):
+        text = json.dumps(answer(prompt), ensure_ascii=False)
+        if malformed:
+            text = text[:max(1, len(text) // 2)] if self._random.random() < 0.5 else "I'm sorry, I can't provide JSON for this request."
+        elif self._random.random() < 0.3:
+            text = f"```json\n{text}\n```" # Models often fence their JSON
+        tokens = (len(prompt) + len(text)) // 4
+        part = SimpleNamespace(text=text)
+        return SimpleNamespace(text=text, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+                               usage_metadata=SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4,
+                                                              total_token_count=tokens))
+
+    def generate_content(self, prompt, **kwargs):
+        delay, throttled, malformed = self._draw()
+        time.sleep(delay)
+        if throttled:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        return self._respond(prompt, malformed)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        delay, throttled, malformed = self._draw()
+        await asyncio.sleep(delay)
+        if throttled:
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        return self._respond(prompt, malformed)
+
+
+def answer(prompt):
+    """Schema-valid JSON answer (as Python data) for one of the enrichment prompts."""
+    if 'Items:\n' in prompt: # Multi-item batch (gemini_batching.BatchTask.prompt)
+        items = []
+        for line in prompt.split('Items:\n', 1)[1].splitlines():
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                continue
+        analyse = rfq_analysis if 'RFQ' in prompt.split('Items:\n', 1)[0] else capability_analysis
+        return [{'id': item.get('id'), **analyse(str(item.get('text', '')))} for item in items]
+    lowered = prompt.lower()
+    if 'actionable tasks' in lowered:
+        return [{"task_id": f"TASK{i:03d}", "task_description": description, "task_importance": importance}
+                for i, (description, importance) in enumerate([
+                    ("Prioritize outreach to suppliers in the most requested RFQ categories.", 5),
+                    ("Follow up on negative feedback with the affected users.", 4),
+                    ("Rebalance campaign budget towards the best converting channels.", 3)], start=1)]
+    if 'strategic insights' in lowered:
+        return [{"insight_id": f"INS{i:03d}", "insight_title": title, "insight_explanation": explanation}
+                for i, (title, explanation) in enumerate([
+                    ("Demand concentrated in top RFQ categories", "Most RFQs target a few service types; supplier coverage there drives conversion."),
+                    ("Sentiment mostly positive", "Positive feedback dominates, but negative comments point at response times.")], start=1)]
+    if 'rfq' in lowered:
+        marker = 'RFQ text:' if 'RFQ text:' in prompt else 'Analyze RFQ:'
+        return rfq_analysis(_quoted_text(prompt, marker))
+    if 'capabilit' in lowered:
+        marker = 'Supplier capabilities:' if 'Supplier capabilities:' in prompt else 'Analyze supplier capabilities:'
+        return capability_analysis(_quoted_text(prompt, marker))
+    return {"answer": "ok"}
@@ -0,0 +1,95 @@
+"""Pre-sampled pools of Faker values, generated once, cached on disk and sampled by index.
+
+Calling Faker providers (company, bs, catch_phrase, uri_path, ...) per row dominates the cost of the
+generators. A FakerPools instance draws a fixed number of distinct values per provider once, stores
+them under FAKER_POOL_CACHE_DIR, and then serves:
+  * `pools.sample('bs', n, rng)`  - n values picked by NumPy index draws (vectorized generators);
+  * `pools.bs()`                  - one random value, a drop-in for `fake.bs()` in row loops.
+"""
+import json
+import os
+import random
+
+import numpy as np
+from faker import Faker
+
+FAKER_POOL_CACHE_DIR = '.faker_pool_cache'
+DEFAULT_POOL_SIZE = 5000
+DEFAULT_POOL_SEED = 1234
+
+# Pool name -> how to draw one value from a Faker instance
+POOL_PROVIDERS = {
+    'company': lambda f: f.company(),
+    'country': lambda f: f.country(),
+    'bs': lambda f: f.bs(),
+    'catch_phrase': lambda f: f.catch_phrase(),
+    'word': lambda f: f.word(),
+    'slug': lambda f: f.slug(),
+    'domain_name': lambda f: f.domain_name(),
+    'uri_path': lambda f: f.uri_path(),
+    'uri_path_deep2': lambda f: f.uri_path(deep=2),
+}
+
+
+class FakerPools:
+    """Lazily built, disk-cached pools of distinct Faker values (see module docstring)."""
+
+    def __init__(self, locale='en_US', size=DEFAULT_POOL_SIZE, seed=DEFAULT_POOL_SEED, cache_dir=FAKER_POOL_CACHE_DIR):
+        self.locale = locale
+        self.size = size
+        self.seed = seed
+        self.cache_dir = cache_dir
+        self._pools = {}
+        self._fake = None
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f'{self.locale}_{name}_{self.size}_{self.seed}.json')
+
+    def _generate(self, name):
+        if self._fake is None:
+            self._fake = Faker(self.locale)
+            self._fake.seed_instance(self.seed)
+        provider = POOL_PROVIDERS[name]
+        values, seen = [], set()
+        # Some providers have few distinct values (e.g. country); stop after a bounded number of tries
+        for _ in range(self.size * 3):
+            value = provider(self._fake)
+            if value not in seen:
+                seen.add(value)
+                values.append(value)
+                if len(values) == self.size:
+                    break
+        return values
+
+    def pool(self, name):
+        """All values of one pool as an object array (loaded from cache, or generated and cached)."""
+        if name not in self._pools:
+            path = self._cache_path(name)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    values = json.load(f)
+            else:
+                values = self._generate(name)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.tmp' # Write-then-rename: safe with parallel workers
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(values, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            self._pools[name] = np.array(values, dtype=object)
+        return self._pools[name]
+
+    def sample(self, name, n, rng):
+        """`n` values from pool `name`, picked uniformly by index with the NumPy Generator `rng`."""
+        values = self.pool(name)
+        return values[rng.integers(0, len(values), n)]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_fake'] = None # Loaded pools travel to worker processes; the Faker instance does not
+        return state
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in POOL_PROVIDERS:
+            raise AttributeError(name)
+        values = self.pool(name)
+        return lambda: values[random.randrange(len(values))]
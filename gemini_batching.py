@@ -0,0 +1,117 @@
+"""Multi-item batched prompts for per-row Gemini analyses.
+
+Instead of one "Analyze RFQ: ... Return JSON ONLY" prompt per row, a BatchTask packs up to K items,
+each tagged with its ID (interaction_id / user_id), into one prompt asking for a JSON array with one
+object per item. Responses are mapped back by ID; items whose object came back missing or malformed
+(e.g. the array was cut off at max_output_tokens) are retried in the next round, in smaller batches.
+K adapts to the output budget: it is sized so the expected answer fits in max_output_tokens, and the
+per-item estimate grows if the model turns out to be more verbose.
+"""
+import json
+from dataclasses import asdict
+
+from gemini_client import estimate_tokens
+from gemini_json import extract_json_objects, schema_for, to_record
+
+OUTPUT_BUDGET_SHARE = 0.75 # Fraction of max_output_tokens a batch's expected answer may use
+ID_OVERHEAD_TOKENS = 12 # '{"id": "INT0000001", ...},' per item
+
+
+class BatchTask:
+    """
+    One per-item analysis to run in batches.
+
+    `instruction` describes the analysis, `example` is the JSON object expected per item (without
+    the ID) and `items` maps item ID -> text. Results accumulate in `results` (ID -> JSON string of
+    the item's object, without the ID); IDs still missing after the last round are in `pending`.
+    """
+
+    def __init__(self, name, instruction, example, items):
+        self.name = name
+        self.instruction = instruction
+        self.example = example
+        self.required_keys = list(example)
+        schema = schema_for(name)
+        self.record_type = schema[0] if schema and not schema[1] else None # Per-item records are validated against the task's schema
+        self.items = {str(item_id): text for item_id, text in items.items()}
+        self.results = {}
+        self.tokens_per_item = estimate_tokens(json.dumps(example)) + ID_OVERHEAD_TOKENS
+
+    @property
+    def pending(self):
+        return [item_id for item_id in self.items if item_id not in self.results]
+
+    def batch_size(self, max_output_tokens, max_batch_size):
+        """Items per prompt so the expected answer stays within the output budget (at least 1)."""
+        fits = int(max_output_tokens * OUTPUT_BUDGET_SHARE // self.tokens_per_item)
+        return max(1, min(max_batch_size, fits))
+
+    def prompt(self, item_ids):
+        example = json.dumps({'id': '<item id>', **self.example}, ensure_ascii=False)
+        items = "\n".join(json.dumps({'id': item_id, 'text': self.items[item_id]}, ensure_ascii=False) for item_id in item_ids)
+        return f"""{self.instruction}
+Analyze each of the {len(item_ids)} items below independently.
+Return JSON ONLY: a JSON array with exactly one object per item, each of the form {example}.
+Copy each item's "id" unchanged. Respond in English.
+
+Items:
+{items}"""
+
+    def accept(self, item_ids, response_text):
+        """Stores the well-formed objects of a batch response; returns the IDs of `item_ids` answered."""
+        expected = set(item_ids)
+        answered = []
+        for obj in extract_json_objects(response_text):
+            item_id = str(obj.get('id', ''))
+            if item_id not in expected or item_id in self.results:
+                continue
+            if self.record_type is not None:
+                record = to_record(self.record_type, obj)
+                if record is None:
+                    continue # Malformed: retried next round
+                self.results[item_id] = json.dumps(asdict(record), ensure_ascii=False)
+            elif all(key in obj for key in self.required_keys):
+                self.results[item_id] = json.dumps({k: v for k, v in obj.items() if k != 'id'}, ensure_ascii=False)
+            else:
+                continue # Malformed: retried next round
+            answered.append(item_id)
+        if answered and response_text:
+            # Learn the model's actual verbosity so later batches keep fitting in the output budget
+            self.tokens_per_item = max(self.tokens_per_item, estimate_tokens(response_text) // len(answered))
+        return answered
+
+
+def run_batched_tasks(client, tasks, max_output_tokens, max_batch_size=20, max_rounds=3, on_result=None):
+    """
+    Runs every task's pending items through `client` (an AsyncGeminiClient), all tasks' batches sharing
+    one request queue per round. Items not answered in a round are retried in the next one with half
+    the batch size, down to single-item prompts. `on_result(task, item_id, result)` is called for each
+    item as soon as its batch is answered. Returns the number of requests sent.
+    """
+    requests_sent = 0
+    shrink = 1
+    for round_number in range(1, max_rounds + 1):
+        batches = [] # (task, item IDs)
+        for task in tasks:
+            pending = task.pending
+            size = max(1, task.batch_size(max_output_tokens, max_batch_size) // shrink)
+            batches.extend((task, pending[i:i + size]) for i in range(0, len(pending), size))
+        if not batches:
+            break
+        print(f"Batched Gemini round {round_number}: {sum(len(ids) for _, ids in batches)} items in {len(batches)} prompts "
+              f"({', '.join(f'{t.name}: {len(t.pending)}' for t in tasks if t.pending)}).")
+
+        def accept(i, response):
+            task, ids = batches[i]
+            for item_id in task.accept(ids, response):
+                if on_result is not None:
+                    on_result(task, item_id, task.results[item_id])
+
+        client.run([task.prompt(ids) for task, ids in batches],
+                   [f"{task.name} (batch of {len(ids)})" for task, ids in batches], on_result=accept)
+        requests_sent += len(batches)
+        shrink *= 2
+    for task in tasks:
+        if task.pending:
+            print(f"WARNING: {len(task.pending)} {task.name} items still unanswered after {max_rounds} rounds.")
+    return requests_sent
@@ -0,0 +1,502 @@
+"""Asynchronous, rate-limited client for Gemini `generate_content` calls.
+
+Instead of one blocking call followed by a fixed `time.sleep`, AsyncGeminiClient keeps requests
+in flight and spaces them with two token buckets: one for requests per minute and (optionally)
+one for tokens per minute. How many requests are in flight is set by an AIMD controller: it grows
+by about one per round of successful calls, up to `max_concurrency`, and halves on 429s, timeouts,
+overload errors or latency spikes. Failed calls are retried with jittered exponential back-off,
+honoring the server's retry hint; rate-limit errors pause all requests, not just the failed one.
+A circuit breaker fails the remaining prompts fast once the endpoint looks dead, instead of
+spending quota and time on retries. Any model object with `generate_content_async(prompt)` or
+`generate_content(prompt)` works, including a local fake. The SDK's own request timeout is passed
+along when the model takes `request_options`; a blocking call that times out anyway keeps its
+concurrency slot until its thread returns. With an llm_cache.LLMCache attached,
+cached prompts are answered without a call (or a token). With an llm_telemetry.LLMTelemetry
+attached, every attempt and cache answer is logged with its latency, sizes, tokens and error class.
+"""
+import asyncio
+import inspect
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 256
+RETRY_HINT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)', # google.api_core errors: 'retry_delay { seconds: 17 }'
+    r'retry[- ]after:?\s*(\d+(?:\.\d+)?)',
+    r'retry in (\d+(?:\.\d+)?)\s*s')]
+
+
+class ModelInitError(RuntimeError):
+    """The model factory failed: no call can succeed, so the circuit breaker opens at once."""
+
+
+def estimate_tokens(text):
+    """Rough prompt size in tokens (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(error):
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message or 'resource exhausted' in message or 'quota' in message
+
+
+def is_overload_error(error):
+    """429s, quota errors and server overload (503 / unavailable / deadline exceeded): signs to slow down."""
+    message = str(error).lower()
+    return (is_rate_limit_error(error) or isinstance(error, asyncio.TimeoutError) or '503' in message or 'unavailable' in message
+            or 'overloaded' in message or 'deadline' in message)
+
+
+def is_fatal_error(error):
+    """Errors no retry can fix (bad key, no permission, unknown model): the endpoint is dead for this run."""
+    if isinstance(error, ModelInitError):
+        return True
+    message = str(error).lower()
+    return ('api key' in message or 'api_key' in message or '401' in message or '403' in message or 'permission' in message
+            or ('404' in message and 'model' in message))
+
+
+def error_kind(error):
+    """Coarse class of a failed call for logs: rate_limit, timeout, overload, fatal or error."""
+    if is_rate_limit_error(error):
+        return 'rate_limit'
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if is_overload_error(error):
+        return 'overload'
+    return 'fatal' if is_fatal_error(error) else 'error'
+
+
+def retry_after_seconds(error):
+    """The server's retry hint for a failed call in seconds (a `retry_after` / `retry_delay` attribute or in the message), or None."""
+    for attribute in ('retry_after', 'retry_delay'):
+        hint = getattr(error, attribute, None)
+        if hint is not None:
+            hint = hint.total_seconds() if hasattr(hint, 'total_seconds') else getattr(hint, 'seconds', hint)
+            try:
+                return float(hint)
+            except (TypeError, ValueError):
+                pass
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(str(error))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def response_text(response):
+    """Text of a generate_content response, or None if it has no usable candidate (e.g. blocked)."""
+    if isinstance(response, str):
+        return response
+    if getattr(response, 'candidates', None) and response.candidates[0].content.parts:
+        return response.text
+    return None
+
+
+def response_token_count(response):
+    """Total tokens billed for a response, if the response reports usage."""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'total_token_count', None) if usage is not None else None
+
+
+def response_usage(response):
+    """(prompt tokens, output tokens) reported by a response; None where it doesn't report them."""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None)
+
+
+class TokenBucket:
+    """
+    Refills `rate_per_minute` units per minute, up to `capacity` (default: one minute's worth).
+    `acquire(n)` waits until n units are available; `adjust(delta)` charges or refunds units
+    after the fact (e.g. the difference between estimated and actual tokens).
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.available = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = None
+        self._lock_loop = None
+
+    def _refill(self):
+        now = self._clock()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def _get_lock(self):
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop: # asyncio.run() starts a new loop per batch; locks can't be shared across loops
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity) # A single request larger than the bucket would otherwise wait forever
+        async with self._get_lock(): # First come, first served
+            while True:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                await asyncio.sleep((amount - self.available) / self.rate_per_second)
+
+    def adjust(self, delta):
+        self._refill()
+        self.available = min(self.capacity, self.available - delta)
+
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease limit on requests in flight, between
+    `min_concurrency` and `max_concurrency`. Each successful call raises the limit by
+    `increase / limit` (about +1 per limit's worth of successes); a congested call (429, timeout,
+    overload, or latency above `latency_spike_factor` x the running average) multiplies it by
+    `decrease_factor`. Calls started before the last cut don't cut again, so one burst of errors
+    halves the limit once. `adaptive=False` keeps the limit fixed at `max_concurrency`.
+    """
+
+    def __init__(self, max_concurrency, min_concurrency=1, initial_concurrency=None, increase=1.0, decrease_factor=0.5,
+                 latency_spike_factor=3.0, adaptive=True, clock=time.monotonic):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.adaptive = adaptive
+        if not adaptive:
+            initial_concurrency = max_concurrency
+        self.limit = float(max(self.min_concurrency, min(max_concurrency, initial_concurrency or max(1, max_concurrency // 2))))
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_spike_factor = latency_spike_factor
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.samples = self.increases = self.decreases = 0
+        self._clock = clock
+        self._last_decrease = float('-inf')
+        self._condition = None
+        self._condition_loop = None
+
+    def _get_condition(self):
+        loop = asyncio.get_running_loop()
+        if self._condition_loop is not loop: # One per event loop, as for TokenBucket
+            self._condition, self._condition_loop = asyncio.Condition(), loop
+        return self._condition
+
+    async def acquire(self):
+        """Waits for a free slot; returns the start time to pass to `release`."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self._clock()
+
+    async def release(self, started, congested=False):
+        """Frees the slot taken at `started` and adapts the limit; returns the new limit if it changed."""
+        latency = self._clock() - started
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            old_limit = int(self.limit)
+            if not congested and self.latency_ewma is not None and self.samples >= 5 and latency > self.latency_spike_factor * self.latency_ewma:
+                congested = True # Latency spike: the endpoint is queueing our requests
+            if congested:
+                if self.adaptive and started >= self._last_decrease and self.limit > self.min_concurrency:
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+                    self._last_decrease = self._clock()
+                    self.decreases += 1
+            else:
+                self.samples += 1
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                if self.adaptive:
+                    self.limit = min(self.max_concurrency, self.limit + self.increase / self.limit)
+                    self.increases += int(self.limit) > old_limit
+            condition.notify_all()
+            return int(self.limit) if int(self.limit) != old_limit else None
+
+    def hold(self):
+        """Takes a slot outside acquire / release (e.g. for a timed-out call whose thread still runs); free it with `cancel`."""
+        self.in_flight += 1
+
+    async def cancel(self):
+        """Frees a slot without adapting the limit (the call was never made, or failed for reasons unrelated to load)."""
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def status(self):
+        latency = f"{self.latency_ewma:.2f}s" if self.latency_ewma is not None else "n/a"
+        return (f"concurrency limit {int(self.limit)}/{self.max_concurrency} ({self.in_flight} in flight), latency avg {latency}, "
+                f"{self.increases} increases / {self.decreases} decreases")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls (or at once on a fatal error); while
+    open, calls are refused. After `reset_seconds` one probe call is let through (half-open): its
+    success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=10, reset_seconds=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.consecutive_failures = self.trips = 0
+        self._clock = clock
+        self._opened_at = None
+        self._probing = False
+
+    def allow(self):
+        if self.state == 'open' and self._clock() - self._opened_at >= self.reset_seconds:
+            self.state = 'half-open'
+            self._probing = False
+        if self.state == 'half-open' and not self._probing:
+            self._probing = True
+            return True
+        return self.state == 'closed'
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state != 'closed':
+            print("Circuit breaker closed: the Gemini endpoint is answering again.")
+        self.state = 'closed'
+
+    def record_failure(self, fatal=False):
+        self.consecutive_failures += 1
+        if self.state == 'half-open' or fatal or (self.state == 'closed' and self.consecutive_failures >= self.failure_threshold):
+            if self.state != 'open':
+                self.trips += 1
+                print(f"Circuit breaker OPEN after {self.consecutive_failures} consecutive failed calls"
+                      f"{' (fatal error)' if fatal else ''}: remaining prompts fail fast for {self.reset_seconds:.0f}s.")
+            self.state = 'open'
+            self._opened_at = self._clock()
+
+
+class AsyncGeminiClient:
+    """
+    Runs prompts against `model` concurrently (up to an AIMD-controlled limit of at most
+    `max_concurrency`) under a requests-per-minute and an optional tokens-per-minute budget.
+    Each prompt gets up to `max_retries` attempts, with back-off starting at `retry_delay_seconds`
+    (capped at `max_retry_delay_seconds`) or the server's retry hint; a prompt that still fails, or
+    is refused by the open circuit breaker, yields None. Use `run(prompts)` from synchronous code.
+    `cache` (an LLMCache) is consulted first; with `cache_only=True` a miss yields None and the
+    model is never called (`model` may then be None). Pass `model_factory` (a no-argument callable
+    returning the model) instead of `model` to build the model only when a prompt misses the cache.
+    `telemetry` (an LLMTelemetry) gets one record per attempt, cache answer or refused prompt.
+    """
+
+    def __init__(self, model, max_concurrency=DEFAULT_MAX_CONCURRENCY, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=None, expected_output_tokens=DEFAULT_EXPECTED_OUTPUT_TOKENS, max_retries=4,
+                 retry_delay_seconds=2.0, max_retry_delay_seconds=60.0, timeout_seconds=120.0, adaptive_concurrency=True,
+                 breaker_failures=10, breaker_reset_seconds=60.0, verbose=True, cache=None, cache_only=False, model_factory=None,
+                 telemetry=None):
+        self.model = model
+        self.model_factory = model_factory
+        self._model_error = None
+        self.cache = cache
+        self.cache_only = cache_only
+        self.telemetry = telemetry
+        self.max_concurrency = max_concurrency
+        self.controller = AIMDController(max_concurrency, adaptive=adaptive_concurrency)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.expected_output_tokens = expected_output_tokens
+        self.max_retries = max_retries
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.timeout_seconds = timeout_seconds
+        self.verbose = verbose
+        self.calls = self.retries = self.failures = self.rejected = 0
+        self._paused_until = 0.0 # Global back-off after a rate-limit error (monotonic time)
+        self._executor = None
+        self._request_options = {} # Model method -> extra keyword arguments (the SDK's request timeout, if it takes one)
+        self.abandoned_calls = 0 # Timed-out blocking calls whose threads still run (each holds a concurrency slot)
+        self._abandoned_done = deque() # Appended from executor threads as abandoned calls return
+        self._loop = None
+
+    def _get_model(self):
+        if self.model is None and self.model_factory is not None:
+            if self._model_error is None:
+                try:
+                    self.model = self.model_factory()
+                except Exception as e:
+                    self._model_error = ModelInitError(f"Model initialization failed: {e}")
+            if self.model is None:
+                raise self._model_error or ModelInitError("Model factory returned no model")
+        return self.model
+
+    def _request_kwargs(self, method):
+        """`request_options` with the SDK's own request timeout if `method` takes it (google-generativeai does), else nothing."""
+        if method not in self._request_options:
+            try:
+                parameters = inspect.signature(method).parameters.values()
+            except (TypeError, ValueError):
+                parameters = ()
+            takes = any(p.name == 'request_options' or p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters)
+            self._request_options[method] = {'request_options': {'timeout': self.timeout_seconds}} if takes else {}
+        return self._request_options[method]
+
+    def _start_call(self, prompt):
+        """(awaitable response, executor future or None) of one model call: the native async call if the model has one."""
+        model = self._get_model()
+        if hasattr(model, 'generate_content_async'):
+            return model.generate_content_async(prompt, **self._request_kwargs(model.generate_content_async)), None
+        if self._executor is None: # Blocking SDK calls run on our own threads, one per in-flight request
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gemini')
+        thread_call = self._executor.submit(model.generate_content, prompt, **self._request_kwargs(model.generate_content))
+        return asyncio.wrap_future(thread_call), thread_call
+
+    def _abandon(self, thread_call):
+        """
+        A timed-out blocking call can't be cancelled: its thread runs until the SDK returns. Its slot stays
+        taken until then, so the executor never holds more calls than the concurrency limit allows.
+        """
+        self.abandoned_calls += 1
+        self.controller.hold()
+        thread_call.add_done_callback(self._abandoned_call_returned)
+
+    def _abandoned_call_returned(self, _thread_call): # Runs on the executor thread
+        self._abandoned_done.append(None)
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self._free_abandoned_slots()))
+            except RuntimeError: # That event loop is closed; the next attempt frees the slot
+                pass
+
+    async def _free_abandoned_slots(self):
+        while self._abandoned_done:
+            self._abandoned_done.popleft()
+            self.abandoned_calls -= 1
+            await self.controller.cancel()
+
+    async def generate(self, prompt, task_name='API Call'):
+        """Raw response text for one prompt (None if the call failed or returned no candidate)."""
+        telemetry = self.telemetry
+        if self.cache is not None:
+            cached = self.cache.get(prompt)
+            if cached is not None or self.cache_only:
+                if telemetry is not None:
+                    telemetry.record(task_name, 'cache_hit' if cached is not None else 'cache_miss', prompt=prompt, response=cached)
+                return cached
+        elif self.cache_only:
+            if telemetry is not None:
+                telemetry.record(task_name, 'cache_miss', prompt=prompt)
+            return None
+        estimated = estimate_tokens(prompt) + self.expected_output_tokens
+        self._loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries):
+            queued = time.monotonic()
+            await self._free_abandoned_slots()
+            while time.monotonic() < self._paused_until: # Another call hit the rate limit: everyone waits
+                await asyncio.sleep(self._paused_until - time.monotonic())
+            await self.request_bucket.acquire(1)
+            if self.token_bucket:
+                await self.token_bucket.acquire(estimated)
+            started = await self.controller.acquire() # After the buckets, so latency is the call's own
+            if not self.breaker.allow(): # Checked last: the breaker may have opened while this call waited
+                await self.controller.cancel()
+                self.rejected += 1
+                self.failures += 1
+                if telemetry is not None:
+                    telemetry.record(task_name, 'rejected', attempt + 1, prompt=prompt)
+                return None
+            congested = errored = False
+            call_started = time.monotonic()
+            thread_call = None
+            try:
+                self.calls += 1
+                call, thread_call = self._start_call(prompt)
+                response = await asyncio.wait_for(call, self.timeout_seconds)
+                actual = response_token_count(response)
+                if self.token_bucket and actual:
+                    self.token_bucket.adjust(actual - estimated)
+                text = response_text(response)
+                self.breaker.record_success()
+                if self.cache is not None:
+                    self.cache.put(prompt, text)
+                if telemetry is not None:
+                    prompt_tokens, output_tokens = response_usage(response)
+                    telemetry.record(task_name, 'success' if text is not None else 'empty', attempt + 1, call_started - queued,
+                                     time.monotonic() - call_started, prompt, text, prompt_tokens, output_tokens,
+                                     concurrency_limit=int(self.controller.limit))
+                return text
+            except Exception as e:
+                congested = is_overload_error(e)
+                errored = not congested
+                fatal = is_fatal_error(e)
+                self.breaker.record_failure(fatal=fatal)
+                if self.verbose:
+                    print(f"Error calling Gemini API for {task_name} (attempt {attempt + 1}/{self.max_retries}): "
+                          f"{'timeout' if isinstance(e, asyncio.TimeoutError) else e}")
+                final = attempt == self.max_retries - 1 or fatal
+                if telemetry is not None:
+                    telemetry.record(task_name, 'failed' if final else 'retry', attempt + 1, call_started - queued,
+                                     time.monotonic() - call_started, prompt, error=e, error_kind=error_kind(e),
+                                     concurrency_limit=int(self.controller.limit))
+                if final:
+                    print(f"{'Fatal error' if fatal else 'Max retries reached'} for {task_name}.")
+                    self.failures += 1
+                    return None
+                self.retries += 1
+                hint = retry_after_seconds(e)
+                if hint is not None:
+                    delay = hint * random.uniform(1.0, 1.1)
+                else: # Full jitter: spreads the retries of a failed burst instead of re-synchronizing them
+                    delay = random.uniform(0, min(self.max_retry_delay_seconds, self.retry_delay_seconds * 2 ** (attempt + is_rate_limit_error(e))))
+                if is_rate_limit_error(e):
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    self.request_bucket.adjust(self.request_bucket.available) # Drain the bucket: stop the burst
+            finally:
+                if thread_call is not None and not thread_call.done():
+                    self._abandon(thread_call)
+                if errored:
+                    await self.controller.cancel()
+                    new_limit = None
+                else:
+                    new_limit = await self.controller.release(started, congested) # Free the slot before backing off
+                if new_limit is not None and self.verbose and (congested or new_limit % 4 == 0 or new_limit == self.max_concurrency):
+                    print(f"Gemini client: {self.controller.status()}.")
+            await asyncio.sleep(delay)
+
+    async def generate_many(self, prompts, task_names='API Call', on_result=None):
+        """
+        Response texts for `prompts`, in order; at most `max_concurrency` calls are in flight.
+        `on_result(i, text)` is called as each prompt completes (e.g. to checkpoint results).
+        """
+        if isinstance(task_names, str):
+            task_names = [task_names] * len(prompts)
+
+        async def tracked(i, prompt, task_name):
+            text = await self.generate(prompt, task_name) # The controller bounds how many are in flight
+            if on_result is not None:
+                on_result(i, text)
+            return text
+
+        return await asyncio.gather(*(tracked(i, p, t) for i, (p, t) in enumerate(zip(prompts, task_names))))
+
+    def run(self, prompts, task_names='API Call', on_result=None):
+        """Synchronous wrapper around generate_many."""
+        if not prompts:
+            return []
+        texts = asyncio.run(self.generate_many(list(prompts), task_names, on_result))
+        if self.verbose and self.calls:
+            print(f"Gemini client: {self.status()}")
+        return texts
+
+    def status(self):
+        """One-line controller, breaker and call counts, for run logs."""
+        return (f"{self.controller.status()}; circuit {self.breaker.state} ({self.breaker.trips} trips); "
+                f"{self.calls} calls, {self.retries} retries, {self.failures} failures ({self.rejected} refused by the breaker).")
+
+    def stats(self):
+        return {'calls': self.calls, 'retries': self.retries, 'failures': self.failures, 'rejected': self.rejected,
+                'concurrency_limit': int(self.controller.limit), 'concurrency_increases': self.controller.increases,
+                'concurrency_decreases': self.controller.decreases, 'latency_avg_seconds': self.controller.latency_ewma,
+                'breaker_state': self.breaker.state, 'breaker_trips': self.breaker.trips, 'abandoned_calls': self.abandoned_calls}
@@ -0,0 +1,215 @@
+"""Robust JSON extraction and per-task validation for Gemini responses.
+
+Models wrap their JSON in ```json fences, prose, or trailing notes, nest objects in arrays, and get
+cut off at max_output_tokens. `extract_json` jumps to the first '{' or '[' and decodes from there with
+`JSONDecoder.raw_decode`, which stops where the value ends: a well-formed value is parsed in one pass,
+however it is fenced or followed by prose. Only when that fails does a repair scan track bracket depth
+token by token (strings, with escapes, are skipped whole, so braces inside them don't count) until the
+value closes; trailing commas are repaired, and an array cut off mid-element keeps its complete elements.
+
+`parse_response(text, task_name)` then validates the value against the task's schema (supplier
+capabilities, RFQ analysis, strategic insights, actionable tasks) and returns typed records.
+The malformed-response corpus lives in tests/test_gemini_json.py; `python benchmark_gemini_json.py`
+times the parser.
+"""
+import json
+import re
+from dataclasses import asdict, dataclass, field, fields
+
+VALUE_START = re.compile(r'[{\[]')
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"?|[{}\[\],]') # A string (possibly unterminated), a bracket or a comma
+TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+CLOSING = {'{': '}', '[': ']'}
+DECODER = json.JSONDecoder()
+
+
+def _loads(candidate):
+    try:
+        return json.loads(candidate), True
+    except json.JSONDecodeError:
+        pass
+    repaired = TRAILING_COMMA.sub(r'\1', candidate)
+    if repaired != candidate:
+        try:
+            return json.loads(repaired), True
+        except json.JSONDecodeError:
+            pass
+    return None, False
+
+
+def _repair(text, start):
+    """
+    (value, end) of the malformed JSON value at `start`: brackets are tracked token by token up to the
+    value's close, then trailing commas are repaired. An array cut off mid-element gives its complete
+    elements and end None. Nothing usable gives value None and where to resume (None: nowhere).
+    """
+    stack = []
+    last_element_end = None # End of the last complete element of a top-level array (for truncated output)
+    for token in TOKEN.finditer(text, start):
+        kind = token.group()
+        if kind in CLOSING:
+            stack.append(kind)
+        elif kind in ('}', ']'):
+            if CLOSING[stack[-1]] != kind:
+                return None, start + 1 # Mismatched bracket: not JSON, look for the next value after the start
+            stack.pop()
+            if not stack:
+                value, ok = _loads(text[start:token.end()])
+                return (value, token.end()) if ok else (None, start + 1)
+        elif kind == ',' and len(stack) == 1 and stack[0] == '[':
+            last_element_end = token.start()
+    if stack and stack[0] == '[' and last_element_end is not None: # Cut off mid-array: keep the complete elements
+        value, ok = _loads(text[start:last_element_end] + ']')
+        if ok:
+            return value, None
+    return None, None
+
+
+def iter_json_values(text):
+    """Every top-level JSON value (object or array) in `text`, in order; a truncated array yields its complete elements."""
+    if not text:
+        return
+    pos = 0
+    while True:
+        start_match = VALUE_START.search(text, pos)
+        if start_match is None:
+            return
+        start = start_match.start()
+        try: # One C-level scan that stops where the value ends, so fences and trailing prose cost nothing
+            value, pos = DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            value, pos = _repair(text, start)
+            if value is None:
+                if pos is None:
+                    return
+                continue
+        yield value
+        if pos is None:
+            return
+
+
+def extract_json(text):
+    """The first JSON object or array in a model response (fenced, wrapped in prose, or truncated), or None."""
+    return next(iter_json_values(text), None)
+
+
+def extract_json_objects(text):
+    """All top-level JSON objects in `text`, including the elements of (possibly truncated) arrays."""
+    objects = []
+    for value in iter_json_values(text):
+        if isinstance(value, dict):
+            objects.append(value)
+        elif isinstance(value, list):
+            objects.extend(item for item in value if isinstance(item, dict))
+    return objects
+
+
+# --- Per-task schemas: typed records; list fields are optional (default []), other fields required ---
+URGENCY_LEVELS = ('High', 'Medium', 'Low', 'Not specified')
+
+
+@dataclass(slots=True)
+class SupplierCapability:
+    capability_summary: str
+    main_categories: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class RfqAnalysis:
+    service_product_type: str
+    implied_urgency: str = field(metadata={'choices': URGENCY_LEVELS})
+    key_specifications: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class StrategicInsight:
+    insight_id: str
+    insight_title: str
+    insight_explanation: str
+
+
+@dataclass(slots=True)
+class ActionableTask:
+    task_id: str
+    task_description: str
+    task_importance: int = field(metadata={'range': (1, 5)})
+
+
+# Task name (prefix, so 'RFQ Analysis (INT0000042)' matches) -> (record type, whether the answer is a list of records)
+TASK_SCHEMAS = {
+    'Supplier Capabilities': (SupplierCapability, False),
+    'RFQ Analysis': (RfqAnalysis, False),
+    'Strategic Insights': (StrategicInsight, True),
+    'Actionable Tasks': (ActionableTask, True),
+}
+
+
+def schema_for(task_name):
+    for name, schema in TASK_SCHEMAS.items():
+        if task_name and task_name.startswith(name):
+            return schema
+    return None
+
+
+def _coerce(value, f):
+    """`value` as the type of field `f`, or raises ValueError."""
+    if f.type is list:
+        if isinstance(value, list):
+            return [str(v) for v in value if v is not None and not isinstance(v, (dict, list))]
+        return [str(value)] if isinstance(value, (str, int, float)) and value != '' else []
+    if value is None or isinstance(value, (dict, list)):
+        raise ValueError(f"{f.name}: expected a {f.type.__name__}")
+    if f.type is int:
+        number = int(float(value))
+        low, high = f.metadata['range']
+        return min(high, max(low, number))
+    text = str(value).strip()
+    if 'choices' in f.metadata:
+        return next((choice for choice in f.metadata['choices'] if choice.lower() == text.lower()), f.metadata['choices'][-1])
+    return text
+
+
+def to_record(record_type, data):
+    """`data` (a parsed JSON object) as a `record_type`, or None if a required field is missing or unusable."""
+    if not isinstance(data, dict):
+        return None
+    values = {}
+    for f in fields(record_type):
+        if f.name not in data:
+            if f.type is list:
+                continue
+            return None
+        try:
+            values[f.name] = _coerce(data[f.name], f)
+        except (TypeError, ValueError):
+            return None
+    return record_type(**values)
+
+
+def parse_response(text, task_name):
+    """
+    The validated records of a response for `task_name`: one record for per-item tasks, a list of
+    records for insights / tasks (invalid elements dropped), or None if nothing usable was found.
+    A task without a schema gets the extracted JSON value itself.
+    """
+    value = extract_json(text)
+    schema = schema_for(task_name)
+    if schema is None or value is None:
+        return value
+    record_type, is_list = schema
+    if is_list:
+        items = value if isinstance(value, list) else [value] # A single object where a list was asked for
+        records = [record for record in (to_record(record_type, item) for item in items) if record is not None]
+        return records or None
+    if isinstance(value, list): # A one-element array where an object was asked for
+        value = next((item for item in value if isinstance(item, dict)), None)
+    return to_record(record_type, value)
+
+
+def to_json(value):
+    """JSON string of a parse_response result (records become objects); "{}" for None."""
+    if value is None:
+        return "{}"
+    if isinstance(value, list):
+        return json.dumps([asdict(v) if hasattr(v, '__dataclass_fields__') else v for v in value], ensure_ascii=False)
+    return json.dumps(asdict(value) if hasattr(value, '__dataclass_fields__') else value, ensure_ascii=False)
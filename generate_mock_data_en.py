@@ -2,16 +2,45 @@ import pandas as pd
 import numpy as np
 from faker import Faker
 import random
+import os
 from datetime import datetime, timedelta
+from mock_data_engine import (CampaignIndex, generate_users_batch, generate_interactions_batch, iter_generated_chunks,
+                              run_sharded_generation, load_generation_state, generate_extension)
+from faker_pools import FakerPools
+from table_io import (ChunkedTableWriter, table_path, table_exists, resolve_table_path, read_table, write_table,
+                      append_table)
+from table_schema import compact_table, memory_report
 
 # Initialize Faker for English data
-fake = Faker('en_US') # Explicitly set to English (US)
+FAKER_LOCALE = 'en_US'
+fake = Faker(FAKER_LOCALE) # Explicitly set to English (US)
 
 # --- Configuration ---
 NUM_CAMPAIGNS = 50
 NUM_USERS = 1500 # Slightly reduced for faster testing if needed
 NUM_INTERACTIONS_TARGET = 15000
 START_DATE_DATA = datetime(2022, 1, 1)
+END_DATE_DATA = None # None = now; fix it (together with RANDOM_SEED) for byte-identical reruns
+USER_GENERATION_MODE = 'batch' # 'batch' = vectorized NumPy draws (fast, for 1M+ users); 'loop' = original row-by-row loop
+INTERACTION_GENERATION_MODE = 'batch' # 'batch' = columnar engine (scales to 100M interactions); 'loop' = original per-event loop
+RANDOM_SEED = None # Set an int for reproducible batch output
+OUTPUT_FORMAT = 'csv' # 'csv' (utf-8-sig) or 'parquet' (typed, dictionary-encoded); readers downstream auto-detect
+OUTPUT_MODE = 'memory' # 'memory' = build full DataFrames, then write; 'stream' = generate and append in chunks;
+                       # 'sharded' = stream shards of users on a process pool (both batch engines only);
+                       # 'extend' = append one date window of new users/sessions to the existing tables (batch engine)
+CHUNK_MEMORY_CEILING_MB = 256 # 'stream'/'sharded' modes: approximate peak memory per generated chunk (per worker)
+WRITE_PARQUET_COPY = False # 'stream'/'sharded' modes with OUTPUT_FORMAT = 'csv': also write marketing_interactions_en.parquet
+NUM_SHARDS = 16 # 'sharded' mode: fixed split of the users; output depends on this and the seed, not on NUM_WORKERS
+NUM_WORKERS = os.cpu_count() or 1
+EXTEND_WINDOW_START = None # 'extend' mode: None = right after the latest existing interaction; window ends at END_DATE_DATA/now
+EXTEND_NEW_USERS_PER_DAY = 1 # 'extend' mode: average new registrations per day of the window
+EXTEND_ACTIVE_USER_SHARE_PER_DAY = 0.01 # 'extend' mode: share of existing (not churned) users with new sessions, per day
+COMPACT_SCHEMA = False # True = categorical/float32/datetime columns plus integer surrogate keys (user_key, ...) next to the IDs
+FAKER_POOL_SIZE = 5000 # Distinct values pre-generated per Faker provider (company, bs, uri_path, ...)
+
+CAMPAIGNS_TABLE, USERS_TABLE, INTERACTIONS_TABLE = 'campaign_details_en', 'user_details_en', 'marketing_interactions_en'
+
+faker_pools = FakerPools(FAKER_LOCALE, size=FAKER_POOL_SIZE) # Cached on disk, sampled by index instead of calling Faker per row
 
 # --- English Sample Lists ---
 positive_feedback_samples_en = [
@@ -69,117 +98,9 @@ company_sizes_en = ['Startup (1-10 emp)', 'Small Business (11-50 emp)', 'Medium
 countries_en = ['USA', 'Canada', 'United Kingdom', 'Germany', 'Mexico', 'Australia', 'India']
 user_roles_buyer_en = ['Procurement Manager', 'Sourcing Specialist', 'Design Engineer', 'Operations Director', 'R&D Lead']
 user_roles_supplier_en = ['Sales Director', 'Business Owner', 'Account Manager', 'Production Head']
-
-# --- Generate campaign_details ---
-print("Generating campaign_details_en.csv...")
-campaign_data = []
-for i in range(NUM_CAMPAIGNS):
-    start_dt = fake.date_time_between(start_date=START_DATE_DATA, end_date='-1M')
-    start_date = start_dt.date()
-    end_date = None
-    if random.random() > 0.2: # 80% have end dates
-        end_dt = fake.date_time_between(start_date=start_dt + timedelta(days=random.randint(30, 180)), end_date='+3M')
-        end_date = end_dt.date()
-
-    campaign_type = random.choice(all_campaign_types_list_en)
-    channel = campaign_types_en[campaign_type]
-    budget = round(random.uniform(1000, 25000), 2)
-    spend = round(random.uniform(0.6 * budget, budget), 2) if budget > 0 else 0
-    if end_date and end_date < datetime.now().date(): # Past campaign
-        spend = round(random.uniform(0.8 * budget, budget), 2)
-    elif end_date and end_date >= datetime.now().date(): # Active campaign
-        days_total = (end_date - start_date).days
-        days_elapsed = (datetime.now().date() - start_date).days
-        if days_total > 0 and days_elapsed > 0:
-            spend = round(budget * min(1, (days_elapsed / days_total)) * random.uniform(0.7, 1.0), 2)
-        elif days_elapsed <=0: # Not started yet
-             spend = 0
-        else: # Default to partial spend if dates are weird
-            spend = round(random.uniform(0.3 * budget, 0.7*budget),2)
-    spend = min(spend, budget)
-
-
-    campaign_data.append({
-        'campaign_id': f'CAMP{i+1:04d}',
-        'campaign_name': f'{campaign_type} {start_date.year} {random.choice(["Alpha", "Bravo", "Charlie", "Delta"])}',
-        'campaign_start_date': start_date,
-        'campaign_end_date': end_date,
-        'campaign_objective': random.choice(campaign_objectives_en),
-        'campaign_type': campaign_type,
-        'channel_source_primary': channel,
-        'campaign_budget': budget,
-        'campaign_spend': spend,
-        'target_audience_segment': f'{random.choice(company_industries_en)} - {random.choice(company_sizes_en).split(" (")[0]}'
-    })
-df_campaigns = pd.DataFrame(campaign_data)
-all_campaign_ids = df_campaigns['campaign_id'].tolist()
-
-# --- Generate user_details ---
-print("Generating user_details_en.csv...")
-user_data = []
 user_types = ['Buyer', 'Supplier', 'Prospect']
+user_type_weights = [0.55, 0.35, 0.1]
 
-for i in range(NUM_USERS):
-    reg_dt = fake.date_time_between(start_date=START_DATE_DATA, end_date='now')
-    reg_date = reg_dt.date()
-    user_type = random.choices(user_types, weights=[0.55, 0.35, 0.1], k=1)[0]
-    role, company_name_val, industry, size_cat, sup_caps = None, None, None, None, None
-
-    if user_type != 'Prospect':
-        company_name_val = fake.company()
-        industry = random.choice(company_industries_en)
-        size_cat = random.choice(company_sizes_en)
-        if user_type == 'Buyer':
-            role = random.choice(user_roles_buyer_en)
-        else: # Supplier
-            role = random.choice(user_roles_supplier_en)
-            sup_caps = random.choice(supplier_capabilities_samples_en) if random.random() < 0.85 else None
-
-    is_paying = (user_type != 'Prospect' and random.random() < 0.5)
-    ltv = round(random.uniform(200, 12000), 2) if is_paying else 0
-    rfq_val_buyer = round(random.uniform(ltv * 0.3, ltv * 1.5),2) if user_type == 'Buyer' and is_paying else 0
-    deals_val_supplier = round(random.uniform(ltv * 0.5, ltv * 2.5),2) if user_type == 'Supplier' and is_paying else 0
-
-    feedback_text = None
-    if random.random() < 0.3: # 30% of users leave feedback
-        rand_feed = random.random()
-        if rand_feed < 0.6: feedback_text = random.choice(positive_feedback_samples_en)
-        elif rand_feed < 0.9: feedback_text = random.choice(negative_feedback_samples_en)
-        else: feedback_text = random.choice(neutral_feedback_samples_en)
-
-    first_touch_camp_id = random.choice(all_campaign_ids) if random.random() < 0.7 else None
-    first_touch_channel = None
-    if first_touch_camp_id:
-        camp_info = df_campaigns[df_campaigns['campaign_id'] == first_touch_camp_id]
-        if not camp_info.empty: first_touch_channel = camp_info['channel_source_primary'].iloc[0]
-    if not first_touch_channel: first_touch_channel = random.choice(list(campaign_types_en.values()) + ['Organic Search', 'Direct'])
-
-
-    user_data.append({
-        'user_id': f'USER{i+1:05d}',
-        'registration_date': reg_date,
-        'first_touch_channel': first_touch_channel,
-        'first_touch_campaign_id': first_touch_camp_id,
-        'user_type': user_type,
-        'user_role': role,
-        'company_name': company_name_val,
-        'company_industry': industry,
-        'company_size_category': size_cat,
-        'country': fake.country() if random.random() < 0.2 else random.choice(countries_en), # Mix of global and focus
-        'supplier_capabilities_text': sup_caps,
-        'user_feedback_text': feedback_text,
-        'total_rfq_value_submitted_buyer': rfq_val_buyer,
-        'total_deals_won_value_supplier': deals_val_supplier,
-        'ltv_actual_or_predicted': ltv,
-        'is_paying_customer': is_paying,
-        'churn_date': fake.date_between(start_date=reg_date, end_date=reg_date + timedelta(days=random.randint(60,730))) if is_paying and random.random() < 0.1 else None
-    })
-df_users = pd.DataFrame(user_data)
-user_ids_list = df_users['user_id'].tolist()
-
-# --- Generate marketing_interactions ---
-print("Generating marketing_interactions_en.csv...")
-interaction_data = []
 event_types = { # More granular event types
     'discovery': ['Site Visit', 'Blog Post View', 'Case Study View', 'Platform Search'],
     'consideration': ['Product Spec View', 'Supplier Profile View', 'Webinar Attended', 'Pricing Page Visit'],
@@ -192,135 +113,362 @@ all_event_names_list = [event for sublist in event_types.values() for event in s
 interaction_channels_list = list(campaign_types_en.values()) + ['Direct', 'Organic Search', 'Social Media Organic', 'Referral Site']
 device_cats = ['Desktop', 'Mobile', 'Tablet']
 
-interaction_id_counter = 0
-session_id_counter = 0
-current_timestamp_tracker = {} # To ensure interactions are chronological per user
+# Vocabularies for the vectorized engines in mock_data_engine.py
+user_vocab = {
+    'user_types': user_types, 'user_type_weights': user_type_weights,
+    'industries': company_industries_en, 'company_sizes': company_sizes_en,
+    'roles_buyer': user_roles_buyer_en, 'roles_supplier': user_roles_supplier_en,
+    'supplier_capabilities': supplier_capabilities_samples_en,
+    'feedback_positive': positive_feedback_samples_en, 'feedback_negative': negative_feedback_samples_en,
+    'feedback_neutral': neutral_feedback_samples_en,
+    'countries': countries_en,
+    'fallback_channels': list(campaign_types_en.values()) + ['Organic Search', 'Direct'],
+}
+interaction_vocab = {
+    'event_names': all_event_names_list,
+    'event_weights': None, # Uniform, like random.choice(all_event_names_list)
+    'conversion_events': event_types['conversion_buyer'] + event_types['conversion_supplier'],
+    'interaction_channels': interaction_channels_list,
+    'campaign_channels': ['Google Ads', 'LinkedIn Ads', 'Email Drip', 'Display Network'],
+    'device_categories': device_cats,
+    'rfq_samples': rfq_request_samples_en,
+}
 
-for user_idx, user_row in df_users.iterrows():
-    if interaction_id_counter >= NUM_INTERACTIONS_TARGET: break
-    if user_idx % 100 == 0: print(f"  Generating interactions for user {user_idx+1}/{NUM_USERS}...")
+# --- Generate campaign_details ---
+def generate_campaigns():
+    campaign_data = []
+    for i in range(NUM_CAMPAIGNS):
+        start_dt = fake.date_time_between(start_date=START_DATE_DATA, end_date='-1M')
+        start_date = start_dt.date()
+        end_date = None
+        if random.random() > 0.2: # 80% have end dates
+            end_dt = fake.date_time_between(start_date=start_dt + timedelta(days=random.randint(30, 180)), end_date='+3M')
+            end_date = end_dt.date()
+
+        campaign_type = random.choice(all_campaign_types_list_en)
+        channel = campaign_types_en[campaign_type]
+        budget = round(random.uniform(1000, 25000), 2)
+        spend = round(random.uniform(0.6 * budget, budget), 2) if budget > 0 else 0
+        if end_date and end_date < datetime.now().date(): # Past campaign
+            spend = round(random.uniform(0.8 * budget, budget), 2)
+        elif end_date and end_date >= datetime.now().date(): # Active campaign
+            days_total = (end_date - start_date).days
+            days_elapsed = (datetime.now().date() - start_date).days
+            if days_total > 0 and days_elapsed > 0:
+                spend = round(budget * min(1, (days_elapsed / days_total)) * random.uniform(0.7, 1.0), 2)
+            elif days_elapsed <=0: # Not started yet
+                 spend = 0
+            else: # Default to partial spend if dates are weird
+                spend = round(random.uniform(0.3 * budget, 0.7*budget),2)
+        spend = min(spend, budget)
+
+
+        campaign_data.append({
+            'campaign_id': f'CAMP{i+1:04d}',
+            'campaign_name': f'{campaign_type} {start_date.year} {random.choice(["Alpha", "Bravo", "Charlie", "Delta"])}',
+            'campaign_start_date': start_date,
+            'campaign_end_date': end_date,
+            'campaign_objective': random.choice(campaign_objectives_en),
+            'campaign_type': campaign_type,
+            'channel_source_primary': channel,
+            'campaign_budget': budget,
+            'campaign_spend': spend,
+            'target_audience_segment': f'{random.choice(company_industries_en)} - {random.choice(company_sizes_en).split(" (")[0]}'
+        })
+    return pd.DataFrame(campaign_data)
+
+
+# --- Generate user_details (row loop) ---
+def generate_users_loop(campaign_index):
+    """Original row-by-row user generation (USER_GENERATION_MODE = 'loop')."""
+    user_data = []
+    all_campaign_ids = campaign_index.all_ids
+    for i in range(NUM_USERS):
+        reg_dt = fake.date_time_between(start_date=START_DATE_DATA, end_date='now')
+        reg_date = reg_dt.date()
+        user_type = random.choices(user_types, weights=user_type_weights, k=1)[0]
+        role, company_name_val, industry, size_cat, sup_caps = None, None, None, None, None
+
+        if user_type != 'Prospect':
+            company_name_val = faker_pools.company()
+            industry = random.choice(company_industries_en)
+            size_cat = random.choice(company_sizes_en)
+            if user_type == 'Buyer':
+                role = random.choice(user_roles_buyer_en)
+            else: # Supplier
+                role = random.choice(user_roles_supplier_en)
+                sup_caps = random.choice(supplier_capabilities_samples_en) if random.random() < 0.85 else None
+
+        is_paying = (user_type != 'Prospect' and random.random() < 0.5)
+        ltv = round(random.uniform(200, 12000), 2) if is_paying else 0
+        rfq_val_buyer = round(random.uniform(ltv * 0.3, ltv * 1.5),2) if user_type == 'Buyer' and is_paying else 0
+        deals_val_supplier = round(random.uniform(ltv * 0.5, ltv * 2.5),2) if user_type == 'Supplier' and is_paying else 0
+
+        feedback_text = None
+        if random.random() < 0.3: # 30% of users leave feedback
+            rand_feed = random.random()
+            if rand_feed < 0.6: feedback_text = random.choice(positive_feedback_samples_en)
+            elif rand_feed < 0.9: feedback_text = random.choice(negative_feedback_samples_en)
+            else: feedback_text = random.choice(neutral_feedback_samples_en)
+
+        first_touch_camp_id = random.choice(all_campaign_ids) if random.random() < 0.7 else None
+        first_touch_channel = None
+        if first_touch_camp_id:
+            camp_info = campaign_index.get(first_touch_camp_id)
+            if camp_info: first_touch_channel = camp_info.channel_source_primary
+        if not first_touch_channel: first_touch_channel = random.choice(list(campaign_types_en.values()) + ['Organic Search', 'Direct'])
+
+
+        user_data.append({
+            'user_id': f'USER{i+1:05d}',
+            'registration_date': reg_date,
+            'first_touch_channel': first_touch_channel,
+            'first_touch_campaign_id': first_touch_camp_id,
+            'user_type': user_type,
+            'user_role': role,
+            'company_name': company_name_val,
+            'company_industry': industry,
+            'company_size_category': size_cat,
+            'country': faker_pools.country() if random.random() < 0.2 else random.choice(countries_en), # Mix of global and focus
+            'supplier_capabilities_text': sup_caps,
+            'user_feedback_text': feedback_text,
+            'total_rfq_value_submitted_buyer': rfq_val_buyer,
+            'total_deals_won_value_supplier': deals_val_supplier,
+            'ltv_actual_or_predicted': ltv,
+            'is_paying_customer': is_paying,
+            'churn_date': fake.date_between(start_date=reg_date, end_date=reg_date + timedelta(days=random.randint(60,730))) if is_paying and random.random() < 0.1 else None
+        })
+    return pd.DataFrame(user_data)
+
+
+# --- Generate marketing_interactions (row loop) ---
+def generate_interactions_loop(df_users, campaign_index):
+    """Original per-event interaction generation (INTERACTION_GENERATION_MODE = 'loop')."""
+    interaction_data = []
+    all_campaign_ids = campaign_index.all_ids
+    interaction_id_counter = 0
+    session_id_counter = 0
+    current_timestamp_tracker = {} # To ensure interactions are chronological per user
+
+    for user_idx, user_row in df_users.iterrows():
+        if interaction_id_counter >= NUM_INTERACTIONS_TARGET: break
+        if user_idx % 100 == 0: print(f"  Generating interactions for user {user_idx+1}/{NUM_USERS}...")
 
-    user_id = user_row['user_id']
-    num_sessions = random.randint(1, 8)
-    last_interaction_time_for_user = pd.to_datetime(user_row['registration_date'])
-    current_timestamp_tracker[user_id] = last_interaction_time_for_user
+        user_id = user_row['user_id']
+        num_sessions = random.randint(1, 8)
+        last_interaction_time_for_user = pd.to_datetime(user_row['registration_date'])
+        current_timestamp_tracker[user_id] = last_interaction_time_for_user
 
-    supplier_signup_started_session = False
+        supplier_signup_started_session = False
 
-for _ in range(num_sessions):
-        if interaction_id_counter >= NUM_INTERACTIONS_TARGET: break
-        session_id_counter += 1
-        session_id = f'SESS{session_id_counter:07d}'
-        num_events_in_session = random.randint(1, 7)
+        for _ in range(num_sessions):
+            if interaction_id_counter >= NUM_INTERACTIONS_TARGET: break
+            session_id_counter += 1
+            session_id = f'SESS{session_id_counter:07d}'
+            num_events_in_session = random.randint(1, 7)
 
-        # Define a data final para a geração da sessão (um pouco antes do agora)
-        session_generation_end_limit = datetime.now() - timedelta(seconds=random.randint(1,60)) # Um pouco no passado
+            # Define a data final para a geração da sessão (um pouco antes do agora)
+            session_generation_end_limit = datetime.now() - timedelta(seconds=random.randint(1,60)) # Um pouco no passado
 
-        # Calcula o início potencial da sessão
-        potential_session_start = current_timestamp_tracker[user_id] + timedelta(minutes=random.randint(1, 60*3))
+            # Calcula o início potencial da sessão
+            potential_session_start = current_timestamp_tracker[user_id] + timedelta(minutes=random.randint(1, 60*3))
 
-        # Garante que o início da sessão não ultrapasse o limite final de geração
-        # E também que não seja antes da última interação do usuário
-        actual_start_for_faker = max(current_timestamp_tracker[user_id] + timedelta(minutes=1), potential_session_start)
+            # Garante que o início da sessão não ultrapasse o limite final de geração
+            # E também que não seja antes da última interação do usuário
+            actual_start_for_faker = max(current_timestamp_tracker[user_id] + timedelta(minutes=1), potential_session_start)
         
-        # Garante que o datetime_start para o Faker não seja posterior ao datetime_end
-        if actual_start_for_faker >= session_generation_end_limit:
-            # Se o início calculado já passou do limite, ou está muito perto,
-            # precisamos recuar o início ou pular esta sessão para este usuário,
-            # ou simplesmente usar um intervalo muito pequeno se possível.
-            # A opção mais segura para evitar o erro é garantir um intervalo válido.
-            # Se a última interação do usuário já está muito perto do 'agora',
-            # pode ser difícil gerar novas sessões para ele de forma realista no passado.
-
-            # Se a última interação está muito perto do agora, dificilmente haverá novas sessões
-            if current_timestamp_tracker[user_id] >= datetime.now() - timedelta(minutes=5): # Ex: se a última interação foi nos últimos 5 min
-                 # print(f"Skipping session for user {user_id} as last interaction is too recent.")
-                 continue # Pula para a próxima iteração do loop de sessões
-
-            # Tenta criar um pequeno intervalo válido se possível, recuando o start
-            actual_start_for_faker = max(
-                current_timestamp_tracker[user_id] + timedelta(seconds=30), # Pelo menos 30s depois da última interação
-                session_generation_end_limit - timedelta(minutes=random.randint(5,10)) # Alguns minutos antes do limite final
-            )
-            # Mais uma verificação para garantir que start < end
+            # Garante que o datetime_start para o Faker não seja posterior ao datetime_end
             if actual_start_for_faker >= session_generation_end_limit:
-                # print(f"Still unable to create valid session time range for user {user_id}. Skipping session.")
-                continue
-
-
-        session_start_time = fake.date_time_between_dates(
-            datetime_start=actual_start_for_faker,
-            datetime_end=session_generation_end_limit
-        )
+                # Se o início calculado já passou do limite, ou está muito perto,
+                # precisamos recuar o início ou pular esta sessão para este usuário,
+                # ou simplesmente usar um intervalo muito pequeno se possível.
+                # A opção mais segura para evitar o erro é garantir um intervalo válido.
+                # Se a última interação do usuário já está muito perto do 'agora',
+                # pode ser difícil gerar novas sessões para ele de forma realista no passado.
+
+                # Se a última interação está muito perto do agora, dificilmente haverá novas sessões
+                if current_timestamp_tracker[user_id] >= datetime.now() - timedelta(minutes=5): # Ex: se a última interação foi nos últimos 5 min
+                     # print(f"Skipping session for user {user_id} as last interaction is too recent.")
+                     continue # Pula para a próxima iteração do loop de sessões
+
+                # Tenta criar um pequeno intervalo válido se possível, recuando o start
+                actual_start_for_faker = max(
+                    current_timestamp_tracker[user_id] + timedelta(seconds=30), # Pelo menos 30s depois da última interação
+                    session_generation_end_limit - timedelta(minutes=random.randint(5,10)) # Alguns minutos antes do limite final
+                )
+                # Mais uma verificação para garantir que start < end
+                if actual_start_for_faker >= session_generation_end_limit:
+                    # print(f"Still unable to create valid session time range for user {user_id}. Skipping session.")
+                    continue
+
+
+            session_start_time = fake.date_time_between_dates(
+                datetime_start=actual_start_for_faker,
+                datetime_end=session_generation_end_limit
+            )
         
-        current_event_time = session_start_time
-
-
-
-        for event_num in range(num_events_in_session):
-            if interaction_id_counter >= NUM_INTERACTIONS_TARGET: break
-            interaction_id_counter += 1
-
-            event_name = random.choice(all_event_names_list)
-            # Simple logic for supplier signup flow within a session
-            if (user_row['user_type'] == 'Supplier' or (user_row['user_type'] == 'Prospect' and random.random() < 0.2)):
-                if not supplier_signup_started_session and random.random() < 0.25 : # Chance to start
-                    event_name = 'Supplier Signup Start'
-                    supplier_signup_started_session = True
-                elif supplier_signup_started_session and event_name != 'Supplier Signup Start' and random.random() < 0.5: # Chance to complete
-                    event_name = 'Supplier Signup Complete'
-                    supplier_signup_started_session = False # Reset for potential next session
-
-            interaction_channel = random.choice(interaction_channels_list)
-            campaign_for_interaction = None
-            if interaction_channel in ['Google Ads', 'LinkedIn Ads', 'Email Drip', 'Display Network'] and random.random() < 0.6:
-                campaign_for_interaction = random.choice(all_campaign_ids)
-
-            interaction_value = 0
-            interaction_details = None
-            if event_name == 'RFQ Submitted':
-                interaction_value = round(random.uniform(50, 15000), 2)
-                interaction_details = random.choice(rfq_request_samples_en)
-            elif event_name == 'Supplier Signup Complete':
-                interaction_value = round(random.uniform(20, 200), 2) # Value of supplier lead
-            elif 'View' in event_name:
-                 interaction_details = f"Viewed: {fake.bs()} page"
-
-
-            interaction_data.append({
-                'interaction_id': f'INT{interaction_id_counter:07d}',
-                'user_id': user_id,
-                'session_id': session_id,
-                'interaction_timestamp': current_event_time,
-                'event_name': event_name,
-                'channel_source_interaction': interaction_channel,
-                'campaign_id': campaign_for_interaction,
-                'device_category': random.choice(device_cats),
-                'page_url_interaction': f'https://example.com/{fake.uri_path(deep=2)}',
-                'is_conversion_event': any(event_name in conv_list for conv_list in [event_types['conversion_buyer'], event_types['conversion_supplier']]),
-                'conversion_type': event_name if any(event_name in conv_list for conv_list in [event_types['conversion_buyer'], event_types['conversion_supplier']]) else None,
-                'interaction_value': interaction_value,
-                'interaction_details_text': interaction_details,
-                'time_on_page_seconds': random.randint(5, 300) if 'View' in event_name else None
-            })
-            current_event_time += timedelta(seconds=random.randint(30, 300))
-        current_timestamp_tracker[user_id] = current_event_time # Update last known time for user
-        supplier_signup_started_session = False # Reset for next session
-
-
-df_interactions = pd.DataFrame(interaction_data)
-
-# Final check for duplicate interaction_ids (should not happen with counter)
-if df_interactions['interaction_id'].duplicated().any():
-    print("WARNING: Duplicate interaction_ids found after generation! This should not happen.")
-    # Handle or raise error
-
-# --- Save to CSV ---
-df_campaigns.to_csv('campaign_details_en.csv', index=False, encoding='utf-8-sig')
-df_users.to_csv('user_details_en.csv', index=False, encoding='utf-8-sig')
-df_interactions.to_csv('marketing_interactions_en.csv', index=False, encoding='utf-8-sig')
-
-print(f"\nGenerated {len(df_campaigns)} campaigns.")
-print(f"Generated {len(df_users)} users.")
-print(f"Generated {len(df_interactions)} interactions (target was {NUM_INTERACTIONS_TARGET}).")
-print("Mock data generation in English completed!")
\ No newline at end of file
+            current_event_time = session_start_time
+
+
+
+            for event_num in range(num_events_in_session):
+                if interaction_id_counter >= NUM_INTERACTIONS_TARGET: break
+                interaction_id_counter += 1
+
+                event_name = random.choice(all_event_names_list)
+                # Simple logic for supplier signup flow within a session
+                if (user_row['user_type'] == 'Supplier' or (user_row['user_type'] == 'Prospect' and random.random() < 0.2)):
+                    if not supplier_signup_started_session and random.random() < 0.25 : # Chance to start
+                        event_name = 'Supplier Signup Start'
+                        supplier_signup_started_session = True
+                    elif supplier_signup_started_session and event_name != 'Supplier Signup Start' and random.random() < 0.5: # Chance to complete
+                        event_name = 'Supplier Signup Complete'
+                        supplier_signup_started_session = False # Reset for potential next session
+
+                interaction_channel = random.choice(interaction_channels_list)
+                campaign_for_interaction = None
+                if interaction_channel in ['Google Ads', 'LinkedIn Ads', 'Email Drip', 'Display Network'] and random.random() < 0.6:
+                    campaign_for_interaction = random.choice(all_campaign_ids)
+
+                interaction_value = 0
+                interaction_details = None
+                if event_name == 'RFQ Submitted':
+                    interaction_value = round(random.uniform(50, 15000), 2)
+                    interaction_details = random.choice(rfq_request_samples_en)
+                elif event_name == 'Supplier Signup Complete':
+                    interaction_value = round(random.uniform(20, 200), 2) # Value of supplier lead
+                elif 'View' in event_name:
+                     interaction_details = f"Viewed: {faker_pools.bs()} page"
+
+
+                interaction_data.append({
+                    'interaction_id': f'INT{interaction_id_counter:07d}',
+                    'user_id': user_id,
+                    'session_id': session_id,
+                    'interaction_timestamp': current_event_time,
+                    'event_name': event_name,
+                    'channel_source_interaction': interaction_channel,
+                    'campaign_id': campaign_for_interaction,
+                    'device_category': random.choice(device_cats),
+                    'page_url_interaction': f'https://example.com/{faker_pools.uri_path_deep2()}',
+                    'is_conversion_event': any(event_name in conv_list for conv_list in [event_types['conversion_buyer'], event_types['conversion_supplier']]),
+                    'conversion_type': event_name if any(event_name in conv_list for conv_list in [event_types['conversion_buyer'], event_types['conversion_supplier']]) else None,
+                    'interaction_value': interaction_value,
+                    'interaction_details_text': interaction_details,
+                    'time_on_page_seconds': random.randint(5, 300) if 'View' in event_name else None
+                })
+                current_event_time += timedelta(seconds=random.randint(30, 300))
+            current_timestamp_tracker[user_id] = current_event_time # Update last known time for user
+            supplier_signup_started_session = False # Reset for next session
+    return pd.DataFrame(interaction_data)
+
+
+def main():
+    if RANDOM_SEED is not None: # Also make the campaign table and the row loops reproducible
+        random.seed(RANDOM_SEED)
+        fake.seed_instance(RANDOM_SEED)
+    end_time = END_DATE_DATA or datetime.now()
+
+    if OUTPUT_MODE == 'extend': # Keep the existing campaigns: users and interactions already reference them
+        missing = [stem for stem in (CAMPAIGNS_TABLE, USERS_TABLE, INTERACTIONS_TABLE) if not table_exists(stem)]
+        if missing:
+            print(f"ERROR: 'extend' mode needs an existing dataset; missing: {', '.join(missing)}. Run another OUTPUT_MODE first.")
+            return
+        print(f"Loading {resolve_table_path(CAMPAIGNS_TABLE)}...")
+        df_campaigns = read_table(CAMPAIGNS_TABLE)
+    else:
+        print(f"Generating {table_path(CAMPAIGNS_TABLE, OUTPUT_FORMAT)}...")
+        df_campaigns = generate_campaigns()
+    campaign_index = CampaignIndex(df_campaigns, as_of=end_time) # O(1) campaign lookups by id
+    if OUTPUT_MODE != 'extend':
+        if COMPACT_SCHEMA:
+            df_campaigns = compact_table(df_campaigns, 'campaign_details')
+        write_table(df_campaigns, table_path(CAMPAIGNS_TABLE, OUTPUT_FORMAT))
+
+    users_path = table_path(USERS_TABLE, OUTPUT_FORMAT)
+    interactions_path = table_path(INTERACTIONS_TABLE, OUTPUT_FORMAT)
+    users_csv = users_path if OUTPUT_FORMAT == 'csv' else None
+    interactions_csv = interactions_path if OUTPUT_FORMAT == 'csv' else None
+    users_parquet = users_path if OUTPUT_FORMAT == 'parquet' else None
+    interactions_parquet = interactions_path if OUTPUT_FORMAT == 'parquet' else \
+        (table_path(INTERACTIONS_TABLE, 'parquet') if WRITE_PARQUET_COPY else None)
+    if OUTPUT_MODE == 'extend':
+        # Rebuild per-user last-interaction times and ID counters from the existing tables (whatever their format)
+        users_path, interactions_path = resolve_table_path(USERS_TABLE), resolve_table_path(INTERACTIONS_TABLE)
+        print(f"Rebuilding generator state from {users_path} and {interactions_path}...")
+        state = load_generation_state(users_path, interactions_path)
+        window_start = EXTEND_WINDOW_START or state.latest_timestamp.to_pydatetime()
+        if window_start >= end_time:
+            print(f"Nothing to extend: existing data already reaches {window_start}.")
+            return
+        # Mix the window into the seed so daily runs with a fixed RANDOM_SEED don't repeat the same draws
+        rng = np.random.default_rng(None if RANDOM_SEED is None else [RANDOM_SEED, int(window_start.timestamp())])
+        print(f"Extending {len(state.df_users)} users with the window {window_start} -> {end_time}...")
+        df_users, df_interactions = generate_extension(
+            rng, faker_pools, state, window_start, end_time, EXTEND_NEW_USERS_PER_DAY, EXTEND_ACTIVE_USER_SHARE_PER_DAY,
+            campaign_index, user_vocab, interaction_vocab, compact=COMPACT_SCHEMA)
+        # Only the main tables are extended, not a WRITE_PARQUET_COPY side copy
+        append_table(df_users, users_path)
+        append_table(df_interactions, interactions_path)
+        num_users_generated, num_interactions_generated = len(df_users), len(df_interactions)
+    elif OUTPUT_MODE == 'sharded':
+        # Shards of the user population run on a process pool; each gets a seed derived from the master seed
+        master_seed = RANDOM_SEED if RANDOM_SEED is not None else np.random.SeedSequence().entropy
+        print(f"Generating users and interactions in {NUM_SHARDS} shards on {NUM_WORKERS} workers (master seed {master_seed})...")
+        num_users_generated, num_interactions_generated = run_sharded_generation(
+            master_seed, NUM_SHARDS, NUM_WORKERS, faker_pools, NUM_USERS, NUM_INTERACTIONS_TARGET, START_DATE_DATA,
+            end_time, campaign_index, user_vocab, interaction_vocab, CHUNK_MEMORY_CEILING_MB,
+            users_csv, interactions_csv, interactions_parquet, compact=COMPACT_SCHEMA, users_parquet=users_parquet)
+    elif OUTPUT_MODE == 'stream':
+        # Users and interactions are generated and appended in chunks, so peak memory stays bounded
+        print(f"Streaming {users_path} and {interactions_path} (memory ceiling {CHUNK_MEMORY_CEILING_MB} MB)...")
+        with ChunkedTableWriter(users_csv, parquet_path=users_parquet) as users_out, \
+             ChunkedTableWriter(interactions_csv, parquet_path=interactions_parquet) as interactions_out:
+            for users_chunk, interactions_chunk in iter_generated_chunks(
+                    np.random.default_rng(RANDOM_SEED), faker_pools, NUM_USERS, START_DATE_DATA, end_time, campaign_index,
+                    user_vocab, interaction_vocab, NUM_INTERACTIONS_TARGET, CHUNK_MEMORY_CEILING_MB, compact=COMPACT_SCHEMA):
+                users_out.write(users_chunk)
+                interactions_out.write(interactions_chunk)
+                print(f"  ... {users_out.rows_written} users, {interactions_out.rows_written} interactions written.")
+        num_users_generated, num_interactions_generated = users_out.rows_written, interactions_out.rows_written
+    else: # 'memory'
+        rng = np.random.default_rng(RANDOM_SEED)
+        print(f"Generating {users_path}...")
+        if USER_GENERATION_MODE == 'batch':
+            df_users = generate_users_batch(rng, faker_pools, NUM_USERS, START_DATE_DATA, end_time, campaign_index, user_vocab)
+        else: # 'loop'
+            df_users = generate_users_loop(campaign_index)
+
+        print(f"Generating {interactions_path}...")
+        if INTERACTION_GENERATION_MODE == 'batch':
+            df_interactions, _ = generate_interactions_batch(rng, faker_pools, df_users, end_time, campaign_index, interaction_vocab,
+                                                             max_interactions=NUM_INTERACTIONS_TARGET)
+        else: # 'loop'
+            df_interactions = generate_interactions_loop(df_users, campaign_index)
+
+        # Final check for duplicate interaction_ids (should not happen with counter)
+        if df_interactions['interaction_id'].duplicated().any():
+            print("WARNING: Duplicate interaction_ids found after generation! This should not happen.")
+            # Handle or raise error
+
+        if COMPACT_SCHEMA:
+            print("Compacting tables (categoricals, surrogate keys, float32 money)...")
+            df_users_compact = compact_table(df_users, 'user_details')
+            memory_report('user_details', df_users, df_users_compact)
+            df_interactions_compact = compact_table(df_interactions, 'marketing_interactions')
+            memory_report('marketing_interactions', df_interactions, df_interactions_compact)
+            df_users, df_interactions = df_users_compact, df_interactions_compact
+
+        # --- Save (CSV or Parquet) ---
+        write_table(df_users, users_path)
+        write_table(df_interactions, interactions_path)
+        num_users_generated, num_interactions_generated = len(df_users), len(df_interactions)
+
+    print(f"\nGenerated {len(df_campaigns)} campaigns.")
+    print(f"Generated {num_users_generated} users.")
+    print(f"Generated {num_interactions_generated} interactions (target was {NUM_INTERACTIONS_TARGET}).")
+    print("Mock data generation in English completed!")
+
+
+if __name__ == "__main__":
+    main()
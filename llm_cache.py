@@ -0,0 +1,128 @@
+"""Persistent, content-addressed cache for LLM responses (SQLite).
+
+Responses are keyed by a SHA-256 of (model name, generation config, prompt), so a prompt that
+was already answered with the same model settings is never paid for twice, across runs.
+Entries can expire after a TTL, and the least recently used ones are evicted once the cache
+grows past a size limit. Hit/miss counters are kept per run for the end-of-run report.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+LLM_CACHE_PATH = '.llm_cache.sqlite'
+
+
+def cache_key(prompt, model_name=None, generation_config=None):
+    payload = json.dumps({'model': model_name, 'config': generation_config or {}, 'prompt': prompt},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed prompt -> response cache for one model configuration.
+
+    `ttl_seconds=None` keeps entries forever; `max_size_mb=None` disables eviction. Use `get`/`put`
+    with the prompt text; `report()` prints hits, misses and expirations for the run.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, model_name=None, generation_config=None, ttl_seconds=None,
+                 max_size_mb=None, evict_every=100):
+        self.path = path
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.evict_every = evict_every
+        self.hits = self.misses = self.expired = self.writes = self.evicted = 0
+        self._puts_since_eviction = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL') # Readers don't block the writer
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,
+            created REAL NOT NULL, last_used REAL NOT NULL, size INTEGER NOT NULL)""")
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self._conn.commit()
+
+    def key(self, prompt):
+        return cache_key(prompt, self.model_name, self.generation_config)
+
+    def get(self, prompt):
+        """Cached response text for `prompt`, or None (miss or expired entry)."""
+        key = self.key(prompt)
+        row = self._conn.execute('SELECT response, created FROM responses WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self.misses += 1
+            return None
+        if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._conn.commit()
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, prompt, response):
+        """Stores a response (None/empty responses are not cached, so failures are retried next run)."""
+        if not response:
+            return
+        now = time.time()
+        self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                           (self.key(prompt), self.model_name, response, now, now, len(response.encode('utf-8'))))
+        self._conn.commit()
+        self.writes += 1
+        self._puts_since_eviction += 1
+        if self._puts_since_eviction >= self.evict_every:
+            self.evict()
+
+    def size_bytes(self):
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until the cache fits in max_size_mb."""
+        self._puts_since_eviction = 0
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl_seconds,))
+            self.evicted += cursor.rowcount
+        if self.max_size_bytes is not None:
+            excess = self.size_bytes() - self.max_size_bytes
+            if excess > 0:
+                freed = 0
+                doomed = []
+                for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_used'):
+                    if freed >= excess:
+                        break
+                    doomed.append((key,))
+                    freed += size
+                self._conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+                self.evicted += len(doomed)
+        self._conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'expired': self.expired, 'writes': self.writes,
+                'evicted': self.evicted, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self), 'size_mb': self.size_bytes() / 1024 ** 2}
+
+    def report(self):
+        s = self.stats()
+        print(f"LLM cache ({self.path}): {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.0%} hit rate), "
+              f"{s['expired']} expired, {s['writes']} written, {s['evicted']} evicted; "
+              f"{s['entries']} entries, {s['size_mb']:.2f} MB.")
+
+    def close(self):
+        if self._conn is not None:
+            self.evict()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,194 @@
+"""Per-call telemetry for LLM requests, written to a compact run log.
+
+AsyncGeminiClient hands every attempt, and every prompt answered without a call, to an LLMTelemetry:
+task, prompt / response size (tokens as reported by the response's usage metadata, else estimated
+from characters), time queued behind the rate limits and the concurrency controller, call latency,
+attempt number and error class. Prompts answered from the LLM cache, or that the caller never sent
+because the run memo or the journal already had the answer, are logged with that outcome. Records are
+buffered and streamed to a CSV or Parquet table (see table_io.py) and folded into running aggregates per
+task type; `summary()` turns those into p50 / p95 / p99 latency, throughput, error counts, tokens and
+estimated cost, and `report()` prints that table.
+"""
+import random
+import re
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from table_io import ChunkedTableWriter, table_path
+
+LLM_TELEMETRY_STEM = 'llm_call_log'
+FLUSH_EVERY = 1000 # Records buffered before they are appended to the log
+LATENCY_SAMPLE_SIZE = 10_000 # Latencies kept per task type for the percentiles (a uniform sample once there are more)
+# Outcomes of an attempt that reached the model, and of prompts answered without one
+CALL_OUTCOMES = ('success', 'empty', 'retry', 'failed') # empty = no usable candidate (e.g. blocked); retry / failed = call error
+NO_CALL_OUTCOMES = ('cache_hit', 'cache_miss', 'rejected', 'memo', 'journal') # cache_miss = cache-only mode; rejected = open circuit breaker
+BILLED_OUTCOMES = ('success', 'empty')
+COLUMNS = ['started_at', 'task', 'task_type', 'items', 'outcome', 'attempt', 'queue_seconds', 'latency_seconds', 'prompt_chars',
+           'response_chars', 'prompt_tokens', 'output_tokens', 'tokens_estimated', 'error_kind', 'error_type', 'concurrency_limit']
+# Task names carry a trailing '(batch of N)' (gemini_batching.py) or '(<row id>)' (enrich_with_gemini.py)
+TASK_SUFFIX_PATTERN = re.compile(r'^(?P<type>.*?)\s*\((?:batch of (?P<items>\d+)|[^()]*)\)$')
+
+
+def task_type(task):
+    """(task type, items per prompt) of a task name: batched prompts carry their item count."""
+    match = TASK_SUFFIX_PATTERN.match(task)
+    if not match:
+        return task, 1
+    return match.group('type'), int(match.group('items') or 1)
+
+
+def _estimate_tokens(chars):
+    return max(1, chars // 4) if chars else 0
+
+
+class Reservoir:
+    """A uniform random sample of at most `size` of the values added (Algorithm R): bounded memory for percentiles of a stream."""
+
+    def __init__(self, size=LATENCY_SAMPLE_SIZE, seed=0):
+        self.size = size
+        self.seen = 0
+        self.values = []
+        self._random = random.Random(seed)
+
+    def add(self, value):
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            slot = self._random.randrange(self.seen)
+            if slot < self.size:
+                self.values[slot] = value
+
+    def percentile(self, q):
+        return round(float(np.percentile(self.values, q)), 3) if self.values else None
+
+
+class TaskTypeStats:
+    """Running aggregates of one task type's records: outcome counts, billed items and tokens, call window and latency samples."""
+
+    def __init__(self):
+        self.outcomes = Counter()
+        self.items = self.prompt_tokens = self.output_tokens = 0
+        self.first_call = self.last_call_end = None
+        self.latency = Reservoir()
+        self.queue = Reservoir()
+
+    def add(self, outcome, items, started_at, queue_seconds, latency_seconds, prompt_tokens, output_tokens):
+        self.outcomes[outcome] += 1
+        if outcome in BILLED_OUTCOMES:
+            self.items += items
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+        if outcome in CALL_OUTCOMES:
+            ended = started_at + (latency_seconds or 0.0)
+            self.first_call = started_at if self.first_call is None else min(self.first_call, started_at)
+            self.last_call_end = ended if self.last_call_end is None else max(self.last_call_end, ended)
+            if latency_seconds is not None:
+                self.latency.add(latency_seconds)
+            if queue_seconds is not None:
+                self.queue.add(queue_seconds)
+
+    def row(self, name, price_per_million_tokens):
+        input_price, output_price = price_per_million_tokens
+        counts = self.outcomes
+        calls = sum(counts[outcome] for outcome in CALL_OUTCOMES)
+        window = self.last_call_end - self.first_call if calls else 0.0
+        return {
+            'task_type': name, 'calls': calls, 'ok': counts['success'], 'empty': counts['empty'],
+            'errors': counts['retry'] + counts['failed'], 'failed': counts['failed'] + counts['rejected'],
+            'cache_hits': counts['cache_hit'], 'reused': counts['memo'] + counts['journal'], 'items': self.items,
+            'p50_s': self.latency.percentile(50), 'p95_s': self.latency.percentile(95), 'p99_s': self.latency.percentile(99),
+            'queue_p95_s': self.queue.percentile(95), 'calls_per_s': round(calls / window, 2) if window > 0 else None,
+            'prompt_tokens': self.prompt_tokens, 'output_tokens': self.output_tokens,
+            'est_cost_usd': round((self.prompt_tokens * input_price + self.output_tokens * output_price) / 1e6, 4),
+        }
+
+
+class LLMTelemetry:
+    """
+    Appends one record per LLM attempt or answered prompt to `path` (a .csv or .parquet table) every
+    FLUSH_EVERY records; `close()` writes the rest. Only running aggregates per task type stay in
+    memory for `summary()` (latency percentiles from a LATENCY_SAMPLE_SIZE sample per type), so memory
+    doesn't grow with the run. With `path=None` nothing is written.
+    """
+
+    def __init__(self, path=table_path(LLM_TELEMETRY_STEM, 'csv'), price_per_million_tokens=(0.0, 0.0), flush_every=FLUSH_EVERY):
+        self.path = path
+        self.price_per_million_tokens = price_per_million_tokens # (input, output) in USD, for the cost estimate
+        self.flush_every = flush_every
+        self.num_records = 0
+        self.tokens_estimated = False # Whether any token count was estimated from characters
+        self.stats = {} # Task type -> TaskTypeStats
+        self.total = TaskTypeStats()
+        self._pending = [] # Records not yet written (tuples in COLUMNS order)
+        self._writer = None
+        if path:
+            self._writer = ChunkedTableWriter(None, path) if path.endswith('.parquet') else ChunkedTableWriter(path)
+
+    def record(self, task, outcome, attempt=0, queue_seconds=None, latency_seconds=None, prompt=None, response=None,
+               prompt_tokens=None, output_tokens=None, error=None, error_kind=None, concurrency_limit=None):
+        """Logs one outcome. Token counts missing from the response are estimated from the text lengths."""
+        prompt_chars = len(prompt) if prompt is not None else 0
+        response_chars = len(response) if response is not None else 0
+        estimated = outcome in CALL_OUTCOMES and (prompt_tokens is None or output_tokens is None)
+        if outcome in CALL_OUTCOMES:
+            prompt_tokens = _estimate_tokens(prompt_chars) if prompt_tokens is None else prompt_tokens
+            output_tokens = _estimate_tokens(response_chars) if output_tokens is None else output_tokens
+        name, items = task_type(task)
+        started_at = time.time() - (latency_seconds or 0.0)
+        if name not in self.stats:
+            self.stats[name] = TaskTypeStats()
+        for stats in (self.stats[name], self.total):
+            stats.add(outcome, items, started_at, queue_seconds, latency_seconds, prompt_tokens or 0, output_tokens or 0)
+        self.num_records += 1
+        self.tokens_estimated |= estimated
+        if self._writer is not None:
+            self._pending.append((started_at, task, name, items, outcome, attempt, queue_seconds, latency_seconds,
+                                  prompt_chars, response_chars, prompt_tokens, output_tokens, estimated, error_kind,
+                                  type(error).__name__ if error is not None else None, concurrency_limit))
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    @staticmethod
+    def frame(records):
+        """Records (tuples in COLUMNS order) as a typed DataFrame."""
+        df = pd.DataFrame.from_records(records, columns=COLUMNS)
+        df['started_at'] = pd.to_datetime(df['started_at'], unit='s', utc=True)
+        for column in ('items', 'attempt', 'prompt_chars', 'response_chars'):
+            df[column] = df[column].astype('int32')
+        for column in ('queue_seconds', 'latency_seconds'):
+            df[column] = pd.to_numeric(df[column]).astype('float64').round(4)
+        for column in ('prompt_tokens', 'output_tokens', 'concurrency_limit'):
+            df[column] = pd.to_numeric(df[column]).astype('Int32')
+        return df
+
+    def flush(self):
+        if self._writer is not None and self._pending:
+            self._writer.write(self.frame(self._pending))
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def summary(self):
+        """Per task type (and 'All'): counts per outcome, latency percentiles, throughput, tokens and estimated cost."""
+        if not self.num_records:
+            return pd.DataFrame()
+        rows = [self.stats[name].row(name, self.price_per_million_tokens) for name in sorted(self.stats)]
+        return pd.DataFrame(rows + [self.total.row('All', self.price_per_million_tokens)])
+
+    def report(self):
+        summary = self.summary()
+        if summary.empty:
+            print("LLM telemetry: no LLM requests this run.")
+            return
+        print(f"\n--- LLM telemetry ({self.path or 'in memory'}: {self.num_records} records) ---")
+        print(summary.to_string(index=False))
+        if self.tokens_estimated:
+            print("(Some token counts are estimated from characters: the responses reported no usage.)")
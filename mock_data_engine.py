@@ -0,0 +1,574 @@
+"""Vectorized (NumPy) building blocks for the mock data generators.
+
+The functions here draw whole columns at once instead of looping row by row,
+using the same distributions as the original loops in generate_mock_data_en.py.
+"""
+import math
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from table_io import ChunkedTableWriter, read_table, iter_table_chunks
+from table_schema import compact_table
+
+def _choice(rng, values, size, p=None):
+    """Draws `size` items from `values` (as an object array), optionally weighted by `p`."""
+    values = np.asarray(values, dtype=object)
+    return values[rng.choice(len(values), size=size, p=p)]
+
+
+def _uniform_round(rng, low, high, mask):
+    """random.uniform(low, high) rounded to 2 decimals where `mask` is set, 0 elsewhere."""
+    values = np.round(rng.uniform(low, high, size=mask.shape), 2)
+    return np.where(mask, values, 0.0)
+
+
+def format_ids(prefix, numbers, width):
+    """Formats integer ids as e.g. 'USER00001' for a whole array at once."""
+    fmt = f'{prefix}%0{width}d'
+    return np.array([fmt % number for number in np.asarray(numbers).tolist()], dtype=object)
+
+
+CampaignRecord = namedtuple('CampaignRecord', ['campaign_id', 'campaign_name', 'channel_source_primary',
+                                               'utm_campaign', 'utm_source', 'utm_medium', 'is_active'])
+
+
+class CampaignIndex:
+    """
+    Campaign dimension keyed by campaign_id, built once from df_campaigns.
+
+    Replaces per-row `df_campaigns[df_campaigns['campaign_id'] == id]` scans with O(1) dict
+    lookups (`get`), and offers `map` to look a campaign field up for whole batches of rows.
+    utm_source/utm_medium come from the channel -> utm maps the generator uses (None without them:
+    generate_mock_data_en.py writes no utm columns).
+    """
+
+    def __init__(self, df_campaigns, utm_sources_map=None, utm_mediums_map=None, as_of=None):
+        as_of = pd.Timestamp(as_of or datetime.now())
+        end_dates = pd.to_datetime(df_campaigns['campaign_end_date'])
+        channels = df_campaigns['channel_source_primary']
+        self.dimension = pd.DataFrame({
+            'campaign_name': df_campaigns['campaign_name'].to_numpy(),
+            'channel_source_primary': channels.to_numpy(),
+            'utm_campaign': df_campaigns['campaign_name'].str.replace(' ', '_').str.lower().to_numpy(),
+            'utm_source': channels.map(utm_sources_map or {}).to_numpy(dtype=object),
+            'utm_medium': channels.map(utm_mediums_map or {}).to_numpy(dtype=object),
+            'is_active': (end_dates.isna() | (end_dates >= as_of)).to_numpy(),
+        }, index=pd.Index(df_campaigns['campaign_id'], name='campaign_id'))
+        self._records = {
+            campaign_id: CampaignRecord(campaign_id, *(None if pd.isna(v) else v for v in values))
+            for campaign_id, values in zip(self.dimension.index, self.dimension.itertuples(index=False, name=None))
+        }
+        self.all_ids = list(self._records)
+        self.active_ids = [campaign_id for campaign_id, rec in self._records.items() if rec.is_active]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, campaign_id):
+        return campaign_id in self._records
+
+    def get(self, campaign_id):
+        """CampaignRecord for `campaign_id`, or None for unknown/empty ids."""
+        return self._records.get(campaign_id)
+
+    def map(self, campaign_ids, field):
+        """Vectorized lookup of one field for an array of campaign ids (None where missing)."""
+        values = pd.Series(campaign_ids, dtype=object).map(self.dimension[field])
+        return values.to_numpy(dtype=object)
+
+
+def generate_users_batch(rng, pools, num_users, start_date, end_date, campaign_index, vocab, first_user_number=1,
+                         compact=False):
+    """
+    Builds the user_details table for `num_users` users in one pass of NumPy draws.
+
+    `pools` is a faker_pools.FakerPools, `campaign_index` a CampaignIndex of the generated campaigns,
+    `vocab` holds the sample lists used by the row loop (user types/weights, roles, industries, ...).
+    With `compact=True` the table comes back in the compact schema of table_schema.py.
+    """
+    n = num_users
+
+    # registration_date: uniform between start_date and end_date, like fake.date_time_between
+    span_seconds = max(int((end_date - start_date).total_seconds()), 1)
+    reg_ts = pd.Timestamp(start_date) + pd.to_timedelta(rng.integers(0, span_seconds, n), unit='s')
+    reg_dates = pd.DatetimeIndex(reg_ts).normalize()
+
+    user_type = _choice(rng, vocab['user_types'], n, p=vocab['user_type_weights'])
+    is_buyer = user_type == 'Buyer'
+    is_supplier = user_type == 'Supplier'
+    has_company = is_buyer | is_supplier # Prospects have no company profile
+
+    company_name = np.where(has_company, pools.sample('company', n, rng), None)
+    industry = np.where(has_company, _choice(rng, vocab['industries'], n), None)
+    size_cat = np.where(has_company, _choice(rng, vocab['company_sizes'], n), None)
+    role = np.where(is_buyer, _choice(rng, vocab['roles_buyer'], n),
+                    np.where(is_supplier, _choice(rng, vocab['roles_supplier'], n), None))
+    sup_caps = np.where(is_supplier & (rng.random(n) < 0.85), _choice(rng, vocab['supplier_capabilities'], n), None)
+
+    is_paying = has_company & (rng.random(n) < 0.5)
+    ltv = _uniform_round(rng, 200, 12000, is_paying)
+    rfq_val_buyer = _uniform_round(rng, ltv * 0.3, ltv * 1.5, is_buyer & is_paying)
+    deals_val_supplier = _uniform_round(rng, ltv * 0.5, ltv * 2.5, is_supplier & is_paying)
+
+    # 30% of users leave feedback: 60% positive, 30% negative, 10% neutral
+    leaves_feedback = rng.random(n) < 0.3
+    rand_feed = rng.random(n)
+    feedback_text = np.select(
+        [rand_feed < 0.6, rand_feed < 0.9],
+        [_choice(rng, vocab['feedback_positive'], n), _choice(rng, vocab['feedback_negative'], n)],
+        default=_choice(rng, vocab['feedback_neutral'], n))
+    feedback_text = np.where(leaves_feedback, feedback_text, None)
+
+    has_first_touch = rng.random(n) < 0.7
+    first_touch_camp_id = np.where(has_first_touch, _choice(rng, campaign_index.all_ids, n), None)
+    first_touch_channel = np.where(
+        has_first_touch,
+        campaign_index.map(first_touch_camp_id, 'channel_source_primary'),
+        _choice(rng, vocab['fallback_channels'], n))
+
+    country = np.where(rng.random(n) < 0.2,
+                       pools.sample('country', n, rng),
+                       _choice(rng, vocab['countries'], n)) # Mix of global and focus
+
+    # churn_date: uniform day between registration and registration + randint(60, 730) days
+    churns = is_paying & (rng.random(n) < 0.1)
+    churn_window = rng.integers(60, 731, n)
+    churn_offset = np.floor(rng.random(n) * (churn_window + 1)).astype('int64')
+    churn_date = pd.Series(reg_dates + pd.to_timedelta(churn_offset, unit='D')).where(churns)
+
+    user_numbers = np.arange(first_user_number, first_user_number + n)
+    df_users = pd.DataFrame({
+        'user_id': format_ids('USER', user_numbers, 5),
+        'registration_date': reg_dates,
+        'first_touch_channel': first_touch_channel,
+        'first_touch_campaign_id': first_touch_camp_id,
+        'user_type': user_type,
+        'user_role': role,
+        'company_name': company_name,
+        'company_industry': industry,
+        'company_size_category': size_cat,
+        'country': country,
+        'supplier_capabilities_text': sup_caps,
+        'user_feedback_text': feedback_text,
+        'total_rfq_value_submitted_buyer': rfq_val_buyer,
+        'total_deals_won_value_supplier': deals_val_supplier,
+        'ltv_actual_or_predicted': ltv,
+        'is_paying_customer': is_paying,
+        'churn_date': churn_date.to_numpy(),
+    })
+    return compact_table(df_users, 'user_details', keys={'user_key': user_numbers}) if compact else df_users
+
+
+def _segment_positions(counts):
+    """0-based position of every item inside its segment, for segments of the given sizes."""
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(starts, counts)
+
+
+def sample_session_skeleton(rng, reg_times, end_time, sessions_range=(1, 8), events_range=(1, 7),
+                            session_gap_minutes=(1, 180), event_gap_seconds=(30, 300)):
+    """
+    Samples sessions and event timestamps for every user at once.
+
+    Mirrors the row loop: each user gets randint(*sessions_range) sessions; a session starts
+    uniformly between (last interaction + randint(*session_gap_minutes) minutes) and a moment
+    shortly before `end_time`, and its events are spaced by randint(*event_gap_seconds) seconds.
+    Session starts are drawn one session ordinal at a time (vectorized over users) so that
+    each user's sessions stay chronological, like `current_timestamp_tracker` in the loop.
+
+    Returns (event_user_pos, event_session_pos, event_ts, event_pos_in_session, session_user_pos,
+    last_ts) with events ordered by user, then session, then time. `last_ts` is the per-user
+    last-interaction state after generation.
+    """
+    n_users = len(reg_times)
+    last_ts = np.asarray(reg_times, dtype='datetime64[s]').astype('int64')
+    end_s = np.datetime64(end_time, 's').astype('int64')
+    num_sessions = rng.integers(sessions_range[0], sessions_range[1] + 1, n_users)
+
+    sess_user, sess_ordinal, sess_start, sess_events = [], [], [], []
+    ev_gaps = []
+    for ordinal in range(sessions_range[1]):
+        users = np.flatnonzero(num_sessions > ordinal)
+        if users.size == 0:
+            break
+        last = last_ts[users]
+        session_end_limit = end_s - rng.integers(1, 61, users.size) # A little in the past
+        start_floor = last + 60 * rng.integers(session_gap_minutes[0], session_gap_minutes[1] + 1, users.size)
+        # Same fallback as the loop: squeeze the session in right before the limit, or skip it
+        squeezed = np.maximum(last + 30, session_end_limit - 60 * rng.integers(5, 11, users.size))
+        too_late = start_floor >= session_end_limit
+        start_floor = np.where(too_late, squeezed, start_floor)
+        keep = ~(too_late & (last >= end_s - 5 * 60)) & (start_floor < session_end_limit)
+        users, start_floor, session_end_limit = users[keep], start_floor[keep], session_end_limit[keep]
+
+        start = start_floor + np.floor(rng.random(users.size) * (session_end_limit - start_floor)).astype('int64')
+        k = rng.integers(events_range[0], events_range[1] + 1, users.size)
+        gaps = rng.integers(event_gap_seconds[0], event_gap_seconds[1] + 1, k.sum())
+        gap_totals = np.add.reduceat(gaps, np.cumsum(k) - k) if gaps.size else np.zeros(0, dtype='int64')
+        last_ts[users] = start + gap_totals # Update last known time for user
+
+        sess_user.append(users); sess_ordinal.append(np.full(users.size, ordinal)); sess_start.append(start)
+        sess_events.append(k); ev_gaps.append(gaps)
+
+    sess_user = np.concatenate(sess_user) if sess_user else np.zeros(0, dtype='int64')
+    sess_ordinal = np.concatenate(sess_ordinal) if sess_ordinal else np.zeros(0, dtype='int64')
+    sess_start = np.concatenate(sess_start) if sess_start else np.zeros(0, dtype='int64')
+    sess_events = np.concatenate(sess_events) if sess_events else np.zeros(0, dtype='int64')
+    ev_gaps = np.concatenate(ev_gaps) if ev_gaps else np.zeros(0, dtype='int64')
+
+    # Reorder sessions (drawn ordinal by ordinal) into user order, and carry their events along
+    order = np.lexsort((sess_ordinal, sess_user))
+    ev_offsets = np.cumsum(sess_events) - sess_events
+    k = sess_events[order]
+    pos = _segment_positions(k)
+    ev_src = np.repeat(ev_offsets[order], k) + pos
+    gaps = ev_gaps[ev_src]
+
+    # Timestamp of each event = session start + exclusive cumulative sum of the gaps before it
+    cum = np.cumsum(gaps)
+    seg_base = np.repeat(cum[np.cumsum(k) - k] - gaps[np.cumsum(k) - k], k) if k.size else cum
+    event_ts = np.repeat(sess_start[order], k) + (cum - seg_base - gaps)
+
+    event_session_pos = np.repeat(np.arange(k.size), k)
+    event_user_pos = sess_user[order][event_session_pos]
+    return (event_user_pos, event_session_pos, event_ts.astype('datetime64[s]'), pos,
+            sess_user[order], last_ts.astype('datetime64[s]'))
+
+
+def apply_supplier_signup_flow(rng, event_codes, pos_in_session, event_session_pos, eligible_event,
+                               start_code, complete_code, start_prob=0.25, complete_prob=0.5):
+    """
+    Replays the loop's per-session supplier signup state machine over whole event arrays.
+
+    For eligible events: if no signup is in progress and rand < start_prob the event becomes
+    'Supplier Signup Start'; if one is in progress (and the event isn't a Start) and
+    rand < complete_prob it becomes 'Supplier Signup Complete'. The state resets per session.
+    Steps through event positions (at most events-per-session passes), vectorized over sessions.
+    """
+    event_codes = event_codes.copy()
+    started = np.zeros(event_session_pos.max() + 1 if event_session_pos.size else 0, dtype=bool)
+    r_start = rng.random(event_codes.size)
+    r_complete = rng.random(event_codes.size)
+    for p in range(int(pos_in_session.max()) + 1 if pos_in_session.size else 0):
+        idx = np.flatnonzero((pos_in_session == p) & eligible_event)
+        if idx.size == 0:
+            continue
+        sess = event_session_pos[idx]
+        in_progress = started[sess]
+        to_start = ~in_progress & (r_start[idx] < start_prob)
+        to_complete = in_progress & (event_codes[idx] != start_code) & (r_complete[idx] < complete_prob)
+        event_codes[idx[to_start]] = start_code
+        event_codes[idx[to_complete]] = complete_code
+        started[sess[to_start]] = True
+        started[sess[to_complete]] = False
+    return event_codes
+
+
+def generate_interactions_batch(rng, pools, df_users, end_time, campaign_index, vocab,
+                                first_interaction_number=1, first_session_number=1, max_interactions=None,
+                                start_times=None, compact=False):
+    """
+    Columnar replacement for the marketing_interactions loop of generate_mock_data_en.py.
+
+    Sessions, events, event names (optionally weighted), channels, devices and timestamps are
+    drawn as arrays for all users in `df_users` at once; rows come out grouped by user and in
+    chronological order per user. Sessions start after each user's registration date, or after
+    `start_times` (one per user, e.g. their last known interaction) when given. With `compact=True`
+    the table comes back in the compact schema of table_schema.py. Returns (df_interactions, num_sessions).
+    """
+    if start_times is None:
+        start_times = pd.to_datetime(df_users['registration_date']).to_numpy()
+    event_user_pos, event_session_pos, event_ts, pos, session_user_pos, _ = sample_session_skeleton(
+        rng, start_times, end_time)
+
+    if max_interactions is not None and event_ts.size > max_interactions:
+        event_user_pos, event_session_pos = event_user_pos[:max_interactions], event_session_pos[:max_interactions]
+        event_ts, pos = event_ts[:max_interactions], pos[:max_interactions]
+    n = event_ts.size
+    num_sessions = int(event_session_pos[-1]) + 1 if n else 0
+
+    # Event names as integer codes into vocab['event_names']
+    event_names = np.asarray(vocab['event_names'], dtype=object)
+    weights = vocab.get('event_weights')
+    codes = rng.choice(len(event_names), size=n, p=weights)
+    name_code = {name: code for code, name in enumerate(event_names)}
+    user_type = df_users['user_type'].to_numpy(dtype=object)[event_user_pos]
+    eligible = (user_type == 'Supplier') | ((user_type == 'Prospect') & (rng.random(n) < 0.2))
+    codes = apply_supplier_signup_flow(rng, codes, pos, event_session_pos, eligible,
+                                       name_code['Supplier Signup Start'], name_code['Supplier Signup Complete'])
+
+    is_view_code = np.array(['View' in name for name in event_names])
+    is_conversion_code = np.isin(event_names, vocab['conversion_events'])
+    is_view = is_view_code[codes]
+    is_rfq = codes == name_code['RFQ Submitted']
+    is_signup_complete = codes == name_code['Supplier Signup Complete']
+
+    channel = _choice(rng, vocab['interaction_channels'], n)
+    with_campaign = np.isin(channel, vocab['campaign_channels']) & (rng.random(n) < 0.6)
+    campaign = np.where(with_campaign, _choice(rng, campaign_index.all_ids, n), None)
+
+    value = np.where(is_rfq, np.round(rng.uniform(50, 15000, n), 2),
+                     np.where(is_signup_complete, np.round(rng.uniform(20, 200, n), 2), 0.0)) # Value of supplier lead
+    viewed_pool = np.array([f"Viewed: {bs} page" for bs in pools.pool('bs')], dtype=object)
+    url_pool = np.array([f'https://example.com/{path}' for path in pools.pool('uri_path_deep2')], dtype=object)
+    details = np.where(is_rfq, _choice(rng, vocab['rfq_samples'], n),
+                       np.where(is_view, _choice(rng, viewed_pool, n), None))
+    names = event_names[codes]
+
+    interaction_numbers = np.arange(first_interaction_number, first_interaction_number + n)
+    session_numbers = np.arange(first_session_number, first_session_number + num_sessions)
+    df_interactions = pd.DataFrame({
+        'interaction_id': format_ids('INT', interaction_numbers, 7),
+        'user_id': df_users['user_id'].to_numpy(dtype=object)[event_user_pos],
+        'session_id': format_ids('SESS', session_numbers, 7)[event_session_pos],
+        'interaction_timestamp': event_ts.astype('datetime64[ns]'),
+        'event_name': names,
+        'channel_source_interaction': channel,
+        'campaign_id': campaign,
+        'device_category': _choice(rng, vocab['device_categories'], n),
+        'page_url_interaction': _choice(rng, url_pool, n),
+        'is_conversion_event': is_conversion_code[codes],
+        'conversion_type': np.where(is_conversion_code[codes], names, None),
+        'interaction_value': value,
+        'interaction_details_text': details,
+        'time_on_page_seconds': np.where(is_view, rng.integers(5, 301, n), np.nan),
+    })
+    if compact:
+        keys = {'interaction_key': interaction_numbers, 'session_key': session_numbers[event_session_pos]}
+        if 'user_key' in df_users:
+            keys['user_key'] = df_users['user_key'].to_numpy()[event_user_pos]
+        df_interactions = compact_table(df_interactions, 'marketing_interactions', keys=keys)
+    return df_interactions, num_sessions
+
+
+def iter_generated_chunks(rng, pools, num_users, start_date, end_time, campaign_index, user_vocab, interaction_vocab,
+                          max_interactions, memory_ceiling_mb, pilot_users=2000, memory_overhead_factor=4,
+                          first_user_number=1, first_interaction_number=1, first_session_number=1, compact=False):
+    """
+    Generates users and their interactions in user-range chunks sized to stay under a memory ceiling.
+
+    A small pilot chunk measures the in-memory size per user (user row plus its interactions);
+    later chunks are sized so that, with `memory_overhead_factor` headroom for the intermediate
+    arrays, a chunk stays below `memory_ceiling_mb`. Interaction/session numbers continue across
+    chunks, and interactions stop once `max_interactions` is reached (users are still produced).
+    `compact=True` yields chunks in the compact schema of table_schema.py. Yields (df_users_chunk, df_interactions_chunk).
+    """
+    ceiling_bytes = memory_ceiling_mb * 1024 * 1024
+    next_user, next_interaction, next_session = first_user_number, first_interaction_number, first_session_number
+    last_user = first_user_number + num_users - 1
+    users_per_chunk = min(pilot_users, num_users)
+    while next_user <= last_user:
+        chunk_users = min(users_per_chunk, last_user - next_user + 1)
+        df_users = generate_users_batch(rng, pools, chunk_users, start_date, end_time, campaign_index, user_vocab,
+                                        first_user_number=next_user, compact=compact)
+        remaining = max_interactions - (next_interaction - first_interaction_number)
+        df_interactions = pd.DataFrame()
+        if remaining > 0:
+            df_interactions, num_sessions = generate_interactions_batch(
+                rng, pools, df_users, end_time, campaign_index, interaction_vocab,
+                first_interaction_number=next_interaction, first_session_number=next_session,
+                max_interactions=remaining, compact=compact)
+            next_interaction += len(df_interactions)
+            next_session += num_sessions
+        next_user += chunk_users
+
+        # Re-size the next chunk from what this one actually cost
+        chunk_bytes = df_users.memory_usage(deep=True).sum() + df_interactions.memory_usage(deep=True).sum()
+        bytes_per_user = max(chunk_bytes / chunk_users, 1) * memory_overhead_factor
+        users_per_chunk = max(1, int(ceiling_bytes / bytes_per_user))
+        yield df_users, df_interactions
+
+
+GenerationState = namedtuple('GenerationState', ['df_users', 'last_ts', 'latest_timestamp', 'next_user_number',
+                                                 'next_interaction_number', 'next_session_number'])
+
+
+def _max_id_number(ids, prefix):
+    """Largest numeric part of ids like 'INT0001234' (0 if there are none)."""
+    numbers = pd.to_numeric(pd.Series(ids, dtype=object).dropna().str.slice(len(prefix)), errors='coerce')
+    return int(numbers.max()) if numbers.notna().any() else 0
+
+
+def load_generation_state(users_path, interactions_path, chunksize=1_000_000):
+    """
+    Rebuilds the generator state from previously written user/interaction tables (CSV or Parquet).
+
+    Returns a GenerationState with the users needed to continue generating (user_id,
+    registration_date, user_type, churn_date), each user's last interaction time (`last_ts`, a
+    Series by user_id: what `current_timestamp_tracker` holds in the loop), the latest timestamp
+    overall and the next free user/interaction/session numbers. Interactions are read in chunks,
+    so only the per-user aggregate is ever held in memory.
+    """
+    df_users = read_table(users_path, columns=['user_id', 'registration_date', 'user_type', 'churn_date'],
+                          parse_dates=['registration_date', 'churn_date'])
+    last_ts = pd.Series(dtype='datetime64[ns]')
+    max_interaction = max_session = 0
+    for chunk in iter_table_chunks(interactions_path, columns=['interaction_id', 'user_id', 'session_id', 'interaction_timestamp'],
+                                   chunksize=chunksize, parse_dates=['interaction_timestamp']):
+        chunk_last = chunk.groupby('user_id')['interaction_timestamp'].max()
+        last_ts = chunk_last if last_ts.empty else pd.concat([last_ts, chunk_last]).groupby(level=0).max()
+        max_interaction = max(max_interaction, _max_id_number(chunk['interaction_id'], 'INT'))
+        max_session = max(max_session, _max_id_number(chunk['session_id'], 'SESS'))
+    latest = last_ts.max() if not last_ts.empty else df_users['registration_date'].max()
+    return GenerationState(df_users, last_ts, latest, _max_id_number(df_users['user_id'], 'USER') + 1,
+                           max_interaction + 1, max_session + 1)
+
+
+def generate_extension(rng, pools, state, window_start, window_end, new_users_per_day, active_user_share_per_day,
+                       campaign_index, user_vocab, interaction_vocab, compact=False):
+    """
+    Generates one date window of new data on top of an existing dataset (see load_generation_state).
+
+    New registrations (Poisson, `new_users_per_day` on average) fall inside the window. Existing,
+    not yet churned users are active in the window with probability `active_user_share_per_day`
+    per window day; their sessions continue from max(last interaction, window_start). IDs continue
+    from the state's counters. `compact` as for generate_users_batch. Returns (df_new_users, df_new_interactions).
+    """
+    window_days = max((window_end - window_start).total_seconds() / 86400, 0)
+    num_new_users = int(rng.poisson(new_users_per_day * window_days))
+    df_new_users = generate_users_batch(rng, pools, num_new_users, window_start, window_end, campaign_index,
+                                        user_vocab, first_user_number=state.next_user_number, compact=compact)
+
+    existing = state.df_users
+    not_churned = existing['churn_date'].isna() | (existing['churn_date'] >= pd.Timestamp(window_start))
+    active = not_churned.to_numpy() & (rng.random(len(existing)) < min(1.0, active_user_share_per_day * window_days))
+    df_active = existing.loc[active, ['user_id', 'registration_date', 'user_type']]
+    resume_from = df_active['user_id'].map(state.last_ts).fillna(df_active['registration_date'])
+
+    df_sessions_users = pd.concat([df_active, df_new_users[['user_id', 'registration_date', 'user_type']]],
+                                  ignore_index=True)
+    start_times = np.concatenate([resume_from.to_numpy(dtype='datetime64[ns]'),
+                                  pd.to_datetime(df_new_users['registration_date']).to_numpy(dtype='datetime64[ns]')])
+    start_times = np.maximum(start_times, np.datetime64(window_start, 'ns')) # Nothing before the window
+    df_new_interactions, _ = generate_interactions_batch(
+        rng, pools, df_sessions_users, window_end, campaign_index, interaction_vocab,
+        first_interaction_number=state.next_interaction_number, first_session_number=state.next_session_number,
+        start_times=start_times, compact=compact)
+    return df_new_users, df_new_interactions
+
+
+ShardSpec = namedtuple('ShardSpec', ['shard', 'first_user_number', 'num_users', 'first_id_number', 'max_interactions'])
+
+
+def plan_shards(num_users, max_interactions, num_shards):
+    """
+    Splits the user population and the interaction target into fixed per-shard ranges.
+
+    Shard k owns users [k * users_per_shard + 1, ...] and the interaction/session number range
+    starting at k * quota + 1 (a shard never has more sessions than interactions, so one range
+    width serves both). The plan depends only on the sizes and NUM_SHARDS, never on worker count.
+    """
+    users_per_shard = math.ceil(num_users / num_shards)
+    quota = math.ceil(max_interactions / num_shards)
+    shards = []
+    for k in range(num_shards):
+        first_user = k * users_per_shard + 1
+        shard_users = min(users_per_shard, num_users - first_user + 1)
+        if shard_users <= 0:
+            break
+        shard_quota = max(0, min(quota, max_interactions - k * quota))
+        shards.append(ShardSpec(k, first_user, shard_users, k * quota + 1, shard_quota))
+    return shards
+
+
+def generate_shard(task):
+    """
+    Worker: generates one shard's users and interactions into headerless CSV and/or Parquet part files.
+
+    Randomness comes only from the shard's SeedSequence (the Faker pools are fixed and only sampled),
+    so a shard's bytes are the same whichever process runs it. Returns (shard, users_columns, interactions_columns, n_users, n_interactions).
+    """
+    (spec, seed_seq, pools, start_date, end_time, campaign_index, user_vocab, interaction_vocab,
+     memory_ceiling_mb, part_dir, part_formats, compact) = task
+    rng = np.random.default_rng(seed_seq)
+    users_part = os.path.join(part_dir, f'users_{spec.shard:05d}')
+    interactions_part = os.path.join(part_dir, f'interactions_{spec.shard:05d}')
+    users_columns = interactions_columns = None
+    users_formats, interactions_formats = part_formats
+    with ChunkedTableWriter(users_part + '.csv' if 'csv' in users_formats else None,
+                            parquet_path=users_part + '.parquet' if 'parquet' in users_formats else None,
+                            encoding='utf-8', header=False) as users_out, \
+         ChunkedTableWriter(interactions_part + '.csv' if 'csv' in interactions_formats else None,
+                            parquet_path=interactions_part + '.parquet' if 'parquet' in interactions_formats else None,
+                            encoding='utf-8', header=False) as interactions_out:
+        for users_chunk, interactions_chunk in iter_generated_chunks(
+                rng, pools, spec.num_users, start_date, end_time, campaign_index, user_vocab, interaction_vocab,
+                spec.max_interactions, memory_ceiling_mb, first_user_number=spec.first_user_number,
+                first_interaction_number=spec.first_id_number, first_session_number=spec.first_id_number,
+                compact=compact):
+            users_out.write(users_chunk)
+            interactions_out.write(interactions_chunk)
+            users_columns = list(users_chunk.columns)
+            if not interactions_chunk.empty:
+                interactions_columns = list(interactions_chunk.columns)
+    return spec.shard, users_columns, interactions_columns, users_out.rows_written, interactions_out.rows_written
+
+
+def _concat_parts(part_paths, columns, csv_path, parquet_path):
+    """Concatenates headerless CSV parts (in shard order) under one header; merges Parquet parts likewise."""
+    if csv_path:
+        with open(csv_path, 'w', encoding='utf-8-sig', newline='') as out:
+            pd.DataFrame(columns=columns).to_csv(out, index=False)
+            for part in part_paths:
+                with open(part + '.csv', 'r', encoding='utf-8', newline='') as src:
+                    shutil.copyfileobj(src, out)
+    if parquet_path:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        for part in part_paths:
+            if not os.path.exists(part + '.parquet'):
+                continue
+            part_file = pq.ParquetFile(part + '.parquet')
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_path, part_file.schema_arrow, use_dictionary=True, compression='snappy')
+            for batch in part_file.iter_batches():
+                table = pa.Table.from_batches([batch])
+                if not table.schema.equals(writer.schema):
+                    table = table.cast(writer.schema) # e.g. per-shard categorical dictionaries or all-null columns
+                writer.write_table(table)
+        if writer is not None:
+            writer.close()
+
+
+def run_sharded_generation(master_seed, num_shards, num_workers, pools, num_users, max_interactions, start_date,
+                           end_time, campaign_index, user_vocab, interaction_vocab, memory_ceiling_mb,
+                           users_csv, interactions_csv, interactions_parquet=None, compact=False, users_parquet=None):
+    """
+    Generates users and interactions shard by shard on a process pool and writes the final tables.
+
+    Each shard gets a child of SeedSequence(master_seed) and its own ID ranges (see plan_shards);
+    parts are concatenated in shard order, so with a fixed master seed and end_time the output is
+    byte-identical for any `num_workers`. Each table is written as CSV and/or Parquet depending on
+    which of its paths are given. Returns (num_users_written, num_interactions_written).
+    """
+    shards = plan_shards(num_users, max_interactions, num_shards)
+    seeds = np.random.SeedSequence(master_seed).spawn(len(shards))
+    part_dir = tempfile.mkdtemp(prefix='mock_shards_', dir=os.path.dirname(os.path.abspath(users_csv or users_parquet)))
+    part_formats = ([fmt for fmt, path in (('csv', users_csv), ('parquet', users_parquet)) if path],
+                    [fmt for fmt, path in (('csv', interactions_csv), ('parquet', interactions_parquet)) if path])
+    tasks = [(spec, seed, pools, start_date, end_time, campaign_index, user_vocab, interaction_vocab,
+              memory_ceiling_mb, part_dir, part_formats, compact) for spec, seed in zip(shards, seeds)]
+    try:
+        if num_workers <= 1:
+            results = list(map(generate_shard, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                results = []
+                for result in pool.map(generate_shard, tasks):
+                    results.append(result)
+                    print(f"  ... shard {result[0] + 1}/{len(shards)} done ({result[3]} users, {result[4]} interactions).")
+        users_columns = next(r[1] for r in results if r[1])
+        interactions_columns = next((r[2] for r in results if r[2]), [])
+        _concat_parts([os.path.join(part_dir, f'users_{r[0]:05d}') for r in results], users_columns, users_csv, users_parquet)
+        _concat_parts([os.path.join(part_dir, f'interactions_{r[0]:05d}') for r in results], interactions_columns,
+                      interactions_csv, interactions_parquet)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+    return sum(r[3] for r in results), sum(r[4] for r in results)
@@ -0,0 +1,146 @@
+"""Rule-based local RFQ extraction, so only ambiguous RFQ texts need Gemini.
+
+Most RFQs state their process ("CNC machined", "injection molding", "SLA", "PCBA"), quantity
+("1,500 units", "Qty: 500 pcs"), material ("aluminum (6061-T6)", "4140 steel") and urgency cue
+("Urgent", "by EOM", "Budgetary") plainly. `extract_rfq` fills service_product_type,
+implied_urgency and key_specifications (the RfqAnalysis fields of gemini_json.py) with precompiled
+regexes and a keyword taxonomy, in about 0.1 ms per text, and scores its confidence:
+
+    process    0.45 one specific process, 0.30 only a generic one (fabrication, components),
+               0.15 several specific processes (ambiguous), 0 none
+    urgency    0.25 one cue level, 0.15 no cue ('Not specified'); conflicting cue levels, or an
+               ambiguous cue ('ongoing', 'recurring'), cap the total at AMBIGUOUS_MAX_CONFIDENCE
+    specs      0.15 a quantity, 0.15 a material or drawing / part number
+
+Texts scoring below the caller's threshold are the ones worth escalating to the LLM.
+`python rfq_rules.py` runs the extractor over the generator's sample RFQs and times it.
+"""
+import re
+from collections import namedtuple
+
+from gemini_json import RfqAnalysis
+
+RfqExtraction = namedtuple('RfqExtraction', ['service_product_type', 'implied_urgency', 'key_specifications', 'confidence'])
+
+# (service / product type, keyword pattern); specific processes first, generic fallbacks last.
+# Keyword patterns are lowercase and matched against the lowercased text (cheaper than IGNORECASE),
+# and every alternation is anchored at a word boundary, which keeps the scan short.
+PROCESS_TAXONOMY = [
+    ('PCB Assembly', r'pcba|printed circuit board|\bpcbs?\b|\bsmt\b|through[- ]hole'),
+    ('3D Printing', r'3d print|additive manufactur|\bsla\b|\bsls\b|\bfdm\b|\bdmls\b|rapid prototyp'),
+    ('Injection Molding', r'injection[- ]mou?ld|overmou?ld|insert mou?ld'),
+    ('Sheet Metal Fabrication', r'sheet metal|laser cut|press brake|punching|bending'),
+    ('CNC Machining', r'\bcnc\b|machin(?:ed|ing)\b|\bmilling\b|\bturning\b'),
+    ('Gear Manufacturing', r'\bgears?\b|hobbing'),
+    ('Metal Stamping', r'stamping|progressive die|deep draw'),
+    ('Casting', r'\bcastings?\b|die[- ]cast'),
+    ('Forging', r'\bforg(?:e|ed|ing|ings)\b'),
+    ('Welding', r'\bweld(?:ed|ing|ment)?\b'),
+    ('Metal Fabrication', r'fabricat|enclosures?'),
+    ('Bearings & Components', r'bearings?|fasteners?|part number|\bp/n\b'),
+]
+GENERIC_PROCESSES = {'Metal Fabrication', 'Bearings & Components'}
+PROCESS_PATTERN = re.compile(r'\b(?:' + '|'.join(f'(?P<p{i}>{pattern})' for i, (_, pattern) in enumerate(PROCESS_TAXONOMY)) + ')')
+
+URGENCY_CUES = [
+    ('High', r'\burgent|\basap\b|a\.s\.a\.p|\brush\b|expedite|immediately|tight deadline|within \d+\s*(?:hours|hrs|business days?)'),
+    ('Medium', r'\bby eom\b|end of (?:the )?month|within \d+\s*(?:days|weeks)|\bsoon\b|delivery by|need(?:ed)? by|standard lead time'),
+    ('Low', r'budgetary|exploring|ballpark|\bestimate\b|no rush|future project'),
+]
+URGENCY_PATTERN = re.compile(r'\b(?:' + '|'.join(f'(?P<u{i}>{pattern})' for i, (_, pattern) in enumerate(URGENCY_CUES)) + ')')
+# Cues whose urgency level depends on the rest of the text ("ongoing line-down issue" vs "ongoing supply"): left to the LLM
+AMBIGUOUS_URGENCY_PATTERN = re.compile(r'\bongoing\b|\brecurring\b')
+AMBIGUOUS_MAX_CONFIDENCE = 0.5 # Confidence cap of a text with an ambiguous urgency cue, so callers escalate it
+
+QUANTITY_PATTERN = re.compile(
+    r'\b(?:qty|quantity)\s*:?\s*\d[\d,]*(?:\s*(?:pcs|pieces|units|parts)\b)?'
+    r'|(?:\bapprox\.?\s*)?(?<![-/])\b(?:\d{1,3}(?:,\d{3})+|\d+)\s+(?:[A-Za-z-]+\s+){0,3}?(?!hours|days|weeks|months|years|stainless)(?-i:[a-z]+s)\b(?:/(?:month|week|year))?',
+    re.IGNORECASE)
+# Alloy grades that name a material on their own ("304L tubing"): stainless, aluminum (with temper) and carbon / alloy steels
+MATERIAL_GRADES = (r'(?:30[34]|31[06]|321|41[06]|420|430|440)[LH]?|440C|17-4\s*PH|15-5\s*PH'
+                   r'|(?:1100|2024|5052|6061|6063|7075)(?:-[TH]\d{1,4})?|1018|1045|12L14|4130|4140|4340|8620|A36')
+MATERIAL_PATTERN = re.compile(
+    r'\b(?:\d{3,4}[A-Z]?(?:-[TH]\d{1,4})?\s+)?(?:aluminum|aluminium|stainless steel|stainless|mild steel|carbon steel|tool steel|steel|brass|copper|'
+    r'bronze|titanium|inconel|abs|nylon|polycarbonate|delrin|peek|acrylic|resin)\b(?:\s+plastic)?(?:\s*\([^)]{1,20}\))?'
+    # A bare grade, unless it is part of a larger number or identifier, or is itself a count ("316 pcs")
+    r'|(?<![\d,.#/-])\b(?:' + MATERIAL_GRADES + r')\b(?!\s*(?:pcs|pieces|units|parts|x)\b)',
+    re.IGNORECASE)
+IDENTIFIER_PATTERN = re.compile(r'\b(?:drawing|dwg|part number|part no\.?|p/n)\s*[#:]?\s*[A-Z0-9][A-Z0-9-]+', re.IGNORECASE)
+DETAIL_PATTERN = re.compile(
+    r'(?:\+/-|±)\s*\d*\.?\d+\s*(?:mm|in|")?|\b(?:\d*\.?\d+\s*(?:mm|cm|inch|in)\b|\d*\.\d+"|hardened\b|heat[- ]treated|anodized|'
+    r'powder[- ]coated|double-sided SMT|color \w+|(?:STL|STEP) files\b|BOM\b|Gerbers?\b)',
+    re.IGNORECASE)
+MAX_SPECIFICATIONS = 5
+
+
+def _specifications(text):
+    """
+    Quantities, then materials / identifiers, then other details (text order within each group),
+    and which of the patterns matched at all.
+    """
+    specs, seen, matched = [], [], []
+    for pattern in (QUANTITY_PATTERN, MATERIAL_PATTERN, IDENTIFIER_PATTERN, DETAIL_PATTERN):
+        found = False
+        for match in pattern.finditer(text):
+            found = True
+            spec = match.group(0).strip(' ,.;')
+            key = spec.lower()
+            if spec and not any(key in other for other in seen):
+                specs.append(spec)
+                seen.append(key)
+        matched.append(found)
+    return specs[:MAX_SPECIFICATIONS], matched
+
+
+def extract_rfq(text):
+    """RfqExtraction (service_product_type, implied_urgency, key_specifications, confidence) for one RFQ text."""
+    if not isinstance(text, str) or not text.strip():
+        return RfqExtraction('Not specified', 'Not specified', [], 0.0)
+    lowered = text.lower()
+    processes = {PROCESS_TAXONOMY[int(m.lastgroup[1:])][0] for m in PROCESS_PATTERN.finditer(lowered)}
+    specific = [name for name, _ in PROCESS_TAXONOMY if name in processes and name not in GENERIC_PROCESSES]
+    generic = [name for name, _ in PROCESS_TAXONOMY if name in processes and name in GENERIC_PROCESSES]
+    if len(specific) == 1:
+        process, confidence = specific[0], 0.45
+    elif specific:
+        process, confidence = specific[0], 0.15 # Several processes: the first in taxonomy order is a guess
+    elif generic:
+        process, confidence = generic[0], 0.30
+    else:
+        process, confidence = 'Not specified', 0.0
+
+    levels = {URGENCY_CUES[int(m.lastgroup[1:])][0] for m in URGENCY_PATTERN.finditer(lowered)}
+    urgency = next((level for level, _ in URGENCY_CUES if level in levels), 'Not specified')
+    confidence += 0.25 if len(levels) == 1 else 0.15 if not levels else 0.0
+    ambiguous = len(levels) > 1 or AMBIGUOUS_URGENCY_PATTERN.search(lowered) is not None
+
+    specs, (has_quantity, has_material, has_identifier, _) = _specifications(text)
+    if has_quantity:
+        confidence += 0.15
+    if has_material or has_identifier:
+        confidence += 0.15
+    if ambiguous:
+        confidence = min(confidence, AMBIGUOUS_MAX_CONFIDENCE)
+    return RfqExtraction(process, urgency, specs, round(confidence, 2))
+
+
+def rfq_record(extraction):
+    """The RfqAnalysis record of an extraction, as a Gemini answer would be parsed (see gemini_json.to_json)."""
+    return RfqAnalysis(extraction.service_product_type, extraction.implied_urgency, list(extraction.key_specifications))
+
+
+if __name__ == '__main__':
+    import time
+    from generate_mock_data_en import rfq_request_samples_en as samples
+    samples = samples + ["Please see the attached package and send us your best offer.",
+                         "Need CNC machined and injection molded versions of the same housing, ASAP or budgetary estimate is fine."]
+    for text in samples:
+        extraction = extract_rfq(text)
+        print(f"{extraction.confidence:.2f}  {extraction.service_product_type} / {extraction.implied_urgency} / "
+              f"{extraction.key_specifications}\n      {text}")
+    rounds = 2000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in samples:
+            extract_rfq(text)
+    print(f"\n{(time.perf_counter() - started) / (rounds * len(samples)) * 1e6:.1f} us per RFQ text")
@@ -0,0 +1,88 @@
+"""Startup helpers for the enrichment scripts: command-line flags, per-component timing, offline-safe NLTK data.
+
+The scripts only import and initialize what a run needs, and never touch the network at startup:
+NLTK data is looked up locally and downloaded only with --download-nltk (VADER scoring uses the
+lexicon bundled with vaderSentiment, so a normal run needs none), and the Gemini SDK is imported
+when the first prompt actually has to go to the API. With --profile-startup, StartupProfiler
+reports how long each import and initialization step took.
+"""
+import argparse
+import time
+from contextlib import contextmanager
+
+# NLTK resource name -> path checked with nltk.data.find
+NLTK_RESOURCE_PATHS = {'vader_lexicon': 'sentiment/vader_lexicon.zip', 'punkt': 'tokenizers/punkt'}
+
+
+def parse_startup_args(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--profile-startup', action='store_true', help="Report import and init time per component")
+    parser.add_argument('--download-nltk', action='store_true',
+                        help="Download missing NLTK data (vader_lexicon, punkt); never done otherwise")
+    return parser.parse_args()
+
+
+class StartupProfiler:
+    """
+    Times startup steps: `with profiler.step('pandas'): import pandas`. `report()` prints them once
+    startup is done; steps timed after that (lazy initializations) are printed as they finish.
+    Does nothing visible unless `enabled`.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.steps = [] # (name, seconds)
+        self._started = time.perf_counter()
+        self._reported = False
+
+    @contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.steps.append((name, elapsed))
+            if self.enabled and self._reported:
+                print(f"[startup] {name}: {elapsed * 1000:.0f} ms (lazy, on first use)")
+
+    def report(self):
+        self._reported = True
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self._started
+        print("\n--- Startup profile ---")
+        for name, elapsed in sorted(self.steps, key=lambda step: -step[1]):
+            print(f"  {name:<40} {elapsed * 1000:8.0f} ms")
+        print(f"  {'total (incl. unprofiled)':<40} {total * 1000:8.0f} ms")
+        print("-----------------------")
+
+
+def ensure_nltk_resources(resources, download=False):
+    """
+    Checks that NLTK `resources` are installed locally; with `download`, fetches the missing ones.
+    Returns the names still missing. Without `download` this never touches the network.
+    """
+    import nltk
+    def missing_resources():
+        missing = []
+        for resource in resources:
+            try:
+                nltk.data.find(NLTK_RESOURCE_PATHS.get(resource, resource))
+            except LookupError:
+                missing.append(resource)
+        return missing
+
+    missing = missing_resources()
+    if missing and download:
+        print(f"Downloading NLTK resources: {', '.join(missing)}...")
+        for resource in missing:
+            try:
+                nltk.download(resource, quiet=True)
+            except Exception as e:
+                print(f"Could not download NLTK resource {resource}: {e}")
+        missing = missing_resources()
+    if missing:
+        print(f"NLTK resources not installed: {', '.join(missing)}"
+              f"{'' if download else ' (run with --download-nltk to fetch them)'}.")
+    return missing
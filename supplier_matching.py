@@ -0,0 +1,419 @@
+"""Routes "RFQ Submitted" interactions to candidate suppliers through an inverted index of capability terms.
+
+Every supplier's capability text (plus its Gemini main_categories, when the enriched outputs have them)
+is reduced to features: normalized word tokens and 'process:<type>' tags from the rfq_rules.py
+taxonomy, so "PCBA" in an RFQ meets "PCB Assembly (SMT, PTH)" in a capability text. Features are
+TF-IDF weighted and L2-normalized, and stored as posting lists (term -> supplier texts, weight) in
+flat numpy arrays. An RFQ only touches the posting lists of its own terms: its scores are the sparse
+dot products with the supplier texts sharing at least one term, accumulated for a chunk of RFQs at a
+time with a sort and a weighted bincount, never as an RFQs x suppliers matrix.
+
+Distinct texts are indexed and scored once (see enrichment_planner.TaskPlan) and fanned out to their
+suppliers / RFQs afterwards. Three pruning knobs trade exactness for speed, each off with None:
+posting lists keep only their CHAMPION_LIST_SIZE highest-weighted entries (a tiered index: terms
+shared by thousands of suppliers only contribute the suppliers they matter most to), an RFQ is scored
+on its MAX_QUERY_TERMS highest-weighted terms, and terms in more than MAX_DOCUMENT_SHARE of suppliers
+are dropped. RFQ vectors are normalized over all their features before pruning, so pruned scores
+never exceed the true cosine; with all three off (EXACT_SCORING, `--exact`) match_score is the exact
+TF-IDF cosine similarity.
+
+Suppliers with identical capability texts score identically. Among them, each RFQ takes its
+candidates in a rotation that starts at a stable hash of its interaction_id, so equally good suppliers
+share the RFQs instead of the first ones in table order getting all of them. The output's
+same_text_suppliers column counts the suppliers with the matched text.
+
+    python supplier_matching.py                      # writes rfq_supplier_matches_en (interaction_id, rank, supplier_user_id, match_score, same_text_suppliers)
+    python supplier_matching.py --benchmark 1000000,100000   # synthetic RFQs,suppliers timing run
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from enrichment_columns import child_tables
+from enrichment_planner import TaskPlan
+from rfq_rules import PROCESS_PATTERN, PROCESS_TAXONOMY
+from table_io import read_table, write_table, iter_table_chunks, table_exists, table_columns, table_path
+
+TOP_N_SUPPLIERS = 10 # Candidate suppliers kept per RFQ
+CHAMPION_LIST_SIZE = 256 # Entries kept per posting list (highest weights first); None = all
+MAX_QUERY_TERMS = 16 # An RFQ is scored on its highest-weighted terms only; None = all
+MAX_DOCUMENT_SHARE = 0.5 # Terms in more than this share of suppliers are left out of the index (applied from 100 suppliers on); None = none
+EXACT_SCORING = {'champion_list_size': None, 'max_query_terms': None, 'max_document_share': None} # SupplierIndex(..., **EXACT_SCORING)
+PROCESS_FEATURE_WEIGHT = 3.0 # A process tag counts this many times as much as a single word
+MAX_PAIRS_PER_CHUNK = 5_000_000 # (RFQ, supplier text) contributions accumulated at once; bounds memory
+MATCHING_PROCESSES = None # Worker processes for feature extraction and scoring (None = all CPUs; 1 = in-process)
+FEATURE_CHUNK_SIZE = 20_000 # Texts per feature-extraction task; fewer distinct texts than this stay in-process
+OUTPUT_STEM = 'rfq_supplier_matches_en'
+
+PROCESS_PREFIX = 'process:'
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[-/][a-z0-9]+)*')
+STOPWORDS = frozenset("""
+    a an and are as at be best by for from in into is it need needed of on or our per please provided quote quotes
+    request requesting rfq seeking service services sourcing the to we with within looking inquiry available attached
+    custom standard detailed specs material materials other via
+""".split())
+
+
+def text_features(text):
+    """Distinct features of a text: 'process:<type>' tags plus lowercased word tokens (no stopwords or bare numbers, plural 's' dropped)."""
+    lowered = text.lower()
+    features = {PROCESS_PREFIX + PROCESS_TAXONOMY[int(m.lastgroup[1:])][0] for m in PROCESS_PATTERN.finditer(lowered)}
+    for token in TOKEN_PATTERN.findall(lowered):
+        if len(token) < 2 or token in STOPWORDS or token.isdigit():
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        features.add(token)
+    return features
+
+
+def _features_chunk(texts):
+    return [text_features(text) for text in texts]
+
+
+def _parallel_map(function, chunks, processes):
+    """[function(chunk) for chunk in chunks], across a forked process pool when there are several chunks and processes (see vader_bulk.py)."""
+    if processes > 1 and len(chunks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks)), mp_context=multiprocessing.get_context('fork')) as pool:
+            return list(pool.map(function, chunks))
+    return [function(chunk) for chunk in chunks]
+
+
+def feature_triples(texts, vocabulary, grow=False, processes=1):
+    """
+    (doc, term, weight) arrays for `texts`, doc being the text's position. Unknown features get a new
+    term id if `grow`, and term -1 otherwise (an RFQ term no supplier has counts in the RFQ's norm only).
+    """
+    chunks = [texts[i:i + FEATURE_CHUNK_SIZE] for i in range(0, len(texts), FEATURE_CHUNK_SIZE)]
+    triples = [] # Arrays per chunk: far smaller than Python lists over millions of entries
+    for first, chunk_features in zip(range(0, len(texts), FEATURE_CHUNK_SIZE), _parallel_map(_features_chunk, chunks, processes)):
+        docs, terms, weights = [], [], []
+        for doc, features in enumerate(chunk_features, start=first):
+            for feature in features:
+                term = vocabulary.get(feature)
+                if term is None:
+                    if grow:
+                        term = vocabulary[feature] = len(vocabulary)
+                    else:
+                        term = -1
+                docs.append(doc)
+                terms.append(term)
+                weights.append(PROCESS_FEATURE_WEIGHT if feature.startswith(PROCESS_PREFIX) else 1.0)
+        triples.append((np.array(docs, dtype=np.int64), np.array(terms, dtype=np.int64), np.array(weights, dtype=np.float64)))
+    if not triples:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    return tuple(np.concatenate(parts) for parts in zip(*triples))
+
+
+def _normalize(docs, weights, num_docs):
+    """L2-normalizes each doc's weights."""
+    norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=num_docs))
+    return weights / np.where(norms > 0, norms, 1.0)[docs]
+
+
+def _expand(starts, lengths):
+    """Positions starts[i] .. starts[i] + lengths[i] - 1 for every i, concatenated (and the i each came from)."""
+    owners = np.repeat(np.arange(len(lengths)), lengths)
+    within = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + within, owners
+
+
+_scoring_index = None # The SupplierIndex being matched against, inherited by forked scoring workers
+
+
+def _score_chunk(chunk):
+    return _scoring_index.score_chunk(*chunk)
+
+
+def _order_by_group_then_weight(groups, weights):
+    """Order sorting integer `groups` ascending and, within a group, non-negative `weights` descending (one float argsort, no lexsort)."""
+    scale = 2 * weights.max() if len(weights) and weights.max() > 0 else 1.0
+    return np.argsort(groups - weights / scale)
+
+
+def _rank_in_group(groups):
+    """Position of each entry within its run of equal values, for a sorted `groups` array."""
+    if not len(groups):
+        return np.zeros(0, dtype=np.int64)
+    run_starts = np.flatnonzero(np.concatenate([[True], groups[1:] != groups[:-1]]))
+    return np.arange(len(groups)) - np.repeat(run_starts, np.diff(np.append(run_starts, len(groups))))
+
+
+class SupplierIndex:
+    """
+    Inverted index over the capability texts of suppliers. `match` scores RFQ texts against it and
+    returns the top suppliers per RFQ.
+    """
+
+    def __init__(self, supplier_ids, texts, champion_list_size=CHAMPION_LIST_SIZE, max_document_share=MAX_DOCUMENT_SHARE,
+                 max_query_terms=MAX_QUERY_TERMS, processes=MATCHING_PROCESSES):
+        self.processes = processes or os.cpu_count() or 1
+        self.max_query_terms = max_query_terms
+        texts = pd.Series(list(texts), dtype=object)
+        texts = texts[texts.notna() & (texts.astype(str).str.strip() != '')]
+        self.supplier_ids = np.asarray(supplier_ids, dtype=object)[texts.index.to_numpy()]
+        plan = TaskPlan('Supplier capability texts', texts.reset_index(drop=True))
+        self.num_docs = plan.num_unique
+        self.vocabulary = {}
+        docs, terms, weights = feature_triples(plan.unique_texts, self.vocabulary, grow=True, processes=self.processes)
+
+        # Document frequency counts suppliers, not distinct texts, so a text shared by many suppliers weighs as common
+        self.doc_sizes = np.bincount(plan.codes, minlength=self.num_docs)
+        num_suppliers = len(self.supplier_ids)
+        supplier_counts = np.bincount(terms, weights=self.doc_sizes[docs], minlength=len(self.vocabulary))
+        self.idf = np.log((1 + num_suppliers) / (1 + supplier_counts)) + 1
+        self.unseen_idf = np.log(1 + num_suppliers) + 1 # Of an RFQ term no supplier has
+        if max_document_share is not None and num_suppliers >= 100:
+            self.idf[supplier_counts > max_document_share * num_suppliers] = 0.0
+        weights = _normalize(docs, weights * self.idf[terms], self.num_docs)
+
+        # Posting lists: entries grouped by term, highest weight first, cut to the champion list size
+        order = _order_by_group_then_weight(terms, weights)
+        terms, docs, weights = terms[order], docs[order], weights[order]
+        keep = (weights > 0) & ((_rank_in_group(terms) < champion_list_size) if champion_list_size else True)
+        terms, self.posting_docs, self.posting_weights = terms[keep], docs[keep].astype(np.int32), weights[keep]
+        self.posting_starts = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))])
+        # Distinct text -> its suppliers (positions in supplier_ids)
+        self.doc_suppliers = np.argsort(plan.codes, kind='stable')
+        self.doc_supplier_starts = np.concatenate([[0], np.cumsum(self.doc_sizes)])
+        self.pairs_scored = 0
+
+    def __len__(self):
+        return len(self.supplier_ids)
+
+    def score_chunk(self, qdocs, qterms, qweights, first, keep_docs):
+        """Top `keep_docs` (query, doc, score) triples per query of a chunk of queries, sorted by query then score."""
+        lengths = self.posting_starts[qterms + 1] - self.posting_starts[qterms]
+        positions, owners = _expand(self.posting_starts[qterms], lengths)
+        keys = (qdocs[owners] - first) * self.num_docs + self.posting_docs[positions]
+        # Sum the contributions per (query, doc) key: one argsort, then a reduceat over the runs of equal keys
+        order = np.argsort(keys)
+        keys, contributions = keys[order], (qweights[owners] * self.posting_weights[positions])[order]
+        run_starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        keys, scores = keys[run_starts], np.add.reduceat(contributions, run_starts)
+        queries, docs = keys // self.num_docs, keys % self.num_docs
+        order = _order_by_group_then_weight(queries, scores) # Best docs first within each query
+        queries, docs, scores = queries[order], docs[order], scores[order]
+        keep = _rank_in_group(queries) < keep_docs
+        return queries[keep] + first, docs[keep], scores[keep]
+
+    def match(self, rfq_ids, texts, submitter_ids=None, top_n=TOP_N_SUPPLIERS):
+        """
+        DataFrame(interaction_id, rank, supplier_user_id, match_score, same_text_suppliers) with the `top_n`
+        best suppliers per RFQ text (cosine similarity of the TF-IDF vectors, 0-1; a lower bound of it when
+        pruning). A supplier is never matched to an RFQ whose `submitter_ids` entry is its own ID.
+        """
+        texts = pd.Series(list(texts), dtype=object)
+        plan = TaskPlan('RFQ texts', texts)
+        rows = plan.index.to_numpy()
+        qdocs, qterms, qweights = feature_triples(plan.unique_texts, self.vocabulary, processes=self.processes)
+        known = qterms >= 0
+        qweights = _normalize(qdocs, qweights * np.where(known, self.idf[qterms], self.unseen_idf), plan.num_unique)
+        keep = known & (qweights > 0) # Terms without postings only counted in the norm
+        qdocs, qterms, qweights = qdocs[keep], qterms[keep], qweights[keep]
+        if self.max_query_terms is not None: # Only the query's highest-weighted terms
+            order = _order_by_group_then_weight(qdocs, qweights)
+            qdocs, qterms, qweights = qdocs[order], qterms[order], qweights[order]
+            keep = _rank_in_group(qdocs) < self.max_query_terms
+            qdocs, qterms, qweights = qdocs[keep], qterms[keep], qweights[keep]
+
+        # Chunks of consecutive queries holding about MAX_PAIRS_PER_CHUNK posting entries (a single query may hold more)
+        query_pairs = np.bincount(qdocs, weights=self.posting_starts[qterms + 1] - self.posting_starts[qterms], minlength=plan.num_unique)
+        chunk_of_query = (np.cumsum(query_pairs) - query_pairs) // MAX_PAIRS_PER_CHUNK
+        first_queries = np.flatnonzero(np.concatenate([[True], chunk_of_query[1:] != chunk_of_query[:-1]])) if plan.num_unique else []
+        bounds = np.append(np.searchsorted(qdocs, first_queries), len(qdocs))
+        keep_docs = top_n + (submitter_ids is not None) # One spare in case the best match is the submitter itself
+        self.pairs_scored += int(query_pairs.sum())
+        global _scoring_index
+        _scoring_index = self
+        try:
+            found = _parallel_map(_score_chunk, [(qdocs[start:end], qterms[start:end], qweights[start:end], int(qdocs[start]), keep_docs)
+                                                 for start, end in zip(bounds[:-1], bounds[1:]) if start < end], self.processes)
+        finally:
+            _scoring_index = None
+        if not found:
+            return pd.DataFrame({'interaction_id': pd.Series(dtype=object), 'rank': pd.Series(dtype='int16'),
+                                 'supplier_user_id': pd.Series(dtype=object), 'match_score': pd.Series(dtype='float32'),
+                                 'same_text_suppliers': pd.Series(dtype='int32')})
+        queries, docs, scores = (np.concatenate(parts) for parts in zip(*found))
+
+        # Suppliers to take from each matched distinct text, best texts first, until keep_docs suppliers per query
+        sizes = self.doc_sizes[docs]
+        taken_before = np.cumsum(sizes) - sizes
+        taken_before -= taken_before[np.searchsorted(queries, queries)] # Restart the running count at each query
+        takes = np.clip(keep_docs - taken_before, 0, sizes)
+        keep = takes > 0
+        queries, docs, scores, takes = queries[keep], docs[keep], scores[keep], takes[keep]
+
+        # Fan out to the RFQ rows sharing each distinct text, then to the suppliers of each matched text: those
+        # sharing a text tie, so each row takes them in a rotation starting at a stable hash of its interaction_id
+        row_ids = np.asarray(rfq_ids, dtype=object)[rows]
+        rotations = (pd.util.hash_array(row_ids.astype(str).astype(object)) % np.uint64(1 << 31)).astype(np.int64)
+        query_starts = np.searchsorted(queries, np.arange(plan.num_unique))
+        query_lengths = np.searchsorted(queries, np.arange(plan.num_unique), side='right') - query_starts
+        entries, row_positions = _expand(query_starts[plan.codes], query_lengths[plan.codes])
+        within, owners = _expand(np.zeros(len(entries), dtype=np.int64), takes[entries])
+        entries, row_positions, matched_docs = entries[owners], row_positions[owners], docs[entries[owners]]
+        suppliers = self.doc_suppliers[self.doc_supplier_starts[matched_docs]
+                                       + (rotations[row_positions] + within) % self.doc_sizes[matched_docs]]
+        matched_ids = self.supplier_ids[suppliers]
+        if submitter_ids is not None:
+            keep = matched_ids != np.asarray(submitter_ids, dtype=object)[rows][row_positions]
+            row_positions, entries, matched_ids = row_positions[keep], entries[keep], matched_ids[keep]
+        ranks = _rank_in_group(row_positions)
+        keep = ranks < top_n
+        row_positions, entries, matched_ids, ranks = row_positions[keep], entries[keep], matched_ids[keep], ranks[keep]
+        return pd.DataFrame({'interaction_id': row_ids[row_positions], 'rank': (ranks + 1).astype('int16'),
+                             'supplier_user_id': matched_ids, 'match_score': scores[entries].round(4).astype('float32'),
+                             'same_text_suppliers': self.doc_sizes[docs[entries]].astype('int32')})
+
+
+def _json_field(values, field):
+    """A field of JSON result strings, list fields joined with '; ' ('' where missing); each distinct string is parsed once."""
+    codes, uniques = pd.factorize(values, sort=False)
+    joined = []
+    for json_str in uniques:
+        try:
+            data = json.loads(json_str)
+        except (TypeError, ValueError):
+            data = {}
+        value = data.get(field) if isinstance(data, dict) else None
+        joined.append('; '.join(str(item) for item in value) if isinstance(value, list) else value if isinstance(value, str) else '')
+    return pd.Series(np.array(joined + [''], dtype=object)[codes], index=values.index)
+
+
+def load_suppliers():
+    """
+    (user IDs, texts) of the suppliers with a capability text, from the enriched users table if there is
+    one (with the Gemini main_categories appended to each text), else from the generated one.
+    """
+    stem = 'user_details_enriched_en' if table_exists('user_details_enriched_en') else 'user_details_en'
+    json_column = 'gemini_supplier_capability_json'
+    has_json = json_column in table_columns(stem)
+    users = read_table(stem, columns=['user_id', 'user_type', 'supplier_capabilities_text'] + ([json_column] if has_json else []))
+    users = users[(users['user_type'] == 'Supplier') & users['supplier_capabilities_text'].notna()]
+    ids = users['user_id'].astype(str)
+    categories = None
+    if has_json:
+        categories = _json_field(users[json_column], 'main_categories')
+    elif stem == 'user_details_enriched_en':
+        (child_stem, value_column), = child_tables(json_column).items()
+        if table_exists(child_stem):
+            child = read_table(child_stem, columns=['user_id', 'position', value_column]).dropna()
+            child = child.sort_values(['user_id', 'position'], kind='stable')
+            categories = ids.map(child[value_column].astype(str).groupby(child['user_id'].astype(str)).agg('; '.join)).fillna('')
+    texts = users['supplier_capabilities_text'].astype(str)
+    if categories is not None:
+        texts = texts.where(categories == '', texts + '; ' + categories)
+    print(f"Loaded {len(users)} suppliers with capability texts from {stem}"
+          f"{' (with Gemini main categories)' if categories is not None else ''}.")
+    return ids.to_numpy(), texts.to_numpy(dtype=object)
+
+
+def load_rfqs(chunksize=1_000_000):
+    """
+    DataFrame(interaction_id, user_id, text) of the "RFQ Submitted" interactions, read in chunks from the
+    enriched interactions table if there is one (with the analysed service / product type appended), else
+    from the generated one.
+    """
+    stem = 'marketing_interactions_enriched_en' if table_exists('marketing_interactions_enriched_en') else 'marketing_interactions_en'
+    available = table_columns(stem)
+    extra = [column for column in ('service_product_type', 'gemini_rfq_analysis_json') if column in available]
+    kept = []
+    for chunk in iter_table_chunks(stem, columns=['interaction_id', 'user_id', 'event_name', 'interaction_details_text'] + extra,
+                                   chunksize=chunksize, dtype={'interaction_id': str, 'user_id': str}):
+        chunk = chunk[(chunk['event_name'] == 'RFQ Submitted') & chunk['interaction_details_text'].notna()]
+        texts = chunk['interaction_details_text'].astype(str)
+        if extra:
+            service_types = (chunk['service_product_type'].fillna('').astype(str) if extra[0] == 'service_product_type'
+                             else _json_field(chunk['gemini_rfq_analysis_json'], 'service_product_type'))
+            service_types = service_types.where(service_types != 'Not specified', '')
+            texts = texts.where(service_types == '', texts + '; ' + service_types)
+        kept.append(pd.DataFrame({'interaction_id': chunk['interaction_id'].astype(str).to_numpy(),
+                                  'user_id': chunk['user_id'].astype(str).to_numpy(), 'text': texts.to_numpy(dtype=object)}))
+    rfqs = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=['interaction_id', 'user_id', 'text'])
+    print(f"Loaded {len(rfqs)} RFQs from {stem}.")
+    return rfqs
+
+
+def synthetic_texts(count, phrases, rng, vocabulary_size=50_000, phrases_per_text=(2, 5), extra_words=3):
+    """`count` texts of a few sample phrases plus Zipf-distributed filler words, so most texts are distinct."""
+    num_phrases = rng.integers(phrases_per_text[0], phrases_per_text[1] + 1, count)
+    picked = rng.integers(0, len(phrases), int(num_phrases.sum()))
+    words = (rng.zipf(1.3, (count, extra_words)) % vocabulary_size).tolist()
+    bounds = np.concatenate([[0], np.cumsum(num_phrases)]).tolist()
+    return ['; '.join(phrases[i] for i in picked[bounds[n]:bounds[n + 1]]) + ' ' + ' '.join(f'term{w}' for w in words[n])
+            for n in range(count)]
+
+
+def run_benchmark(num_rfqs, num_suppliers, top_n, pruning, seed=42):
+    """
+    Times index build and matching on synthetic texts made from the generator's sample RFQs and capabilities;
+    `pruning` holds the SupplierIndex pruning arguments.
+    """
+    from generate_mock_data_en import rfq_request_samples_en, supplier_capabilities_samples_en
+    rng = np.random.default_rng(seed)
+    capability_phrases = [phrase.strip() for text in supplier_capabilities_samples_en for phrase in text.split(';')]
+    rfq_phrases = [phrase.strip() for text in rfq_request_samples_en for phrase in re.split(r'(?<=[.:])\s+', text)]
+    started = time.perf_counter()
+    supplier_texts = synthetic_texts(num_suppliers, capability_phrases, rng)
+    rfq_texts = synthetic_texts(num_rfqs, rfq_phrases, rng, phrases_per_text=(1, 3))
+    print(f"Generated {num_rfqs} RFQ and {num_suppliers} supplier texts in {time.perf_counter() - started:.1f}s.")
+
+    started = time.perf_counter()
+    index = SupplierIndex([f"SUP{i:08d}" for i in range(num_suppliers)], supplier_texts, **pruning)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    matches = index.match([f"RFQ{i:010d}" for i in range(num_rfqs)], rfq_texts, top_n=top_n)
+    match_seconds = time.perf_counter() - started
+    print(f"Index: {len(index.vocabulary)} terms, {len(index.posting_docs)} postings over {index.num_docs} distinct texts, "
+          f"built in {build_seconds:.1f}s.")
+    print(f"Matched {num_rfqs} RFQs in {match_seconds:.1f}s ({num_rfqs / match_seconds:,.0f} RFQs/s, "
+          f"{index.pairs_scored:,} posting entries scored): {len(matches)} match rows, "
+          f"mean top score {matches.loc[matches['rank'] == 1, 'match_score'].mean():.3f}.")
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--top-n', type=int, default=TOP_N_SUPPLIERS, help=f"Candidate suppliers per RFQ (default: {TOP_N_SUPPLIERS})")
+    parser.add_argument('--champion-list-size', type=int, default=CHAMPION_LIST_SIZE,
+                        help=f"Entries kept per posting list (default: {CHAMPION_LIST_SIZE}; 0 = all)")
+    parser.add_argument('--max-query-terms', type=int, default=MAX_QUERY_TERMS,
+                        help=f"Highest-weighted terms an RFQ is scored on (default: {MAX_QUERY_TERMS}; 0 = all)")
+    parser.add_argument('--exact', action='store_true', help="No pruning at all: match_score is the exact TF-IDF cosine similarity")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Output format of the matches table")
+    parser.add_argument('--benchmark', metavar='RFQS,SUPPLIERS', help="Time a run on synthetic texts instead of matching the tables")
+    args = parser.parse_args()
+    pruning = dict(EXACT_SCORING) if args.exact else {'champion_list_size': args.champion_list_size or None,
+                                                        'max_query_terms': args.max_query_terms or None}
+
+    if args.benchmark:
+        num_rfqs, num_suppliers = (int(size) for size in args.benchmark.split(','))
+        run_benchmark(num_rfqs, num_suppliers, args.top_n, pruning)
+        return
+
+    started = time.perf_counter()
+    supplier_ids, supplier_texts = load_suppliers()
+    index = SupplierIndex(supplier_ids, supplier_texts, **pruning)
+    print(f"Supplier index: {len(index.vocabulary)} terms, {len(index.posting_docs)} postings over {index.num_docs} distinct texts "
+          f"({time.perf_counter() - started:.1f}s).")
+    rfqs = load_rfqs()
+    started = time.perf_counter()
+    matches = index.match(rfqs['interaction_id'].to_numpy(), rfqs['text'], submitter_ids=rfqs['user_id'].to_numpy(), top_n=args.top_n)
+    print(f"Matched {len(rfqs)} RFQs to {len(index)} suppliers in {time.perf_counter() - started:.1f}s "
+          f"({index.pairs_scored:,} posting entries scored); {matches['interaction_id'].nunique()} RFQs have candidates.")
+    output_path = table_path(OUTPUT_STEM, args.format)
+    write_table(matches, output_path)
+    print(f"Saved: {output_path} ({len(matches)} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Helpers for reading and writing pipeline tables as CSV or Parquet.
+
+Tables can be referred to by stem ('user_details_en'): readers pick whichever of
+'user_details_en.parquet' / 'user_details_en.csv' exists (the newer one if both do),
+so every stage can switch output format without its consumers changing.
+"""
+import os
+
+import pandas as pd
+
+TABLE_FORMATS = ('csv', 'parquet')
+CSV_ENCODING = 'utf-8-sig' # What Power BI / Excel expect for the CSV outputs
+
+
+def table_path(stem, fmt):
+    """'user_details_en', 'parquet' -> 'user_details_en.parquet'."""
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format '{fmt}', expected one of {TABLE_FORMATS}")
+    return f'{stem}.{fmt}'
+
+
+def resolve_table_path(path):
+    """`path` itself if it exists or has an extension; otherwise the newest existing `<path>.parquet`/`<path>.csv`."""
+    if os.path.exists(path) or os.path.splitext(path)[1]:
+        return path
+    candidates = [table_path(path, fmt) for fmt in TABLE_FORMATS if os.path.exists(table_path(path, fmt))]
+    if not candidates:
+        raise FileNotFoundError(f"No table found for '{path}' (looked for {', '.join(table_path(path, f) for f in TABLE_FORMATS)})")
+    return max(candidates, key=os.path.getmtime)
+
+
+def table_exists(path):
+    try:
+        return os.path.exists(resolve_table_path(path))
+    except FileNotFoundError:
+        return False
+
+
+def detect_format(path):
+    """'parquet' or 'csv', from the extension, falling back to the Parquet magic bytes."""
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in TABLE_FORMATS:
+        return ext
+    with open(path, 'rb') as f:
+        return 'parquet' if f.read(4) == b'PAR1' else 'csv'
+
+
+def arrow_schema(df):
+    """Arrow schema for `df`; columns that are all-null (type 'null') are stored as strings."""
+    import pyarrow as pa
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+
+def _to_arrow(df, schema=None):
+    import pyarrow as pa
+    try:
+        return pa.Table.from_pandas(df, schema=schema or arrow_schema(df), preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (e.g. LLM fields that are sometimes numbers): store them as text
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].map(lambda v: v if v is None or isinstance(v, str) or pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, schema=schema or arrow_schema(df), preserve_index=False)
+
+
+def write_table(df, path, fmt=None):
+    """
+    Writes `df` to `path` as CSV (utf-8-sig) or Parquet (dictionary-encoded, snappy, typed columns).
+    The format comes from `fmt` or the file extension; returns the path written.
+    """
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower().lstrip('.')
+        fmt = ext if ext in TABLE_FORMATS else 'csv'
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(_to_arrow(df), path, use_dictionary=True, compression='snappy')
+    else:
+        df.to_csv(path, index=False, encoding=CSV_ENCODING)
+    return path
+
+
+def table_columns(path):
+    """Column names of a CSV or Parquet table, without reading its rows."""
+    path = resolve_table_path(path)
+    if detect_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0, encoding=CSV_ENCODING).columns)
+
+
+def read_table(path, columns=None, parse_dates=None):
+    """Reads a CSV or Parquet table (by path or stem, see resolve_table_path), optionally only `columns`."""
+    path = resolve_table_path(path)
+    if detect_format(path) == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns, encoding=CSV_ENCODING)
+    for column in parse_dates or []:
+        if column in df:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def iter_table_chunks(path, columns=None, chunksize=1_000_000, parse_dates=None, dtype=None):
+    """
+    Yields a CSV or Parquet table as DataFrames of at most `chunksize` rows. `dtype` ({column: type},
+    CSV only) pins column types that inference could otherwise change between chunks.
+    """
+    path = resolve_table_path(path)
+    if detect_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        chunks = pd.read_csv(path, usecols=columns, encoding=CSV_ENCODING, chunksize=chunksize, dtype=dtype)
+    for chunk in chunks:
+        for column in parse_dates or []:
+            if column in chunk:
+                chunk[column] = pd.to_datetime(chunk[column])
+        yield chunk
+
+
+def append_table(df, path):
+    """
+    Appends `df` to an existing table. CSV is appended in place; Parquet files can't be, so the
+    existing row groups are streamed into a new file followed by `df`, which then replaces the original.
+    """
+    if detect_format(path) != 'parquet':
+        with ChunkedTableWriter(path, append=True) as out:
+            out.write(df)
+        return
+    import pyarrow.parquet as pq
+    existing = pq.ParquetFile(path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with pq.ParquetWriter(tmp_path, existing.schema_arrow, use_dictionary=True, compression='snappy') as writer:
+        for batch in existing.iter_batches():
+            writer.write_batch(batch)
+        if not df.empty:
+            writer.write_table(_to_arrow(df, schema=existing.schema_arrow))
+    os.replace(tmp_path, path)
+
+
+class ChunkedTableWriter:
+    """
+    Appends DataFrame chunks to a CSV file and/or a Parquet file as they are produced,
+    so a table never has to be fully held in memory. The CSV header is written with the first chunk
+    (unless `header=False`, e.g. for shard part files). Use as a context manager, or call close().
+    """
+
+    def __init__(self, csv_path, parquet_path=None, encoding=CSV_ENCODING, append=False, header=True):
+        self.csv_path = csv_path
+        self.parquet_path = parquet_path
+        self.rows_written = 0
+        self._needs_header = header and not append
+        self._csv_file = open(csv_path, 'a' if append else 'w', encoding=encoding, newline='') if csv_path else None
+        self._parquet_writer = None
+        self._parquet_schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, df):
+        if df is None or df.empty:
+            return
+        if self._csv_file is not None:
+            df.to_csv(self._csv_file, index=False, header=self._needs_header)
+            self._needs_header = False
+        if self.parquet_path:
+            self._write_parquet(df)
+        self.rows_written += len(df)
+
+    def _write_parquet(self, df):
+        import pyarrow.parquet as pq
+        if self._parquet_writer is None:
+            # Column types come from the first chunk (all-null columns are stored as strings)
+            self._parquet_schema = arrow_schema(df)
+            self._parquet_writer = pq.ParquetWriter(self.parquet_path, self._parquet_schema,
+                                                    use_dictionary=True, compression='snappy')
+        self._parquet_writer.write_table(_to_arrow(df, schema=self._parquet_schema))
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
@@ -0,0 +1,107 @@
+"""Compact, typed in-memory schema for the generated tables.
+
+The generators build object-dtype columns (string IDs, event names, booleans, ...). `compact_table`
+converts a table to its compact form:
+  * low-cardinality text (event names, channels, devices, user types, sample texts) -> category;
+  * formatted IDs ('USER00001') -> integer surrogate keys ('user_key') alongside the ID, with the
+    ID itself stored as an Arrow-backed string when pyarrow is available;
+  * dates -> datetime64, money -> float32, flags -> bool, small counts -> nullable Int16.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow # noqa: F401 - only needed for the 'string[pyarrow]' dtype
+    ID_STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    ID_STRING_DTYPE = object
+
+# ID column -> (prefix, surrogate key column)
+CAMPAIGN_ID = ('CAMP', 'campaign_key')
+USER_ID = ('USER', 'user_key')
+
+TABLE_SCHEMAS = {
+    'campaign_details': {
+        'ids': {'campaign_id': CAMPAIGN_ID},
+        'categories': ['campaign_objective', 'campaign_type', 'channel_source_primary', 'target_audience_segment'],
+        'datetimes': ['campaign_start_date', 'campaign_end_date'],
+        'money': ['campaign_budget', 'campaign_spend'],
+    },
+    'user_details': {
+        'ids': {'user_id': USER_ID, 'first_touch_campaign_id': ('CAMP', 'first_touch_campaign_key')},
+        'categories': ['first_touch_channel', 'user_type', 'user_role', 'company_industry', 'company_size_category',
+                       'country', 'supplier_capabilities_text', 'user_feedback_text'],
+        'datetimes': ['registration_date', 'churn_date'],
+        'money': ['total_rfq_value_submitted_buyer', 'total_deals_won_value_supplier', 'ltv_actual_or_predicted'],
+        'booleans': ['is_paying_customer'],
+    },
+    'marketing_interactions': {
+        'ids': {'interaction_id': ('INT', 'interaction_key'), 'user_id': USER_ID, 'session_id': ('SESS', 'session_key'),
+                'campaign_id': CAMPAIGN_ID},
+        'categories': ['event_name', 'channel_source_interaction', 'device_category', 'page_url_interaction',
+                       'conversion_type', 'interaction_details_text'],
+        'datetimes': ['interaction_timestamp'],
+        'money': ['interaction_value'],
+        'booleans': ['is_conversion_event'],
+        'small_ints': ['time_on_page_seconds'],
+    },
+}
+
+
+def id_keys(ids, prefix):
+    """Numeric part of formatted IDs as a nullable Int32 array ('USER00042' -> 42, missing -> <NA>)."""
+    numbers = pd.to_numeric(pd.Series(ids, dtype=object).str.slice(len(prefix)), errors='coerce')
+    return numbers.astype('Int32').array
+
+
+def text_columns(table):
+    """Columns of `table` stored as text in CSV (IDs, categories, dates), e.g. to read CSV chunks with stable dtypes."""
+    schema = TABLE_SCHEMAS[table]
+    return list(schema.get('ids', {})) + schema.get('categories', []) + schema.get('datetimes', [])
+
+
+def compact_table(df, table, keys=None):
+    """
+    Returns `df` converted to the compact schema of `table` (a TABLE_SCHEMAS name).
+
+    Columns the table doesn't have are skipped. `keys` can pass already known surrogate keys
+    (e.g. {'interaction_key': numbers}) to skip parsing them back out of the formatted IDs.
+    Each key column is inserted right after its ID column.
+    """
+    schema = TABLE_SCHEMAS[table]
+    keys = keys or {}
+    out = df.copy(deep=False)
+    for column in schema.get('categories', []):
+        if column in out:
+            out[column] = out[column].astype('category')
+    for column in schema.get('datetimes', []):
+        if column in out:
+            out[column] = pd.to_datetime(out[column])
+    for column in schema.get('money', []):
+        if column in out:
+            out[column] = out[column].astype('float32')
+    for column in schema.get('booleans', []):
+        if column in out:
+            out[column] = out[column].astype(bool)
+    for column in schema.get('small_ints', []):
+        if column in out:
+            out[column] = out[column].astype('Int16')
+    for column, (prefix, key_column) in schema.get('ids', {}).items():
+        if column not in out or key_column in out:
+            continue
+        key = keys.get(key_column)
+        key = id_keys(out[column], prefix) if key is None else pd.array(np.asarray(key), dtype='Int32')
+        if not pd.isna(key).any():
+            key = key.astype('int32')
+        out.insert(out.columns.get_loc(column) + 1, key_column, key)
+        out[column] = out[column].astype(ID_STRING_DTYPE)
+    return out
+
+
+def memory_report(table, df_before, df_after):
+    """Prints (and returns) the in-memory size of a table before and after compact_table."""
+    before = df_before.memory_usage(deep=True).sum()
+    after = df_after.memory_usage(deep=True).sum()
+    saved = 1 - after / before if before else 0
+    print(f"  {table}: {before / 1024**2:.1f} MB -> {after / 1024**2:.1f} MB ({saved:.0%} saved)")
+    return before, after
@@ -0,0 +1,71 @@
+"""Typed enrichment columns: missing results stay missing, through a Parquet round trip back to carry-over."""
+import json
+
+import pandas as pd
+import pytest
+
+from enrichment_columns import flatten_results, load_typed_results
+from table_io import write_table
+
+CAPABILITIES = [
+    ('USER001', 'CNC shop', json.dumps({'capability_summary': 'Precision CNC.', 'main_categories': ['CNC Machining', 'Anodizing']})),
+    ('USER002', 'Failed text', '{}'),
+    ('USER003', 'Molder', json.dumps({'capability_summary': 'Injection molding.', 'main_categories': []})),
+    ('USER004', 'No text', None),
+]
+
+
+def capability_frame():
+    return pd.DataFrame(CAPABILITIES, columns=['user_id', 'supplier_capabilities_text', 'gemini_supplier_capability_json'])
+
+
+def test_missing_results_stay_na():
+    df = capability_frame()
+    children = flatten_results(df, 'gemini_supplier_capability_json')
+    assert str(df['capability_summary'].dtype) == 'string'
+    assert df['capability_summary'].tolist()[0] == 'Precision CNC.'
+    assert df['capability_summary'].isna().tolist() == [False, True, False, True]
+    assert 'nan' not in df['capability_summary'].dropna().tolist()
+    child = children['supplier_capability_categories_en']
+    assert child.values.tolist() == [['USER001', 1, 'CNC Machining'], ['USER001', 2, 'Anodizing']]
+
+
+def test_missing_sentiment_and_rfq_fields_stay_na():
+    users = pd.DataFrame({'user_id': ['U1', 'U2'], 'vader_sentiment_analysis_json': [
+        json.dumps({'sentiment_label': 'Positive', 'compound_score': 0.6, 'positive_score': 0.5, 'negative_score': 0.0, 'neutral_score': 0.5}),
+        '{}']})
+    flatten_results(users, 'vader_sentiment_analysis_json')
+    assert users['sentiment_label'].isna().tolist() == [False, True]
+    assert users['compound_score'].isna().tolist() == [False, True]
+
+    rfqs = pd.DataFrame({'interaction_id': ['I1', 'I2'], 'gemini_rfq_analysis_json': [
+        '{}', json.dumps({'service_product_type': 'Casting', 'implied_urgency': 'Low', 'key_specifications': ['bronze']})]})
+    flatten_results(rfqs, 'gemini_rfq_analysis_json')
+    assert rfqs[['service_product_type', 'implied_urgency']].isna().values.tolist() == [[True, True], [False, False]]
+
+
+@pytest.mark.parametrize('extension', ['parquet', 'csv'])
+def test_round_trip_drops_rows_without_a_result(tmp_path, monkeypatch, extension):
+    monkeypatch.chdir(tmp_path)
+    df = capability_frame()
+    children = flatten_results(df, 'gemini_supplier_capability_json')
+    write_table(df, f'user_details_enriched_en.{extension}')
+    for stem, child in children.items():
+        write_table(child, f'{stem}.{extension}')
+
+    loaded = load_typed_results(f'user_details_enriched_en.{extension}', 'user_id', 'supplier_capabilities_text',
+                                'gemini_supplier_capability_json')
+    results = dict(zip(loaded['user_id'], loaded['gemini_supplier_capability_json'].map(json.loads)))
+    assert results == {
+        'USER001': {'capability_summary': 'Precision CNC.', 'main_categories': ['CNC Machining', 'Anodizing']},
+        'USER003': {'capability_summary': 'Injection molding.', 'main_categories': []},
+    }
+
+
+def test_outputs_written_with_nan_strings_are_not_carried_over(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({'user_id': ['USER001', 'USER002'], 'supplier_capabilities_text': ['a', 'b'],
+                       'capability_summary': ['Precision CNC.', 'nan']})
+    write_table(df, 'old.parquet')
+    loaded = load_typed_results('old.parquet', 'user_id', 'supplier_capabilities_text', 'gemini_supplier_capability_json')
+    assert loaded['user_id'].tolist() == ['USER001']
@@ -0,0 +1,186 @@
+"""
+AsyncGeminiClient: timeouts on blocking models (the SDK timeout is passed on, hung threads keep their
+slots), the AIMD concurrency controller and the circuit breaker (on a fake clock), and both against
+the fake backend.
+"""
+import asyncio
+import threading
+import time
+
+from fake_gemini import FakeGenerativeModel
+from gemini_client import AIMDController, AsyncGeminiClient, CircuitBreaker
+
+
+class BlockingModel:
+    """generate_content only (no async variant); the first `hangs` calls block for `hang_seconds`."""
+
+    def __init__(self, hangs=0, hang_seconds=0.0):
+        self.hangs = hangs
+        self.hang_seconds = hang_seconds
+        self.lock = threading.Lock()
+        self.calls = self.running = self.max_running = 0
+        self.request_options = []
+
+    def generate_content(self, prompt, request_options=None):
+        with self.lock:
+            self.calls += 1
+            hang = self.calls <= self.hangs
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.request_options.append(request_options)
+        try:
+            time.sleep(self.hang_seconds if hang else 0.01)
+            return f'{{"echo": "{prompt}"}}'
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class PlainModel:
+    def generate_content(self, prompt):
+        return '{}'
+
+
+def client(model, **kwargs):
+    return AsyncGeminiClient(model, requests_per_minute=600_000, retry_delay_seconds=0.01, verbose=False, **kwargs)
+
+
+def test_request_timeout_is_passed_to_the_sdk():
+    model = BlockingModel()
+    client(model, timeout_seconds=7.5).run(['a', 'b'])
+    assert model.request_options == [{'timeout': 7.5}] * 2
+
+
+def test_models_without_request_options_still_work():
+    assert client(PlainModel()).run(['a']) == ['{}']
+
+
+def test_timed_out_threads_hold_their_slots_until_they_return():
+    model = BlockingModel(hangs=2, hang_seconds=0.6)
+    gemini = client(model, max_concurrency=2, timeout_seconds=0.1, adaptive_concurrency=False, max_retries=3)
+    texts = gemini.run([f'p{i}' for i in range(6)])
+    assert all(text is not None for text in texts) # Retried once the hung calls returned
+    assert gemini.calls == model.calls # No attempt timed out queued behind a hung thread, never reaching the model
+    assert model.max_running <= 2
+    assert gemini.abandoned_calls == 0 and gemini.controller.in_flight == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def run_calls(controller, clock, latencies, congested=False):
+    """One call after another, each taking its latency on the fake clock; the limits `release` returned."""
+    async def calls():
+        changes = []
+        for latency in latencies:
+            started = await controller.acquire()
+            clock.advance(latency)
+            changes.append(await controller.release(started, congested))
+        return changes
+    return asyncio.run(calls())
+
+
+def test_successes_raise_the_limit_additively():
+    clock = FakeClock()
+    controller = AIMDController(8, initial_concurrency=2, clock=clock)
+    changes = run_calls(controller, clock, [1.0] * 3)
+    assert changes == [None, None, 3] # +1/2, +1/2.5, +1/2.9: about one more slot per limit's worth of successes
+    run_calls(controller, clock, [1.0] * 100)
+    assert controller.limit == 8 and controller.increases == 6 and controller.decreases == 0
+
+
+def test_a_burst_of_congested_calls_cuts_the_limit_once():
+    clock = FakeClock()
+    controller = AIMDController(8, initial_concurrency=8, clock=clock)
+
+    async def burst():
+        starts = [await controller.acquire() for _ in range(8)]
+        assert controller.in_flight == 8
+        clock.advance(1.0)
+        return [await controller.release(started, congested=True) for started in starts]
+
+    assert asyncio.run(burst()) == [4] + [None] * 7
+    assert controller.decreases == 1 and controller.in_flight == 0
+    clock.advance(1.0)
+    assert run_calls(controller, clock, [1.0], congested=True) == [2] # Started after the cut: congestion again
+    assert run_calls(controller, clock, [1.0] * 20, congested=True)[-1] is None
+    assert controller.limit == controller.min_concurrency == 1
+
+
+def test_a_latency_spike_counts_as_congestion():
+    clock = FakeClock()
+    controller = AIMDController(8, initial_concurrency=8, clock=clock)
+    run_calls(controller, clock, [1.0] * 5)
+    assert controller.latency_ewma == 1.0 and controller.decreases == 0
+    assert run_calls(controller, clock, [2.5]) == [None] # Below 3 x the average: a success
+    average = controller.latency_ewma
+    assert run_calls(controller, clock, [4.0 * average]) == [4]
+    assert controller.decreases == 1 and controller.latency_ewma == average # Spikes don't feed the average
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60.0, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success() # Resets the run of failures
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.trips == 1 and not breaker.allow()
+    clock.advance(59.0)
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_probe_through_and_closes_on_success():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60.0, clock=clock)
+    breaker.record_failure()
+    clock.advance(60.0)
+    assert breaker.allow() # The probe
+    assert breaker.state == 'half-open' and not breaker.allow() # Everyone else waits for it
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow() and breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_failed_probe_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=10, reset_seconds=60.0, clock=clock)
+    breaker.record_failure(fatal=True) # Opens at once
+    assert breaker.state == 'open'
+    clock.advance(60.0)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.trips == 2 and not breaker.allow()
+    clock.advance(30.0)
+    assert not breaker.allow() # The reset period starts again from the failed probe
+    clock.advance(30.0)
+    assert breaker.allow()
+
+
+def test_healthy_fake_backend_grows_to_max_concurrency():
+    model = FakeGenerativeModel(latency='fixed', latency_seconds=0.02, seed=1)
+    gemini = client(model, max_concurrency=8)
+    texts = gemini.run([f'Analyze RFQ: "CNC part {i}"' for i in range(150)])
+    assert all(text is not None for text in texts)
+    assert gemini.controller.limit == 8 and gemini.breaker.state == 'closed'
+
+
+def test_rate_limited_fake_backend_cuts_concurrency_and_opens_the_breaker():
+    model = FakeGenerativeModel(latency='fixed', latency_seconds=0.001, rate_limit_rate=1.0, seed=1)
+    gemini = client(model, max_concurrency=8, max_retries=3, breaker_failures=5)
+    texts = gemini.run([f'p{i}' for i in range(40)])
+    assert texts == [None] * 40
+    assert gemini.breaker.state == 'open' and gemini.breaker.trips == 1
+    assert gemini.rejected > 0 and model.calls == gemini.calls < 40 * 3 # Refused prompts never reach the model
+    assert gemini.controller.decreases >= 1 and gemini.controller.limit < 4
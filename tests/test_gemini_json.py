@@ -0,0 +1,60 @@
+"""Malformed Gemini responses seen from the models, and the records gemini_json must get from them."""
+import json
+
+import pytest
+
+from gemini_json import extract_json, extract_json_objects, parse_response, to_json
+
+# (task name, raw response, expected records as JSON-compatible data; None = nothing usable)
+CORPUS = [
+    ('RFQ Analysis', '```json\n{"service_product_type": "CNC Machining", "implied_urgency": "High", "key_specifications": ["6061 aluminum", "+/- 0.01 mm"]}\n```',
+     {"service_product_type": "CNC Machining", "implied_urgency": "High", "key_specifications": ["6061 aluminum", "+/- 0.01 mm"]}),
+    ('RFQ Analysis', 'Here is the analysis:\n{"service_product_type": "Injection Molding", "implied_urgency": "medium", "key_specifications": "ABS"}\nLet me know if you need more.',
+     {"service_product_type": "Injection Molding", "implied_urgency": "Medium", "key_specifications": ["ABS"]}),
+    ('RFQ Analysis', '{"service_product_type": "Sheet Metal", "implied_urgency": "ASAP!!", "key_specifications": ["M6 {threaded} holes", "bend \\"90\\""],}',
+     {"service_product_type": "Sheet Metal", "implied_urgency": "Not specified", "key_specifications": ["M6 {threaded} holes", 'bend "90"']}),
+    ('RFQ Analysis', '```\n[{"service_product_type": "Casting", "implied_urgency": "Low", "key_specifications": []}]\n```',
+     {"service_product_type": "Casting", "implied_urgency": "Low", "key_specifications": []}),
+    ('RFQ Analysis', '{"service_product_type": "Welding", "implied_urgency": "High", "key_specifications": ["stainless", "TIG', None),
+    ('RFQ Analysis', "I'm sorry, but I can't determine the product type from this RFQ.", None),
+    ('RFQ Analysis', '', None),
+    ('Supplier Capabilities (USER00042)', 'json\n{"capability_summary": "Precision CNC shop.", "main_categories": ["CNC Machining", null, "Anodizing"], "notes": {"certs": ["ISO 9001"]}}',
+     {"capability_summary": "Precision CNC shop.", "main_categories": ["CNC Machining", "Anodizing"]}),
+    ('Supplier Capabilities', '[Note] Summary follows. {"capability_summary": "Electronics assembly.", "main_categories": ["PCB Assembly"]}',
+     {"capability_summary": "Electronics assembly.", "main_categories": ["PCB Assembly"]}),
+    ('Supplier Capabilities', '{"main_categories": ["Forging"]}', None),
+    ('Strategic Insights', '```json\n[\n  {"insight_id": "INS001", "insight_title": "RFQ demand for CNC", "insight_explanation": "CNC leads RFQs {42%}."},\n'
+     '  {"insight_id": "INS002", "insight_title": "Negative feedback on speed", "insight_explanation": "Users cite slow quotes."}\n]\n```\nThese insights suggest...',
+     [{"insight_id": "INS001", "insight_title": "RFQ demand for CNC", "insight_explanation": "CNC leads RFQs {42%}."},
+      {"insight_id": "INS002", "insight_title": "Negative feedback on speed", "insight_explanation": "Users cite slow quotes."}]),
+    ('Strategic Insights', '{"insight_id": "INS001", "insight_title": "Single insight", "insight_explanation": "Only one."}',
+     [{"insight_id": "INS001", "insight_title": "Single insight", "insight_explanation": "Only one."}]),
+    ('Strategic Insights', '[{"insight_id": "INS001", "insight_title": "Complete", "insight_explanation": "Kept."}, {"insight_id": "INS002", "insight_title": "Cut o',
+     [{"insight_id": "INS001", "insight_title": "Complete", "insight_explanation": "Kept."}]),
+    ('Actionable Tasks', '[{"task_id": "TASK001", "task_description": "Call top suppliers", "task_importance": "5"}, '
+     '{"task_id": "TASK002", "task_description": "Fix onboarding", "task_importance": 9}, {"task_id": "TASK003", "task_importance": 2}]',
+     [{"task_id": "TASK001", "task_description": "Call top suppliers", "task_importance": 5},
+      {"task_id": "TASK002", "task_description": "Fix onboarding", "task_importance": 5}]),
+    ('Actionable Tasks', 'Tasks:\n```json\n{"tasks": [1, 2]}\n```', None),
+]
+
+
+@pytest.mark.parametrize('task_name, text, expected', CORPUS)
+def test_parse_response(task_name, text, expected):
+    got = parse_response(text, task_name)
+    assert (None if got is None else json.loads(to_json(got))) == expected
+
+
+def test_extract_json_stops_at_the_end_of_the_first_value():
+    assert extract_json('{"a": 1} trailing {"b": 2}') == {'a': 1}
+    assert extract_json('[Note] see {"a": [1, 2]}') == {'a': [1, 2]}
+
+
+def test_extract_json_repairs_trailing_commas_and_truncated_arrays():
+    assert extract_json('```json\n{"a": [1, 2,],}\n```') == {'a': [1, 2]}
+    assert extract_json('[{"a": 1}, {"a": 2}, {"a": 3') == [{'a': 1}, {'a': 2}]
+    assert extract_json('{"a": "unterminated') is None
+
+
+def test_extract_json_objects_flattens_arrays():
+    assert extract_json_objects('{"a": 1}\n[{"b": 2}, 3, {"c": 4}]') == [{'a': 1}, {'b': 2}, {'c': 4}]
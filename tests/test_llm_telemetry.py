@@ -0,0 +1,40 @@
+"""LLMTelemetry keeps running aggregates, not the records, once they are written."""
+import pandas as pd
+
+from llm_telemetry import LLMTelemetry, Reservoir, task_type
+
+
+def test_task_type():
+    assert task_type('RFQ Analysis (batch of 20)') == ('RFQ Analysis', 20)
+    assert task_type('Supplier Capabilities (USER01956)') == ('Supplier Capabilities', 1)
+    assert task_type('Strategic Insights') == ('Strategic Insights', 1)
+
+
+def test_reservoir_is_bounded():
+    reservoir = Reservoir(size=100)
+    for value in range(10_000):
+        reservoir.add(value)
+    assert reservoir.seen == 10_000 and len(reservoir.values) == 100
+    assert 3_000 < reservoir.percentile(50) < 7_000
+
+
+def test_summary_after_flushes(tmp_path):
+    path = str(tmp_path / 'calls.csv')
+    telemetry = LLMTelemetry(path, price_per_million_tokens=(1.0, 2.0), flush_every=10)
+    for i in range(95):
+        telemetry.record('RFQ Analysis (batch of 5)', 'retry' if i % 5 == 0 else 'success', 1, 0.0, i / 100,
+                         'p' * 400, 'r' * 200, prompt_tokens=100, output_tokens=50)
+    telemetry.record('RFQ Analysis (batch of 5)', 'memo')
+    telemetry.record('Strategic Insights', 'cache_hit', prompt='p', response='r')
+    assert len(telemetry._pending) < 10
+    telemetry.close()
+    assert len(pd.read_csv(path)) == 97
+
+    summary = telemetry.summary().set_index('task_type')
+    rfq = summary.loc['RFQ Analysis']
+    assert (rfq['calls'], rfq['ok'], rfq['errors'], rfq['reused'], rfq['items']) == (95, 76, 19, 1, 380)
+    assert (rfq['prompt_tokens'], rfq['output_tokens']) == (7600, 3800)
+    assert rfq['est_cost_usd'] == round((7600 * 1.0 + 3800 * 2.0) / 1e6, 4)
+    assert rfq['p50_s'] == 0.47 and rfq['p99_s'] == 0.931
+    assert summary.loc['Strategic Insights', 'cache_hits'] == 1
+    assert summary.loc['All', 'calls'] == 95
@@ -0,0 +1,77 @@
+"""Urgency cues, process taxonomy and confidence of the local RFQ extractor."""
+import pytest
+
+from rfq_rules import AMBIGUOUS_MAX_CONFIDENCE, extract_rfq
+
+THRESHOLD = 0.7 # enrich_data_nlp_en.RFQ_RULES_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('text, urgency', [
+    ("Urgent: CNC machined aluminum brackets, 200 pcs.", 'High'),
+    ("Need 500 units of 6061 aluminum housings ASAP, CNC machining.", 'High'),
+    ("Sheet metal enclosures required within 48 hours, 20 units, mild steel.", 'High'),
+    ("Rush order for injection molded ABS caps, Qty: 5,000.", 'High'),
+    ("Looking for CNC machining of 100 brass fittings, delivery by EOM.", 'Medium'),
+    ("Injection molding of nylon clips, 10,000 pcs, needed within 3 weeks.", 'Medium'),
+    ("Budgetary quote for 3D printing 50 nylon parts.", 'Low'),
+    ("No rush: casting of 300 bronze bushings for a future project.", 'Low'),
+    ("Welding of 40 stainless steel frames per drawing DWG-1042.", 'Not specified'),
+])
+def test_urgency_cues(text, urgency):
+    assert extract_rfq(text).implied_urgency == urgency
+
+
+@pytest.mark.parametrize('text', [
+    "Seeking suppliers for ongoing fabrication of stainless steel (304L) enclosures, approx. 50 units/month.",
+    "Ongoing quality problems with our current CNC machining supplier; need 500 aluminum housings.",
+    "Recurring stamping order, 20,000 steel brackets per quarter.",
+])
+def test_ambiguous_urgency_cues_escalate(text):
+    extraction = extract_rfq(text)
+    assert extraction.implied_urgency != 'Low'
+    assert extraction.confidence <= AMBIGUOUS_MAX_CONFIDENCE < THRESHOLD
+
+
+def test_conflicting_cues_lower_confidence():
+    clear = extract_rfq("CNC machined aluminum housing, 500 units, ASAP.")
+    conflicting = extract_rfq("CNC machined aluminum housing, 500 units, ASAP or a budgetary estimate is fine.")
+    assert clear.confidence >= THRESHOLD > conflicting.confidence
+    assert conflicting.implied_urgency == 'High' # First level in cue order, a guess the caller escalates
+
+
+@pytest.mark.parametrize('text, process', [
+    ("PCBA with SMT components, 200 boards.", 'PCB Assembly'),
+    ("SLA 3D printing of 20 prototypes.", '3D Printing'),
+    ("Overmolding of TPE grips, 1,000 pcs.", 'Injection Molding'),
+    ("Custom enclosures, 50 units.", 'Metal Fabrication'),
+    ("Please see the attached package and send us your best offer.", 'Not specified'),
+])
+def test_process_taxonomy(text, process):
+    assert extract_rfq(text).service_product_type == process
+
+
+@pytest.mark.parametrize('text, material', [
+    ("Need 304L tubing, 200 pcs, by EOM", '304L'),
+    ("Turned fittings in 316 stainless, qty 40", '316 stainless'),
+    ("Fittings machined from 316, qty 40", '316'),
+    ("CNC machining of 6061-T6 brackets, 50 units.", '6061-T6'),
+    ("4140 bar stock, 20 pcs, hardened", '4140'),
+    ("Valve bodies in 17-4 PH, 40 pcs", '17-4 PH'),
+    ("6061-T6 aluminum plates, 10 units", '6061-T6 aluminum'),
+])
+def test_bare_alloy_grades_are_materials(text, material):
+    assert material in extract_rfq(text).key_specifications
+
+
+@pytest.mark.parametrize('text, quantity', [
+    ("Need 316 pcs of brass fittings", '316 pcs'),
+    ("Brass fittings, 1,316 pcs", '1,316 pcs'),
+])
+def test_counts_are_not_alloy_grades(text, quantity):
+    specs = extract_rfq(text).key_specifications
+    assert quantity in specs and '316' not in specs
+
+
+def test_empty_text():
+    assert extract_rfq(None).confidence == 0.0
+    assert extract_rfq('  ').service_product_type == 'Not specified'
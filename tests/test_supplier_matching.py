@@ -0,0 +1,80 @@
+"""SupplierIndex against a brute-force TF-IDF cosine over a small corpus."""
+import math
+
+import pytest
+
+from supplier_matching import EXACT_SCORING, PROCESS_FEATURE_WEIGHT, PROCESS_PREFIX, SupplierIndex, text_features
+
+SUPPLIERS = [
+    ('SUP1', 'CNC machining of aluminum housings; anodizing; ISO 9001'),
+    ('SUP2', 'Injection molding of ABS and nylon parts; insert molding'),
+    ('SUP3', 'CNC machining of aluminum housings; anodizing; ISO 9001'), # Same text as SUP1
+    ('SUP4', 'Sheet metal fabrication, laser cutting and powder coating of steel enclosures'),
+    ('SUP5', 'PCB assembly (SMT, through-hole) and box build'),
+    ('SUP6', 'CNC turning and milling of stainless steel shafts'),
+    ('SUP7', 'CNC machining of aluminum housings; anodizing; ISO 9001'), # Same text as SUP1
+    ('SUP8', '3D printing (SLA, SLS) for rapid prototyping'),
+]
+RFQS = [
+    ('RFQ1', 'SUP2', 'Need 500 CNC machined aluminum housings, anodized black, ASAP.'),
+    ('RFQ2', 'SUP1', 'Injection molded ABS enclosures, 10,000 units, budgetary quote.'),
+    ('RFQ3', 'SUP5', 'Laser cut stainless steel brackets with powder coating; exotic-term-nobody-has.'),
+    ('RFQ4', 'SUP8', 'PCBA with SMT components, 200 boards.'),
+    ('RFQ5', 'SUP4', 'Rapid prototyping of a nylon part by SLS 3D printing.'),
+    ('RFQ6', 'SUP1', 'Turning of steel shafts and CNC milling.'),
+]
+
+
+def brute_force_scores(supplier_texts, rfq_text):
+    """Cosine similarity of the RFQ's TF-IDF vector with every supplier's, from the definitions."""
+    features = [text_features(text) for text in supplier_texts]
+    num_suppliers = len(features)
+
+    def vector(text_features_):
+        weights = {}
+        for feature in text_features_:
+            count = sum(feature in supplier for supplier in features)
+            idf = math.log((1 + num_suppliers) / (1 + count)) + 1
+            weights[feature] = (PROCESS_FEATURE_WEIGHT if feature.startswith(PROCESS_PREFIX) else 1.0) * idf
+        norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+        return {feature: weight / norm for feature, weight in weights.items()}
+
+    query = vector(text_features(rfq_text))
+    return [sum(weight * vector(supplier).get(feature, 0.0) for feature, weight in query.items()) for supplier in features]
+
+
+@pytest.fixture(scope='module')
+def exact_matches():
+    index = SupplierIndex([sid for sid, _ in SUPPLIERS], [text for _, text in SUPPLIERS], processes=1, **EXACT_SCORING)
+    return index.match([rid for rid, _, _ in RFQS], [text for _, _, text in RFQS],
+                       submitter_ids=[sid for _, sid, _ in RFQS], top_n=len(SUPPLIERS))
+
+
+@pytest.mark.parametrize('rfq_id, submitter_id, text', RFQS)
+def test_exact_scores_match_brute_force_cosine(exact_matches, rfq_id, submitter_id, text):
+    expected = {sid: score for (sid, _), score in zip(SUPPLIERS, brute_force_scores([t for _, t in SUPPLIERS], text))
+                if score > 0 and sid != submitter_id}
+    got = exact_matches[exact_matches['interaction_id'] == rfq_id]
+    assert dict(zip(got['supplier_user_id'], got['match_score'])) == pytest.approx(expected, abs=1e-4)
+    assert list(got['rank']) == list(range(1, len(got) + 1))
+    assert list(got['match_score']) == sorted(got['match_score'], reverse=True)
+
+
+def test_pruned_scores_never_exceed_exact(exact_matches):
+    index = SupplierIndex([sid for sid, _ in SUPPLIERS], [text for _, text in SUPPLIERS], processes=1,
+                          champion_list_size=1, max_query_terms=2)
+    pruned = index.match([rid for rid, _, _ in RFQS], [text for _, _, text in RFQS], top_n=len(SUPPLIERS))
+    exact = exact_matches.set_index(['interaction_id', 'supplier_user_id'])['match_score']
+    for row in pruned.itertuples():
+        if (row.interaction_id, row.supplier_user_id) in exact.index:
+            assert row.match_score <= exact[(row.interaction_id, row.supplier_user_id)] + 1e-4
+
+
+def test_suppliers_with_identical_texts_are_rotated_across_rfqs():
+    index = SupplierIndex([sid for sid, _ in SUPPLIERS], [text for _, text in SUPPLIERS], processes=1, **EXACT_SCORING)
+    rfq_ids = [f'RFQ{i:03d}' for i in range(60)]
+    matches = index.match(rfq_ids, ['CNC machined aluminum housings'] * len(rfq_ids), top_n=1)
+    assert set(matches['same_text_suppliers']) == {3}
+    assert set(matches['supplier_user_id']) == {'SUP1', 'SUP3', 'SUP7'}
+    again = index.match(rfq_ids, ['CNC machined aluminum housings'] * len(rfq_ids), top_n=1)
+    assert list(again['supplier_user_id']) == list(matches['supplier_user_id']) # Stable across runs
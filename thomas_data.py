@@ -1,10 +1,12 @@
 import pandas as pd
-import numpy as np
 from faker import Faker
 import random
 from datetime import datetime, timedelta
+from mock_data_engine import CampaignIndex
+from faker_pools import FakerPools
 
 fake = Faker()
+faker_pools = FakerPools('en_US') # Valores pré-amostrados (company, bs, uri_path, ...) com cache em disco
 # fake_BR = Faker('pt_BR')
 
 # --- Configurações ---
@@ -96,11 +98,12 @@ for i in range(NUM_CAMPAIGNS):
         'target_audience_segment': random.choice(['Small CNC Shops US', 'Aerospace Buyers', 'Engineers - Material Selection', 'General Manufacturing LATAM', 'Industrial Procurement Managers'])
     })
 df_campaigns = pd.DataFrame(campaign_data)
-active_campaign_ids = df_campaigns[
-    (df_campaigns['campaign_end_date'].isnull()) |
-    (pd.to_datetime(df_campaigns['campaign_end_date']) >= datetime.now())
-]['campaign_id'].tolist()
-all_campaign_ids = df_campaigns['campaign_id'].tolist()
+utm_sources_map = {'Google Ads': 'google', 'LinkedIn Ads': 'linkedin', 'Facebook Ads': 'facebook', 'Email': 'newsletter', 'Referral Partner Site': 'partner_site'} 
+utm_mediums_map = {'Google Ads': 'cpc', 'LinkedIn Ads': 'social_paid', 'Facebook Ads': 'social_paid', 'SEO': 'organic', 'Email': 'email', 'Referral Partner Site':'referral', 'Webinar Platform':'webinar'}
+# Índice id -> campanha (lookup O(1), sem varrer o DataFrame por linha), com utm_source/utm_medium do canal principal
+campaign_index = CampaignIndex(df_campaigns, utm_sources_map, utm_mediums_map)
+active_campaign_ids = campaign_index.active_ids
+all_campaign_ids = campaign_index.all_ids
 
 
 # --- Gerar Tabela user_details ---
@@ -126,12 +129,12 @@ for i in range(NUM_USERS):
 
     if user_type == 'Buyer':
         role = random.choice(user_roles_buyer)
-        company_name_val = fake.company()
+        company_name_val = faker_pools.company()
         company_industry_val = random.choice(company_industries)
         company_size_val = random.choice(company_sizes)
     elif user_type == 'Supplier':
         role = random.choice(user_roles_supplier)
-        company_name_val = fake.company() + " " + random.choice(["Solutions", "Manufacturing", "Industries", "LLC", "Corp"])
+        company_name_val = faker_pools.company() + " " + random.choice(["Solutions", "Manufacturing", "Industries", "LLC", "Corp"])
         company_industry_val = random.choice(company_industries)
         company_size_val = random.choice(company_sizes)
         supplier_capability_val = random.choice(supplier_capabilities_samples) if random.random() < 0.8 else None
@@ -153,9 +156,9 @@ for i in range(NUM_USERS):
     first_touch_camp_id = random.choice(all_campaign_ids) if random.random() < 0.8 else None
     first_touch_channel_val = None
     if first_touch_camp_id:
-        campaign_info = df_campaigns[df_campaigns['campaign_id'] == first_touch_camp_id]
-        if not campaign_info.empty:
-            first_touch_channel_val = campaign_info['channel_source_primary'].iloc[0]
+        campaign_info = campaign_index.get(first_touch_camp_id)
+        if campaign_info:
+            first_touch_channel_val = campaign_info.channel_source_primary
     if not first_touch_channel_val:
          first_touch_channel_val = random.choice(list(campaign_types_channels.values()) + ['Organic Search', 'Direct'])
 
@@ -201,7 +204,7 @@ user_ids_list = df_users['user_id'].tolist()
 # ## DEFINIÇÃO DA FUNÇÃO create_interaction_entry MOVIDA PARA CIMA ########
 # ############################################################################
 # Função auxiliar para criar entrada de interação (para reduzir repetição)
-def create_interaction_entry(ic_counter, u_id, s_id, ts, evt_name, u_row, camps_df, act_camp_ids, all_camp_ids, cc_map, int_chans, utm_s_map, utm_m_map, dev_cats, fk, event_names_conversion_buyer_list, event_names_conversion_supplier_list, event_names_ads_email_list):
+def create_interaction_entry(ic_counter, u_id, s_id, ts, evt_name, u_row, camp_index, act_camp_ids, all_camp_ids, cc_map, int_chans, dev_cats, fk, event_names_conversion_buyer_list, event_names_conversion_supplier_list, event_names_ads_email_list):
     interaction_channel = random.choice(int_chans)
     campaign_for_interaction = None
     if interaction_channel in ['Google Ads', 'LinkedIn Ads', 'Email', 'Referral Partner Site'] and len(act_camp_ids) > 0 and random.random() < 0.7:
@@ -230,12 +233,11 @@ def create_interaction_entry(ic_counter, u_id, s_id, ts, evt_name, u_row, camps_
     utm_medium_val = None
 
     if campaign_for_interaction:
-        camp_info = camps_df[camps_df['campaign_id'] == campaign_for_interaction]
-        if not camp_info.empty:
-            utm_campaign_val = camp_info['campaign_name'].iloc[0].replace(" ","_").lower()
-            primary_channel = camp_info['channel_source_primary'].iloc[0]
-            utm_source_val = utm_s_map.get(primary_channel)
-            utm_medium_val = utm_m_map.get(primary_channel)
+        camp_info = camp_index.get(campaign_for_interaction)
+        if camp_info:
+            utm_campaign_val = camp_info.utm_campaign
+            utm_source_val = camp_info.utm_source
+            utm_medium_val = camp_info.utm_medium
 
     if not utm_source_val: 
         if interaction_channel == 'Organic Search':
@@ -308,8 +310,6 @@ all_event_names = (event_names_discovery + event_names_consideration +
 
 interaction_channels = list(campaign_types_channels.values()) + ['Direct', 'Referral', 'Organic Search', 'Organic Social']
 device_categories = ['Desktop', 'Mobile', 'Tablet']
-utm_sources_map = {'Google Ads': 'google', 'LinkedIn Ads': 'linkedin', 'Facebook Ads': 'facebook', 'Email': 'newsletter', 'Referral Partner Site': 'partner_site'} 
-utm_mediums_map = {'Google Ads': 'cpc', 'LinkedIn Ads': 'social_paid', 'Facebook Ads': 'social_paid', 'SEO': 'organic', 'Email': 'email', 'Referral Partner Site':'referral', 'Webinar Platform':'webinar'}
 
 content_categories_map = {
     'Content View (Blog)': 'Blog Post',
@@ -401,8 +401,8 @@ for user_idx, user_row in df_users.iterrows():
             if chosen_event_name == 'Supplier Signup Complete' and not supplier_signup_started_for_user and event_num_in_session < num_events_in_session -1 :
                  entry_start = create_interaction_entry( 
                     interaction_counter, user_id, session_id, current_timestamp, 'Supplier Signup Start',
-                    user_row, df_campaigns, active_campaign_ids, all_campaign_ids, 
-                    content_categories_map, interaction_channels, utm_sources_map, utm_mediums_map, device_categories, fake,
+                    user_row, campaign_index, active_campaign_ids, all_campaign_ids, 
+                    content_categories_map, interaction_channels, device_categories, faker_pools,
                     event_names_conversion_buyer, event_names_conversion_supplier, event_names_ads_email # Passando as listas
                  )
                  interaction_data.append(entry_start)
@@ -412,8 +412,8 @@ for user_idx, user_row in df_users.iterrows():
 
             entry = create_interaction_entry(
                 interaction_counter, user_id, session_id, current_timestamp, chosen_event_name,
-                user_row, df_campaigns, active_campaign_ids, all_campaign_ids,
-                content_categories_map, interaction_channels, utm_sources_map, utm_mediums_map, device_categories, fake,
+                user_row, campaign_index, active_campaign_ids, all_campaign_ids,
+                content_categories_map, interaction_channels, device_categories, faker_pools,
                 event_names_conversion_buyer, event_names_conversion_supplier, event_names_ads_email # Passando as listas
             )
             interaction_data.append(entry)
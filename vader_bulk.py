@@ -0,0 +1,122 @@
+"""Bulk VADER sentiment scoring.
+
+Scoring feedback one row at a time (and writing each result back with `df.at`) is slow for
+millions of rows. VaderBulkScorer scores a whole column at once: texts are deduplicated (exact
+text, since VADER is case and punctuation sensitive), looked up in a bounded LRU memo, and the
+remaining distinct texts are scored in chunks across a process pool. Results are fanned back out to
+every row in one assignment. Labels use the same +/-0.05 compound thresholds as before.
+"""
+import json
+import multiprocessing
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+# Scores rounded to 4 decimals; the label is taken from the unrounded compound score
+VaderScores = namedtuple('VaderScores', ['label', 'compound', 'pos', 'neg', 'neu'])
+
+_worker_analyzer = None
+
+
+def vader_label(compound):
+    if compound >= POSITIVE_THRESHOLD:
+        return "Positive"
+    if compound <= NEGATIVE_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+def score_text(analyzer, text):
+    vs = analyzer.polarity_scores(text)
+    return VaderScores(vader_label(vs['compound']), round(vs['compound'], 4), round(vs['pos'], 4),
+                       round(vs['neg'], 4), round(vs['neu'], 4))
+
+
+def _factorize_texts(texts):
+    """(index, codes, distinct texts) for a Series of texts; empty/missing texts get code -1."""
+    texts = pd.Series(texts)
+    present = (texts.notna() & (texts.astype(str) != '')).to_numpy()
+    codes = np.full(len(texts), -1)
+    codes[present], uniques = pd.factorize(texts[present].astype(str), sort=False)
+    return texts.index, codes, list(uniques)
+
+
+def _init_worker():
+    global _worker_analyzer
+    _worker_analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(texts):
+    return [tuple(score_text(_worker_analyzer, text)) for text in texts]
+
+
+class VaderBulkScorer:
+    """
+    Scores many texts with VADER. Distinct texts not in the memo are scored in-process for small
+    batches, or in chunks of `chunk_size` across `processes` workers once there are at least
+    `parallel_threshold` of them. The pool needs the 'fork' start method (the enrichment scripts run
+    at module level, so spawned workers would re-run them); elsewhere scoring stays in-process.
+    """
+
+    def __init__(self, processes=None, chunk_size=5000, memo_size=100_000, parallel_threshold=20_000):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.memo_size = memo_size
+        self.parallel_threshold = parallel_threshold
+        self._analyzer = None # Loaded on first use: runs with nothing to score skip the lexicon
+        self.memo = OrderedDict() # text -> VaderScores, least recently used first
+        self.memo_hits = self.scored = 0
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            self._analyzer = SentimentIntensityAnalyzer()
+        return self._analyzer
+
+    def _can_fork(self):
+        return self.processes > 1 and 'fork' in multiprocessing.get_all_start_methods()
+
+    def _score_missing(self, texts):
+        if len(texts) >= self.parallel_threshold and self._can_fork():
+            chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(chunks)),
+                                     mp_context=multiprocessing.get_context('fork'), initializer=_init_worker) as pool:
+                return [VaderScores(*scores) for chunk in pool.map(_score_chunk, chunks) for scores in chunk]
+        return [score_text(self.analyzer, text) for text in texts]
+
+    def score_unique(self, texts):
+        """VaderScores for each of `texts` (distinct strings), using and refreshing the memo."""
+        results = [self.memo.get(text) for text in texts]
+        missing = [text for text, scores in zip(texts, results) if scores is None]
+        self.memo_hits += len(texts) - len(missing)
+        scored = dict(zip(missing, self._score_missing(missing)))
+        self.scored += len(missing)
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = scored[text]
+            self.memo[text] = results[i]
+            self.memo.move_to_end(text)
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return results
+
+    def json_column(self, texts, to_record):
+        """
+        Per-row JSON strings for a Series of texts: `to_record(scores)` turns a VaderScores (or None
+        for an empty/missing text) into the dict stored for each distinct text; rows share its JSON.
+        """
+        index, codes, uniques = _factorize_texts(texts)
+        table = np.array([json.dumps(to_record(s)) for s in self.score_unique(uniques)] + [json.dumps(to_record(None))],
+                         dtype=object)
+        return pd.Series(table[codes], index=index, dtype=object)
+
+    def report(self):
+        print(f"VADER bulk scorer: {self.scored} distinct texts scored, {self.memo_hits} memo hits, "
+              f"{len(self.memo)} texts memoized.")